@@ -0,0 +1,143 @@
+# Two-tier cache for generated artifacts (code, plot pages, prompt results)
+#
+# Entries are immutable byte strings under content-derived keys. Lookups go to
+# an in-process LRU first and then to a directory on disk; both tiers are
+# bounded by total size and drop their least recently used entries.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+MEMORY_BYTES = int(os.environ.get("QUANTUMVIZ_CACHE_MEMORY", 64 * 1024 * 1024))
+DISK_BYTES = int(os.environ.get("QUANTUMVIZ_CACHE_DISK", 1024 * 1024 * 1024))
+CACHE_DIR = os.environ.get(
+    "QUANTUMVIZ_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "artifacts"))
+
+
+def etag_for(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class MemoryLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= len(old)
+        self._items[key] = data
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.nbytes -= len(evicted)
+
+
+class DiskStore:
+    """Files named by the hash of their key, evicted oldest-access first."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.nbytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], name)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as the last access time for eviction
+        os.utime(path)
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        self.nbytes += len(data) - previous
+        if self.nbytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every put
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.nbytes = total
+
+
+class ArtifactCache:
+    def __init__(self, directory=CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskStore(directory, disk_bytes) if disk_bytes else None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self.memory.get(key)
+            if data is None and self.disk is not None:
+                data = self.disk.get(key)
+                if data is not None:
+                    self.memory.put(key, data)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self.memory.put(key, data)
+            if self.disk is not None:
+                self.disk.put(key, data)
+
+    def get_json(self, key):
+        data = self.get(key)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value, separators=(",", ":")).encode())
@@ -0,0 +1,115 @@
+# Answers questions from the indexed papers and documentation
+#
+# Documents are split into overlapping chunks of words and embedded with the
+# embeddings API; the vectors go into the retrieval index (vectors.py). A
+# question is embedded the same way, its nearest chunks are looked up, and
+# the chat-completions API answers from those chunks.
+
+import hashlib
+import os
+
+import numpy as np
+import requests
+
+EMBEDDINGS_API_URL = "https://api.openai.com/v1/embeddings"
+CHAT_API_URL = "https://api.openai.com/v1/chat/completions"
+EMBEDDING_MODEL = os.environ.get("QUANTUMVIZ_EMBEDDING_MODEL", "text-embedding-3-small")
+# The embedding model shortens its vectors to this many dimensions; 512
+# keeps most of the retrieval quality at a third of the index size
+EMBEDDING_DIMENSIONS = int(os.environ.get("QUANTUMVIZ_EMBEDDING_DIMENSIONS", 512))
+CHAT_MODEL = os.environ.get("QUANTUMVIZ_CHAT_MODEL", "gpt-4o-mini")
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+# Texts per embeddings request
+EMBED_BATCH = 256
+
+SYSTEM_PROMPT = (
+    "You are QuantumViz's assistant for quantum computing questions. Answer "
+    "from the numbered excerpts of research papers and circuit documentation "
+    "below when they are relevant and cite them as [1], [2], ...; say so "
+    "when they do not cover the question. Be concise."
+)
+
+
+class ChatbotError(RuntimeError):
+    pass
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def chunk_text(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """`text` as runs of `words` words, each repeating the last `overlap`
+    words of the one before; the last run may be up to `overlap` words
+    longer."""
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = words - overlap
+    starts = list(range(0, max(1, len(tokens) - overlap), step))
+    # A last chunk with fewer new words than the overlap would mostly repeat
+    # the one before, so those words go on the end of that chunk instead
+    if len(starts) > 1 and len(tokens) - starts[-1] - overlap < overlap:
+        starts.pop()
+    ends = [start + words for start in starts[:-1]] + [len(tokens)]
+    return [" ".join(tokens[start:end]) for start, end in zip(starts, ends)]
+
+
+def _api_key():
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ChatbotError("OPENAI_API_KEY is not set")
+    return api_key
+
+
+def _post(url, headers, payload):
+    """JSON reply of the API at `url`; network failures and bad replies
+    raise ChatbotError so the routes answer them with a 502."""
+    try:
+        response = requests.post(url, headers=headers, json=payload, timeout=60)
+    except requests.RequestException as e:
+        raise ChatbotError(f"Could not reach {url}: {e}") from e
+    if response.status_code != 200:
+        raise ChatbotError(f"Error {response.status_code}: {response.text}")
+    try:
+        return response.json()
+    except ValueError as e:
+        raise ChatbotError(f"The response from {url} is not JSON: {e}") from e
+
+
+def embed(texts):
+    """Embeddings of `texts` as a float32 array, one row per text."""
+    headers = {'Authorization': f'Bearer {_api_key()}'}
+    rows = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        body = _post(EMBEDDINGS_API_URL, headers, {
+            "model": EMBEDDING_MODEL,
+            "input": texts[start:start + EMBED_BATCH],
+            "dimensions": EMBEDDING_DIMENSIONS,
+        })
+        try:
+            data = sorted(body["data"], key=lambda item: item["index"])
+            rows.extend(item["embedding"] for item in data)
+        except (KeyError, TypeError) as e:
+            raise ChatbotError(f"Unexpected embeddings response: {e!r}") from e
+    return np.asarray(rows, dtype=np.float32).reshape(len(texts), EMBEDDING_DIMENSIONS)
+
+
+def answer(question, excerpts):
+    """Reply to `question` from `excerpts`, the chunk dicts retrieved for
+    it."""
+    context = "\n\n".join(
+        f"[{i}] {excerpt.get('title') or excerpt['doc_id']}\n{excerpt['text']}"
+        for i, excerpt in enumerate(excerpts, 1))
+    body = _post(CHAT_API_URL, {'Authorization': f'Bearer {_api_key()}'}, {
+        "model": CHAT_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT + "\n\n" + (context or "(no excerpts)")},
+            {"role": "user", "content": question},
+        ],
+    })
+    try:
+        return body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise ChatbotError(f"Unexpected chat response: {e!r}") from e
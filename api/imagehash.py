@@ -0,0 +1,189 @@
+# Perceptual hashes of uploaded images and a persistent index to search them
+#
+# The same circuit figure arrives again from other arXiv versions, mirrors
+# and repeated crawls, each time re-encoded or cropped a little differently,
+# so byte hashes do not match. Two 64-bit perceptual hashes do:
+#
+#   dHash  signs of horizontal gradients on a 9x8 thumbnail
+#   pHash  low-frequency DCT coefficients of a 32x32 thumbnail against their
+#          median
+#
+# Images whose pHash and dHash both lie within MATCH_DISTANCE bits of an
+# indexed image count as the same figure. The index keeps pHashes in a
+# BK-tree (a metric tree over Hamming distance), so a lookup only visits
+# the subtrees that can hold a close enough hash.
+
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+INDEX_PATH = os.environ.get(
+    "QUANTUMVIZ_IMAGE_INDEX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "images.sqlite3"))
+MATCH_DISTANCE = int(os.environ.get("QUANTUMVIZ_IMAGE_MATCH_DISTANCE", 8))
+# Larger images are shrunk by the decoder first; hashing only needs a
+# thumbnail
+DECODE_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    phash TEXT NOT NULL,
+    dhash TEXT NOT NULL,
+    circuit_ir BLOB NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def decode_gray(data):
+    """Grayscale pixels of an encoded image as a float array; raises
+    ValueError for data that is not an image."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (DECODE_SIZE, DECODE_SIZE))
+            image = image.convert("L")
+            image.thumbnail((DECODE_SIZE, DECODE_SIZE))
+            return np.asarray(image, dtype=np.float64)
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError("Upload is not a readable image") from e
+
+
+def resize(gray, height, width):
+    """Area-average `gray` (..., h, w) down or up to (..., height, width)."""
+    h, w = gray.shape[-2:]
+    if h < height or w < width:
+        # Upsample by repetition first so every output cell covers pixels
+        gray = np.repeat(np.repeat(gray, -(-height // h), axis=-2), -(-width // w), axis=-1)
+        h, w = gray.shape[-2:]
+    rows = (np.arange(height) * h) // height
+    cols = (np.arange(width) * w) // width
+    sums = np.add.reduceat(np.add.reduceat(gray, rows, axis=-2), cols, axis=-1)
+    counts = np.outer(np.diff(np.append(rows, h)), np.diff(np.append(cols, w)))
+    return sums / counts
+
+
+def _pack(bits):
+    # (..., 64) booleans -> (...,) unsigned 64-bit integers, first bit highest
+    return np.packbits(bits.reshape(*bits.shape[:-2], 64), axis=-1).view(">u8")[..., 0]
+
+
+def dhash(gray):
+    thumb = resize(gray, 8, 9)
+    return _pack(thumb[..., :, 1:] > thumb[..., :, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+    matrix[0] *= np.sqrt(0.5)
+    return matrix * np.sqrt(2 / n)
+
+
+DCT32 = _dct_matrix(32)
+
+
+def phash(gray):
+    thumb = resize(gray, 32, 32)
+    low = (DCT32 @ thumb @ DCT32.T)[..., :8, :8]
+    # The DC term only reflects overall brightness
+    flat = low.reshape(*low.shape[:-2], 64)
+    median = np.median(flat[..., 1:], axis=-1)
+    return _pack(low > median[..., None, None])
+
+
+def image_hashes(data):
+    """(phash, dhash) of an encoded image, as Python ints."""
+    gray = decode_gray(data)
+    return int(phash(gray)), int(dhash(gray))
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    def __init__(self):
+        self.root = None  # [hash, payloads, {distance: child}]
+        self.size = 0
+
+    def add(self, key, payload):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [payload], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(payload)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [payload], {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """(distance, payload) for every entry within `max_distance`."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                found.extend((distance, payload) for payload in node[1])
+            # Triangle inequality: only children at these edge distances can
+            # hold keys within max_distance
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class ImageIndex:
+    """Circuits generated from images, found again by perceptual hash."""
+
+    def __init__(self, path=INDEX_PATH, max_distance=MATCH_DISTANCE):
+        self.max_distance = max_distance
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(SCHEMA)
+        self.db.commit()
+        self.tree = BKTree()
+        self._lock = threading.Lock()
+        for rowid, p, d in self.db.execute("SELECT rowid, phash, dhash FROM images"):
+            self.tree.add(int(p, 16), (int(d, 16), rowid))
+
+    def __len__(self):
+        return self.tree.size
+
+    def nearest(self, hashes):
+        """(circuit_ir, distance) of the closest indexed image within
+        max_distance on both hashes, or None."""
+        p, d = hashes
+        with self._lock:
+            matches = [
+                (max(distance, hamming(d, stored_d)), rowid)
+                for distance, (stored_d, rowid) in self.tree.search(p, self.max_distance)
+                if hamming(d, stored_d) <= self.max_distance
+            ]
+            if not matches:
+                return None
+            distance, rowid = min(matches)
+            row = self.db.execute("SELECT circuit_ir FROM images WHERE rowid = ?", (rowid,)).fetchone()
+        return bytes(row[0]), distance
+
+    def add(self, hashes, circuit_ir):
+        p, d = hashes
+        with self._lock:
+            cursor = self.db.execute("INSERT INTO images VALUES (?, ?, ?, ?)",
+                                     (f"{p:016x}", f"{d:016x}", circuit_ir, time.time()))
+            self.db.commit()
+            self.tree.add(p, (d, cursor.lastrowid))
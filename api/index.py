@@ -1,6 +1,762 @@
-from flask import Flask
+import base64
+import binascii
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from flask import Flask, Response, abort, jsonify, make_response, request, stream_with_context
+from werkzeug.utils import safe_join
+
+from artifacts import ArtifactCache, etag_for
+from chatbot import (EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, ChatbotError, answer, chunk_text,
+                     content_hash, embed)
+from imagehash import BKTree, ImageIndex, hamming, image_hashes
+from interpreter import InterpreterError, interpret_image, interpret_prompt
+from quantum import Circuit, CircuitError, choose_method, simulate
+from quantum.batch import MAX_ITEMS, CircuitTemplate, grid_points, run_batch
+from quantum.export import qiskit_code, quirk_url
+from quantum.plots import render_bloch_spheres
+from quantum.sampling import sampler, stream_counts
+from quantum.session import sessions
+from singleflight import SingleFlight
+from transcribe import TranscribeError, Transcription, TranscriptionStore
+from vectors import VectorIndex
+
 app = Flask(__name__)
+cache = ArtifactCache()
+# Identical prompts or circuits arriving together are computed once
+inflight = SingleFlight()
+# Circuits read from images, by perceptual hash of the image
+images = ImageIndex()
+# Embedded chunks of the papers and documentation the chatbot answers from
+library = VectorIndex(dim=EMBEDDING_DIMENSIONS)
+
+# Bloch sphere pages are written here and served from /plots
+PLOTS_DIR = os.environ.get(
+    "QUANTUMVIZ_PLOTS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plots"))
+
+# Wide stabilizer circuits still return every Bloch vector, but only the
+# first qubits get a rendered page
+MAX_PLOTTED_QUBITS = 32
+DEFAULT_SHOTS = 1024
+SAMPLE_BATCH = 100_000
+MAX_SHOTS = 100_000_000
+# The out-of-core simulator writes its amplitudes to a file in the temp
+# directory, so HTTP clients only get method="memmap" when the server sets
+# a qubit cap for it (30 qubits are a 16 GiB file); otherwise it is left to
+# the command line
+HTTP_MEMMAP_QUBITS = int(os.environ.get("QUANTUMVIZ_HTTP_MEMMAP_QUBITS", 0))
+# Content type for posting a circuit in its binary form
+CIRCUIT_MIMETYPE = "application/vnd.quantumviz.circuit"
+MAX_BATCH_IMAGES = 64
+# Vision-model calls of one /upload-images request running at once
+IMAGE_WORKERS = int(os.environ.get("QUANTUMVIZ_IMAGE_WORKERS", 4))
+image_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+# Speech-to-text calls running at once, across all recordings
+TRANSCRIBE_WORKERS = int(os.environ.get("QUANTUMVIZ_TRANSCRIBE_WORKERS", 8))
+transcribe_pool = ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS)
+# Recordings posted one chunk per request
+transcriptions = TranscriptionStore()
+# Bytes of a streamed recording read at a time (an eighth of a second of
+# 16 kHz PCM)
+AUDIO_CHUNK = 4096
+# Excerpts the chatbot answers from, and documents indexed per request
+CHATBOT_EXCERPTS = 6
+MAX_DOCUMENTS = 256
+
+
+@app.after_request
+def allow_frontend(response):
+    # The Next.js dev server runs on another port
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+
+def prompt_key(user_input):
+    normalized = " ".join(user_input.lower().split())
+    return "prompt-ir:" + hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def json_body():
+    """JSON object posted with the current request; anything else ends the
+    request with a 400."""
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        abort(make_response(jsonify({"error": "Expected a JSON object"}), 400))
+    return payload
+
+
+def request_payload():
+    """Options of the current request as a dict.
+
+    Clients that already hold a circuit can post its binary form with the
+    CIRCUIT_MIMETYPE content type; options then come from the query string.
+    """
+    if request.mimetype == CIRCUIT_MIMETYPE:
+        return {**request.args.to_dict(), "circuit_ir": request.get_data()}
+    return json_body()
+
+
+def request_method(payload, circuit):
+    """Simulation method asked for in `payload`, if HTTP clients may use it
+    for `circuit`."""
+    method = payload.get("method", "auto")
+    if method == "memmap" and circuit.num_qubits > HTTP_MEMMAP_QUBITS:
+        if not HTTP_MEMMAP_QUBITS:
+            raise ValueError("The memmap method is only available from the command line")
+        raise ValueError(f"The memmap method is limited to {HTTP_MEMMAP_QUBITS} qubits here")
+    return method
+
+
+def load_circuit(payload):
+    """Circuit from its binary or JSON form or, failing that, the prompt.
+
+    Prompts map to circuits through the cache, so a repeated prompt does not
+    cost another LLM call.
+    """
+    if "circuit_ir" in payload:
+        data = payload["circuit_ir"]
+        if isinstance(data, str):
+            try:
+                data = base64.b64decode(data, validate=True)
+            except binascii.Error as e:
+                raise CircuitError(f"circuit_ir is not valid base64: {e}") from e
+        return Circuit.from_bytes(data)
+    if "num_qubits" in payload:
+        return Circuit.from_json(payload)
+
+    user_input = payload.get("user_input", "")
+    if not isinstance(user_input, str):
+        raise CircuitError("'user_input' must be a string")
+    if not user_input.strip():
+        raise CircuitError("Expected 'user_input' or a circuit description")
+    key = prompt_key(user_input)
+    cached = cache.get(key)
+    if cached is not None:
+        return Circuit.from_bytes(cached)
+    return inflight.do(key, _interpret_and_store, key, user_input)
+
+
+def _interpret_and_store(key, user_input):
+    circuit = interpret_prompt(user_input)
+    cache.put(key, circuit.to_bytes())
+    return circuit
+
+
+def question_embedding(question):
+    """Embedding of a chatbot question; a repeated question does not cost
+    another embeddings call."""
+    normalized = " ".join(question.lower().split())
+    key = (f"embedding:{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}:"
+           + hashlib.sha256(normalized.encode()).hexdigest())
+    cached = cache.get(key)
+    if cached is not None:
+        return np.frombuffer(cached, dtype=np.float32)
+    return inflight.do(key, _embed_and_store, key, question)
+
+
+def _embed_and_store(key, question):
+    vector = embed([question])[0]
+    cache.put(key, vector.tobytes())
+    return vector
+
+
+def circuit_artifacts(circuit):
+    """Code, circuit link and Bloch pages for a circuit, built at most once.
+
+    The manifest and each plot page are stored separately under the
+    circuit's canonical hash; plot pages are what /plots/<hash>/ serves.
+    """
+    circuit_hash = circuit.canonical_hash()
+    cached = _cached_artifacts(circuit_hash)
+    if cached is not None:
+        return cached
+    return inflight.do(f"artifacts:{circuit_hash}", _build_artifacts, circuit, circuit_hash)
+
+
+def _cached_artifacts(circuit_hash):
+    manifest = cache.get_json(f"artifacts:{circuit_hash}")
+    if manifest is None:
+        return None
+    html_files = {}
+    for filename in manifest["plots"]:
+        data = cache.get(f"plot:{circuit_hash}:{filename}")
+        if data is None:
+            return None
+        html_files[filename] = data.decode()
+    return manifest, html_files
+
+
+def _build_artifacts(circuit, circuit_hash):
+    method = choose_method(circuit)
+    pass_stats = []
+    vectors = simulate(circuit, method, stats=pass_stats).bloch_vectors()
+    html_files = render_bloch_spheres(vectors[:MAX_PLOTTED_QUBITS])
+    for filename, html in html_files.items():
+        cache.put(f"plot:{circuit_hash}:{filename}", html.encode())
+
+    manifest = {
+        "circuit_hash": circuit_hash,
+        "circuit": circuit.to_json(),
+        "circuit_ir": base64.b64encode(circuit.to_bytes()).decode(),
+        "method": method,
+        "code": qiskit_code(circuit),
+        "circuit_url": quirk_url(circuit),
+        "bloch_vectors": vectors.tolist(),
+        "plots": sorted(html_files),
+        "passes": pass_stats,
+    }
+    cache.put_json(f"artifacts:{circuit_hash}", manifest)
+    return manifest, html_files
+
+
+def publish_plots(html_files):
+    # The frontend loads fixed names like /plots/qubit_0_bloch_sphere.html,
+    # so the latest pages are copied there
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+    for filename, html in html_files.items():
+        with open(os.path.join(PLOTS_DIR, filename), "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def conditional_response(data, mimetype, immutable=False):
+    # Strong ETag from the content so repeated iframe loads get a 304
+    response = make_response(data)
+    response.mimetype = mimetype
+    response.set_etag(etag_for(data))
+    if immutable:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
 
 @app.route("/api/python")
 def hello_world():
-    return "<p>Hello, World!</p>"
\ No newline at end of file
+    return "<p>Hello, World!</p>"
+
+
+@app.route("/simulate", methods=["POST"])
+def simulate_circuit():
+    payload = request_payload()
+    try:
+        circuit = load_circuit(payload)
+        method = request_method(payload, circuit)
+        if method == "auto":
+            method = choose_method(circuit)
+        shots = int(payload.get("shots", DEFAULT_SHOTS))
+        if not 0 < shots <= MAX_SHOTS:
+            raise ValueError(f"shots must be between 1 and {MAX_SHOTS}")
+        pass_stats = []
+        state = simulate(circuit, method, optimize=str(payload.get("optimize", True)).lower() not in ("false", "0"),
+                         stats=pass_stats)
+        measured = circuit.measured_qubits()
+        draws = sampler(state, measured) if measured else None
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    # One simulation feeds every qubit's Bloch sphere
+    vectors = state.bloch_vectors()
+    html_files = render_bloch_spheres(vectors[:MAX_PLOTTED_QUBITS], PLOTS_DIR)
+
+    result = {
+        "method": method,
+        "bloch_vectors": vectors.tolist(),
+        "html_files": html_files,
+        "passes": pass_stats,
+    }
+
+    if draws is not None:
+        # Drawn in SAMPLE_BATCH slices so a large shot count stays in bounded memory
+        counts = {}
+        for _, batch in stream_counts(draws, shots, SAMPLE_BATCH):
+            for key, n in batch.items():
+                counts[key] = counts.get(key, 0) + n
+        result["counts"] = counts
+
+    return jsonify(result)
+
+
+@app.route("/sample", methods=["POST"])
+def sample():
+    """Measurement counts for large shot numbers, streamed in batches.
+
+    Each newline-delimited JSON part holds the counts of one batch
+    ("counts") and the running total ("shots_done"); clients add the batches
+    up. The last part has type "done".
+    """
+    payload = request_payload()
+    try:
+        circuit = load_circuit(payload)
+        shots = int(payload.get("shots", DEFAULT_SHOTS))
+        batch_size = min(int(payload.get("batch_size", SAMPLE_BATCH)), SAMPLE_BATCH)
+        if not 0 < shots <= MAX_SHOTS or batch_size < 1:
+            raise ValueError(f"shots must be between 1 and {MAX_SHOTS}")
+        qubits = payload.get("qubits") or circuit.measured_qubits() \
+            or list(range(circuit.num_qubits))
+        qubits = [int(q) for q in qubits]
+        if any(not 0 <= q < circuit.num_qubits for q in qubits) or len(set(qubits)) != len(qubits):
+            raise ValueError("qubits must be distinct qubits of the circuit")
+        seed = payload.get("seed")
+        if seed is not None:
+            seed = int(seed)
+            if seed < 0:
+                raise ValueError("seed must be a non-negative integer")
+        state = simulate(circuit, request_method(payload, circuit))
+        # Built before the stream starts, while a bad request can still be
+        # answered with a 400
+        draws = sampler(state, qubits, seed)
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    def parts():
+        done = 0
+        for batch, counts in stream_counts(draws, shots, batch_size):
+            done += batch
+            yield _part("counts", shots=batch, shots_done=done, counts=counts)
+        yield _part("done", shots=done, qubits=qubits)
+
+    return Response(stream_with_context(parts()), mimetype="application/x-ndjson")
+
+
+def _batch_items(items):
+    # Checked before anything is bound or parsed, so an oversized batch is
+    # turned away without doing the work run_batch would reject anyway
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of batch items")
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f"{len(items)} items exceed the limit of {MAX_ITEMS}")
+    return items
+
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """Many circuits at once, typically a parameter sweep.
+
+    The body holds either a "template" (a circuit whose params may name
+    variables) with a "grid" of values per variable or a list of "points",
+    or a plain list of "circuits" (JSON or base64 circuit_ir). The response
+    is newline-delimited JSON: a "batch" part with the item count, one
+    "item" part per circuit in completion order, and "done".
+    """
+    payload = json_body()
+    try:
+        points = None
+        if "template" in payload:
+            template = CircuitTemplate(payload["template"])
+            if "points" in payload:
+                points = _batch_items(payload["points"])
+                points = [[float(p[v]) for v in template.variables] for p in points]
+            else:
+                points = grid_points(template.variables, payload.get("grid", {}))
+            circuits = [template.bind(p) for p in points]
+        else:
+            circuits = [load_circuit(c if isinstance(c, dict) else {"circuit_ir": c})
+                        for c in _batch_items(payload.get("circuits", []))]
+        qubits = [int(q) for q in payload.get("qubits") or []]
+        items = run_batch(circuits, payload.get("method", "auto"), qubits)
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError, TypeError, KeyError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    variables = template.variables if points is not None else []
+
+    def parts():
+        yield _part("batch", count=len(circuits), variables=variables)
+        for item in items:
+            if points is not None:
+                item["params"] = dict(zip(variables, points[item["index"]]))
+            yield _part("item", **item)
+        yield _part("done", count=len(circuits))
+
+    return Response(stream_with_context(parts()), mimetype="application/x-ndjson")
+
+
+@app.route("/edit-circuit", methods=["POST"])
+def edit_circuit():
+    payload = request_payload()
+    session = sessions.get(payload.get("session_id"))
+    try:
+        circuit = load_circuit(payload)
+        edit = session.update(circuit, payload.get("method", "auto"))
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Only the qubits whose Bloch vector moved get a fresh page
+    changed = [q for q in edit.changed_qubits if q < MAX_PLOTTED_QUBITS]
+    vectors = edit.bloch_vectors
+    html_files = render_bloch_spheres(vectors, PLOTS_DIR, qubits=changed)
+
+    return jsonify({
+        "session_id": session.session_id,
+        "method": edit.method,
+        "bloch_vectors": vectors.tolist(),
+        "changed_qubits": edit.changed_qubits,
+        "resumed_from_layer": edit.resumed_from,
+        "layers": edit.layers,
+        "html_files": html_files,
+    })
+
+
+@app.route("/process-prompt", methods=["POST"])
+def process_prompt():
+    try:
+        circuit = load_circuit(request_payload())
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    manifest, _ = circuit_artifacts(circuit)
+    # The frontend embeds the response directly as the circuit editor URL
+    return jsonify(manifest["circuit_url"])
+
+
+@app.route("/get_qiskit_code", methods=["POST"])
+def get_qiskit_code():
+    try:
+        circuit = load_circuit(request_payload())
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    except (CircuitError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    manifest, html_files = circuit_artifacts(circuit)
+    publish_plots(html_files)
+    return jsonify({
+        "circuit_hash": manifest["circuit_hash"],
+        "circuit": manifest["circuit"],
+        "method": manifest["method"],
+        "code": manifest["code"],
+        "bloch_vectors": manifest["bloch_vectors"],
+        "passes": manifest.get("passes", []),
+        "html_files": html_files,
+    })
+
+
+@app.route("/generate", methods=["POST"])
+def generate():
+    """Prompt to circuit, code and plots in one request.
+
+    The response is newline-delimited JSON, one object per part as soon as it
+    is ready: "circuit" (with the code and editor link, which are cheap once
+    the circuit is known) and then "plots". Failures arrive as an "error"
+    part.
+    """
+    payload = request_payload()
+
+    def parts():
+        try:
+            circuit = load_circuit(payload)
+        except InterpreterError as e:
+            yield _part("error", error=str(e), status=502)
+            return
+        except (CircuitError, ValueError) as e:
+            yield _part("error", error=str(e), status=400)
+            return
+
+        yield _part(
+            "circuit",
+            circuit_hash=circuit.canonical_hash(),
+            circuit=circuit.to_json(),
+            circuit_url=quirk_url(circuit),
+            code=qiskit_code(circuit),
+        )
+
+        try:
+            manifest, html_files = circuit_artifacts(circuit)
+        except ValueError as e:
+            yield _part("error", error=str(e), status=400)
+            return
+        publish_plots(html_files)
+        yield _part(
+            "plots",
+            method=manifest["method"],
+            bloch_vectors=manifest["bloch_vectors"],
+            passes=manifest.get("passes", []),
+            html_files=html_files,
+        )
+
+    return Response(stream_with_context(parts()), mimetype="application/x-ndjson")
+
+
+@app.route("/upload-image", methods=["POST"])
+def upload_image():
+    """Circuit drawn in the uploaded "image".
+
+    An image that looks like one read before (a re-encoded or slightly
+    shifted copy of the same figure) reuses that circuit instead of another
+    vision-model call; "reused" and "distance" say whether it did.
+    """
+    upload = request.files.get("image")
+    if upload is None:
+        return jsonify({"error": "Expected an 'image' file"}), 400
+    data = upload.read()
+    try:
+        hashes = image_hashes(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        circuit, distance = _read_image(data, upload.mimetype or "image/png", hashes)
+    except InterpreterError as e:
+        return jsonify({"error": str(e)}), 502
+    return jsonify(_image_result(hashes, circuit, distance))
+
+
+@app.route("/upload-images", methods=["POST"])
+def upload_images():
+    """Circuits drawn in many uploaded "image" files.
+
+    The response is newline-delimited JSON: a "batch" part with the count,
+    then one "image" part per file (its index, filename and what
+    /upload-image returns) or an "error" part with its index, in completion
+    order, and "done". Files that look alike are read once: only the first
+    of each group of near-duplicates goes to the vision model.
+    """
+    uploads = request.files.getlist("image")
+    if not uploads:
+        return jsonify({"error": "Expected one or more 'image' files"}), 400
+    if len(uploads) > MAX_BATCH_IMAGES:
+        return jsonify({"error": f"At most {MAX_BATCH_IMAGES} images per request"}), 400
+    # Read while the request is still open; parts() runs as the body streams
+    files = [(u.filename, u.mimetype or "image/png", u.read()) for u in uploads]
+
+    def parts():
+        yield _part("batch", count=len(files))
+        groups = {}  # leader index -> [(index, distance to leader)]
+        leaders = BKTree()
+        hashes = {}
+        for index, (filename, _, data) in enumerate(files):
+            try:
+                hashes[index] = image_hashes(data)
+            except ValueError as e:
+                yield _part("error", index=index, filename=filename, error=str(e), status=400)
+                continue
+            close = [(max(d, hamming(hashes[index][1], hashes[leader][1])), leader)
+                     for d, leader in leaders.search(hashes[index][0], images.max_distance)
+                     if hamming(hashes[index][1], hashes[leader][1]) <= images.max_distance]
+            if close:
+                distance, leader = min(close)
+                groups[leader].append((index, distance))
+            else:
+                leaders.add(hashes[index][0], index)
+                groups[index] = [(index, None)]
+
+        futures = {
+            image_pool.submit(_read_image, files[leader][2], files[leader][1], hashes[leader]): leader
+            for leader in groups
+        }
+        for future in as_completed(futures):
+            leader = futures[future]
+            try:
+                circuit, leader_distance = future.result()
+            except InterpreterError as e:
+                for index, _ in groups[leader]:
+                    yield _part("error", index=index, filename=files[index][0], error=str(e), status=502)
+                continue
+            for index, distance in groups[leader]:
+                if distance is None:
+                    distance = leader_distance
+                yield _part("image", index=index, filename=files[index][0],
+                            **_image_result(hashes[index], circuit, distance))
+        yield _part("done", count=len(files))
+
+    return Response(stream_with_context(parts()), mimetype="application/x-ndjson")
+
+
+@app.route("/transcribe-audio", methods=["POST"])
+def transcribe_audio():
+    """Transcript of the audio in the request body, which can be sent while
+    it is being recorded (a chunked upload in the recording's content type).
+
+    The response is newline-delimited JSON: a "partial" part with the
+    transcript so far whenever it changes, then "done" with the full
+    "transcription", or "error".
+    """
+    try:
+        transcription = Transcription(transcribe_pool, request.mimetype, request.mimetype_params)
+    except TranscribeError as e:
+        return jsonify({"error": str(e)}), 415
+    stream = request.stream
+
+    def parts():
+        last = ""
+        try:
+            for chunk in iter(lambda: stream.read(AUDIO_CHUNK), b""):
+                transcription.feed(chunk)
+                text = transcription.text
+                if text != last:
+                    last = text
+                    yield _part("partial", text=text, seconds=transcription.seconds)
+            yield _part("done", transcription=transcription.finish(), seconds=transcription.seconds)
+        except TranscribeError as e:
+            yield _part("error", error=str(e), status=502)
+        finally:
+            transcription.close()
+
+    return Response(stream_with_context(parts()), mimetype="application/x-ndjson")
+
+
+@app.route("/transcribe-audio/<stream_id>", methods=["POST"])
+def transcribe_audio_chunk(stream_id):
+    """Append the body to recording `stream_id` and return the transcript
+    so far as "text"; with ?end=1 the recording is over and the response
+    has the full "transcription" instead.
+
+    For clients that cannot stream an upload (browsers over HTTP/1.1): post
+    each chunk in order as it is recorded. The first chunk's content type is
+    the recording's.
+    """
+    try:
+        transcription = transcriptions.get(stream_id, lambda: Transcription(
+            transcribe_pool, request.mimetype, request.mimetype_params, stream_id))
+    except TranscribeError as e:
+        return jsonify({"error": str(e)}), 415
+
+    end = request.args.get("end") in ("1", "true")
+    try:
+        transcription.feed(request.get_data())
+        if end:
+            text = transcription.finish()
+            return jsonify({"stream_id": stream_id, "transcription": text,
+                            "seconds": transcription.seconds})
+    except TranscribeError as e:
+        end = True
+        return jsonify({"error": str(e)}), 502
+    finally:
+        if end:
+            transcriptions.pop(stream_id)
+            transcription.close()
+    return jsonify({"stream_id": stream_id, "text": transcription.text, "seconds": transcription.seconds})
+
+
+def _read_image(data, mimetype, hashes):
+    # Identical bytes uploaded together share one lookup and model call
+    return inflight.do(f"image:{etag_for(data)}", _lookup_or_interpret, data, mimetype, hashes)
+
+
+def _lookup_or_interpret(data, mimetype, hashes):
+    match = images.nearest(hashes)
+    if match is not None:
+        circuit_ir, distance = match
+        return Circuit.from_bytes(circuit_ir), distance
+    circuit = interpret_image(data, mimetype)
+    images.add(hashes, circuit.to_bytes())
+    return circuit, None
+
+
+def _image_result(hashes, circuit, distance):
+    return {
+        "image_hash": f"{hashes[0]:016x}",
+        "reused": distance is not None,
+        "distance": distance,
+        "circuit_hash": circuit.canonical_hash(),
+        "circuit": circuit.to_json(),
+        "circuit_ir": base64.b64encode(circuit.to_bytes()).decode(),
+        "circuit_url": quirk_url(circuit),
+        "code": qiskit_code(circuit),
+    }
+
+
+def _part(kind, **fields):
+    return json.dumps({"type": kind, **fields}) + "\n"
+
+
+@app.route("/chatbot", methods=["POST"])
+def chatbot():
+    """Answer to "question" from the indexed papers and documentation, with
+    the excerpts it drew on as "sources"."""
+    question = json_body().get("question", "")
+    if not isinstance(question, str) or not question.strip():
+        return jsonify({"error": "Expected a 'question'"}), 400
+    try:
+        scores, rows = library.search(question_embedding(question), k=CHATBOT_EXCERPTS)
+        score_of = {int(row): float(score) for row, score in zip(rows[0], scores[0]) if row >= 0}
+        excerpts = library.chunks(score_of)
+        response = answer(question, excerpts)
+    except ChatbotError as e:
+        return jsonify({"error": str(e)}), 502
+    return jsonify({
+        "response": response,
+        "sources": [{"doc_id": e["doc_id"], "title": e["title"], "url": e["url"],
+                     "score": round(score_of[e["row"]], 4)} for e in excerpts],
+    })
+
+
+@app.route("/documents", methods=["POST"])
+def add_documents():
+    """Index "documents", each {"id", "text"} with an optional "title" and
+    "url", for the chatbot.
+
+    Documents come in as they are crawled. One already indexed with the same
+    text is left alone ("unchanged"); one whose text changed replaces its
+    earlier version.
+    """
+    documents = json_body().get("documents")
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "Expected a list of 'documents'"}), 400
+    if len(documents) > MAX_DOCUMENTS:
+        return jsonify({"error": f"At most {MAX_DOCUMENTS} documents per request"}), 400
+    if not all(isinstance(d, dict) and d.get("id") and isinstance(d.get("text"), str) for d in documents):
+        return jsonify({"error": "Every document needs an 'id' and a 'text'"}), 400
+
+    added, unchanged, pending = [], [], []
+    for document in documents:
+        doc_id = str(document["id"])
+        digest = content_hash(f"{document.get('title') or ''}\n{document['text']}")
+        if library.content_hash(doc_id) == digest:
+            unchanged.append(doc_id)
+            continue
+        chunks = chunk_text(document["text"])
+        if chunks:
+            pending.append((doc_id, digest, document, chunks))
+
+    # One embeddings call for the chunks of every new document; the title
+    # goes with each chunk so excerpts match questions about the paper
+    texts = [f"{document.get('title') or ''}\n{chunk}".strip()
+             for _, _, document, chunks in pending for chunk in chunks]
+    try:
+        vectors = embed(texts) if texts else None
+    except ChatbotError as e:
+        return jsonify({"error": str(e)}), 502
+    offset = 0
+    for doc_id, digest, document, chunks in pending:
+        library.add(doc_id, digest, vectors[offset:offset + len(chunks)], [
+            {"text": chunk, "title": document.get("title"), "url": document.get("url")} for chunk in chunks])
+        offset += len(chunks)
+        added.append(doc_id)
+    return jsonify({"added": added, "unchanged": unchanged, "chunks": len(texts), "index": library.stats()})
+
+
+@app.route("/plots/<circuit_hash>/<filename>")
+def cached_plot(circuit_hash, filename):
+    data = cache.get(f"plot:{circuit_hash}:{filename}")
+    if data is None:
+        abort(404)
+    return conditional_response(data, "text/html", immutable=True)
+
+
+@app.route("/plots/<filename>")
+def plots(filename):
+    path = safe_join(PLOTS_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    with open(path, "rb") as f:
+        data = f.read()
+    return conditional_response(data, "text/html")
+
+
+if __name__ == "__main__":
+    app.run(port=8080)
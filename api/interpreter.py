@@ -0,0 +1,89 @@
+# Turns a natural-language prompt, or an image of a circuit, into a circuit
+# with the chat-completions API
+
+import base64
+import json
+import os
+
+import requests
+
+from quantum import Circuit, CircuitError
+from quantum.gates import GATES
+
+GPT_API_URL = "https://api.openai.com/v1/chat/completions"
+MODEL = os.environ.get("QUANTUMVIZ_MODEL", "gpt-4o-mini")
+
+SYSTEM_PROMPT = (
+    "You translate descriptions of quantum circuits into JSON. Reply with a "
+    "single JSON object and nothing else, of the form "
+    '{"num_qubits": <int>, "gates": [{"name": <gate>, "qubits": [<int>, ...], '
+    '"params": [<float>, ...]}]}. Qubits are numbered from 0. Controls come '
+    "before targets. Angles are in radians. Allowed gate names: "
+    + ", ".join(sorted(GATES)) + ", measure, barrier."
+)
+
+
+class InterpreterError(RuntimeError):
+    pass
+
+
+def _extract_json(content):
+    # Models sometimes wrap the answer in a markdown code fence
+    content = content.strip()
+    if "```" in content:
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[len("json"):]
+    return json.loads(content)
+
+
+def interpret_prompt(user_input):
+    return _interpret([{"role": "user", "content": user_input}])
+
+
+def interpret_image(data, mimetype="image/png"):
+    """Circuit drawn in an image (a figure or screenshot), read by a
+    vision-capable model."""
+    url = f"data:{mimetype};base64,{base64.b64encode(data).decode()}"
+    return _interpret([{"role": "user", "content": [
+        {"type": "text", "text": "Transcribe the quantum circuit in this image."},
+        {"type": "image_url", "image_url": {"url": url}},
+    ]}])
+
+
+def _interpret(messages):
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise InterpreterError("OPENAI_API_KEY is not set")
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}',
+    }
+    data = {
+        "model": MODEL,
+        "messages": [{"role": "system", "content": SYSTEM_PROMPT}, *messages],
+        "temperature": 0,
+    }
+
+    try:
+        response = requests.post(GPT_API_URL, headers=headers, json=data, timeout=60)
+    except requests.RequestException as e:
+        raise InterpreterError(f"Could not reach the model: {e}") from e
+    if response.status_code != 200:
+        raise InterpreterError(f"Error {response.status_code}: {response.text}")
+
+    # A body that is not JSON is the upstream's fault, not the circuit's, so
+    # it must not surface as the ValueError the routes answer with a 400
+    try:
+        gpt_response = response.json()
+    except ValueError as e:
+        raise InterpreterError(f"The model's response is not JSON: {e}") from e
+    if 'choices' not in gpt_response:
+        raise InterpreterError(f"Unexpected response format: {gpt_response}")
+
+    content = gpt_response["choices"][0]["message"]["content"]
+    try:
+        return Circuit.from_json(_extract_json(content))
+    except (ValueError, CircuitError) as e:
+        raise InterpreterError(f"Could not build a circuit from the model's answer: {e}") from e
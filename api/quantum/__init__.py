@@ -0,0 +1,4 @@
+from .circuit import Circuit, CircuitError, Operation
+from .simulator import choose_method, simulate
+from .stabilizer import StabilizerState, is_clifford
+from .statevector import Statevector
@@ -0,0 +1,216 @@
+# Batch evaluation of many circuits, typically a parameter sweep
+#
+# A template is a circuit in the usual JSON form where some gate parameters
+# are variable names instead of numbers:
+#
+#     {"num_qubits": 1,
+#      "gates": [{"name": "rx", "qubits": [0], "params": ["theta"]}]}
+#
+# Binding a point of the grid only rewrites the params column of the
+# operation records. Items are simulated in a process pool; each worker
+# writes its Bloch vectors and probabilities straight into shared-memory
+# result arrays and only returns item indices, so results never get pickled.
+
+import itertools
+import math
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .circuit import Circuit, CircuitError
+from .sampling import outcome_probabilities
+from .simulator import choose_method, simulate
+
+MAX_ITEMS = 10_000
+# Probabilities are returned in full, so keep them small
+MAX_PROBABILITY_QUBITS = 16
+WORKERS = int(os.environ.get("QUANTUMVIZ_BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_METHODS = ("auto", "statevector", "stabilizer")
+
+
+class CircuitTemplate:
+    def __init__(self, payload):
+        if not isinstance(payload, dict):
+            raise CircuitError("A circuit template must be a JSON object")
+        gates = payload.get("gates", [])
+        self.variables = []
+        slots = []  # (operation index, parameter index, variable index)
+        numeric = []
+        try:
+            for i, gate in enumerate(gates):
+                params = []
+                for j, p in enumerate(gate.get("params", [])):
+                    if isinstance(p, str):
+                        if p not in self.variables:
+                            self.variables.append(p)
+                        slots.append((i, j, self.variables.index(p)))
+                        p = 0.0
+                    params.append(p)
+                numeric.append({**gate, "params": params})
+        except (TypeError, AttributeError) as e:
+            raise CircuitError(f"Malformed circuit template: {e}") from e
+        self.circuit = Circuit.from_json({**payload, "gates": numeric})
+        if len(self.circuit) != len(gates):
+            # Wide barriers expand to several records and shift the indices
+            raise CircuitError("Barriers on more than three qubits are not allowed in templates")
+        self.slots = np.array(slots, dtype=np.int64).reshape(-1, 3)
+
+    def bind(self, values):
+        """Copy of the circuit with `values` (one per variable) filled in."""
+        circuit = self.circuit.copy()
+        rows, cols, var = self.slots.T
+        circuit.ops["params"][rows, cols] = np.asarray(values, dtype=np.float64)[var]
+        return circuit
+
+
+def grid_points(variables, grid):
+    """Every combination of the per-variable value lists, first variable slowest."""
+    missing = [v for v in variables if v not in grid]
+    if missing:
+        raise CircuitError(f"No values given for {', '.join(missing)}")
+    axes = [[float(x) for x in grid[v]] for v in variables]
+    count = math.prod(len(a) for a in axes)
+    if count > MAX_ITEMS:
+        raise ValueError(f"The grid has {count} points, the limit is {MAX_ITEMS}")
+    return list(itertools.product(*axes))
+
+
+class _Results:
+    """Bloch vector and probability arrays in shared memory."""
+
+    def __init__(self, count, num_qubits, width, names=None):
+        shapes = {"bloch": (count, num_qubits, 3), "probs": (count, 2 ** width)}
+        self.shapes = shapes
+        if names is None:
+            self.blocks = {
+                key: shared_memory.SharedMemory(
+                    create=True, size=max(1, math.prod(shape) * 8))
+                for key, shape in shapes.items()
+            }
+        else:
+            self.blocks = {key: shared_memory.SharedMemory(name=names[key]) for key in shapes}
+        self.arrays = {
+            key: np.ndarray(shape, dtype=np.float64, buffer=self.blocks[key].buf)
+            for key, shape in shapes.items()
+        }
+
+    @property
+    def spec(self):
+        # What a worker needs to attach
+        count, num_qubits, _ = self.shapes["bloch"]
+        width = int(math.log2(self.shapes["probs"][1]))
+        names = {key: block.name for key, block in self.blocks.items()}
+        return count, num_qubits, width, names
+
+    def close(self, unlink=False):
+        self.arrays = None
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+
+
+def _evaluate(spec, items, method, qubits):
+    # Runs in a worker: simulate each (index, circuit bytes) and write the
+    # results into the shared arrays
+    results = _Results(*spec)
+    bloch, probs = results.arrays["bloch"], results.arrays["probs"]
+    done = []
+    try:
+        for index, data in items:
+            try:
+                circuit = Circuit.from_bytes(data)
+                chosen = choose_method(circuit) if method == "auto" else method
+                state = simulate(circuit, chosen)
+                measured = qubits or circuit.measured_qubits() or list(range(circuit.num_qubits))
+                p = outcome_probabilities(state, measured)
+                bloch[index, :circuit.num_qubits] = state.bloch_vectors()
+                probs[index, :len(p)] = p
+                done.append((index, chosen, circuit.num_qubits, measured, None))
+            except ValueError as e:
+                done.append((index, None, 0, [], str(e)))
+    finally:
+        results.close()
+    return done
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    # Started on first use and kept, since worker start-up dominates small sweeps
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        return _pool
+
+
+def _bitstring_width(circuits, qubits):
+    if qubits:
+        return len(qubits)
+    return max(len(c.measured_qubits()) or c.num_qubits for c in circuits)
+
+
+def run_batch(circuits, method="auto", qubits=None):
+    """Simulate `circuits` in the process pool.
+
+    Checks the request up front and returns an iterator that yields one dict
+    per circuit as it finishes, in completion order, with its index, Bloch
+    vectors and probabilities over `qubits` (by default the measured qubits,
+    or all of them), indexed with qubits[0] as the lowest bit.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Method '{method}' is not available for batches")
+    if not circuits:
+        raise ValueError("The batch is empty")
+    if len(circuits) > MAX_ITEMS:
+        raise ValueError(f"{len(circuits)} circuits exceed the limit of {MAX_ITEMS}")
+    num_qubits = max(c.num_qubits for c in circuits)
+    width = _bitstring_width(circuits, qubits)
+    if width > MAX_PROBABILITY_QUBITS:
+        raise ValueError(
+            f"Probabilities over {width} qubits requested, the limit is {MAX_PROBABILITY_QUBITS}")
+    if qubits and any(not 0 <= q < c.num_qubits for c in circuits for q in qubits):
+        raise ValueError("qubits must be qubits of every circuit")
+    return _stream(circuits, method, qubits, num_qubits, width)
+
+
+def _stream(circuits, method, qubits, num_qubits, width):
+    results = _Results(len(circuits), num_qubits, width)
+    try:
+        # A few chunks per worker keeps the pool busy without one task per item
+        chunk = max(1, math.ceil(len(circuits) / (4 * WORKERS)))
+        items = [(i, c.to_bytes()) for i, c in enumerate(circuits)]
+        executor = pool()
+        pending = {
+            executor.submit(_evaluate, results.spec, items[i:i + chunk], method, qubits)
+            for i in range(0, len(items), chunk)
+        }
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for index, chosen, n, measured, error in future.result():
+                        if error is not None:
+                            yield {"index": index, "error": error}
+                            continue
+                        yield {
+                            "index": index,
+                            "method": chosen,
+                            "bloch_vectors": results.arrays["bloch"][index, :n].tolist(),
+                            "qubits": measured,
+                            "probabilities": results.arrays["probs"][index, :2 ** len(measured)].tolist(),
+                        }
+        finally:
+            # The client went away or a worker died; drop what has not started
+            # and wait for the rest before the buffers are released
+            for future in pending:
+                future.cancel()
+            wait(pending)
+    finally:
+        results.close(unlink=True)
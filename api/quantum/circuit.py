@@ -0,0 +1,259 @@
+# Circuit representation shared by parsing, simulation, code generation and
+# plotting
+#
+# Operations live in a NumPy structured array with one fixed-size record per
+# gate (opcode, arity, up to three qubits, up to three parameters), so a
+# circuit can be hashed, sliced, filtered and serialized without touching
+# Python objects. Iterating still yields readable Operation tuples.
+#
+# The JSON form accepted by the API looks like:
+#
+#     {"version": 1,
+#      "num_qubits": 2,
+#      "gates": [{"name": "h", "qubits": [0]},
+#                {"name": "cx", "qubits": [0, 1]},
+#                {"name": "rz", "qubits": [1], "params": [0.5]}]}
+#
+# The binary form is a 16-byte header (magic, format version, qubit count,
+# operation count) followed by the raw little-endian records.
+
+import hashlib
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from .gates import GATES, NON_UNITARY, OPCODE, OPCODES, UNSUPPORTED, canonical_name
+
+Operation = namedtuple("Operation", ["name", "qubits", "params"])
+
+FORMAT_VERSION = 1
+MAGIC = b"QVIR"
+_HEADER = struct.Struct("<4sBxxxII")
+
+MAX_ARITY = 3
+OP_DTYPE = np.dtype([
+    ("opcode", "u1"),
+    ("arity", "u1"),
+    ("qubits", "<i4", (MAX_ARITY,)),
+    ("params", "<f8", (MAX_ARITY,)),
+])
+
+# Parameters are rounded before hashing so float noise from the LLM or the
+# frontend does not split cache entries
+_HASH_DIGITS = 10
+
+
+class CircuitError(ValueError):
+    pass
+
+
+class Circuit:
+    def __init__(self, num_qubits, operations=()):
+        if num_qubits < 1:
+            raise CircuitError("A circuit needs at least one qubit")
+        self.num_qubits = num_qubits
+        self._ops = np.zeros(16, dtype=OP_DTYPE)
+        self._size = 0
+        for op in operations:
+            self.append(*op)
+
+    @property
+    def ops(self):
+        """The operation records, one row of OP_DTYPE per gate."""
+        return self._ops[:self._size]
+
+    def append(self, name, qubits, params=()):
+        name = canonical_name(name)
+        qubits = tuple(int(q) for q in qubits)
+        params = tuple(float(p) for p in params)
+
+        if name in UNSUPPORTED:
+            raise CircuitError(UNSUPPORTED[name])
+        if name not in GATES and name not in NON_UNITARY:
+            raise CircuitError(f"Unsupported gate '{name}'")
+        if name in GATES:
+            arity, num_params, _ = GATES[name]
+            if len(qubits) != arity:
+                raise CircuitError(
+                    f"Gate '{name}' acts on {arity} qubit(s), got {len(qubits)}")
+            if len(params) != num_params:
+                raise CircuitError(
+                    f"Gate '{name}' takes {num_params} parameter(s), got {len(params)}")
+        elif name != "barrier" and len(qubits) != 1:
+            raise CircuitError(f"'{name}' acts on exactly one qubit")
+        if len(set(qubits)) != len(qubits):
+            raise CircuitError(f"Gate '{name}' repeats a qubit: {qubits}")
+        for q in qubits:
+            if not 0 <= q < self.num_qubits:
+                raise CircuitError(
+                    f"Qubit {q} out of range for a {self.num_qubits}-qubit circuit")
+
+        if name == "barrier" and len(qubits) > MAX_ARITY:
+            # Adjacent barriers are equivalent to one wide barrier
+            for i in range(0, len(qubits), MAX_ARITY):
+                self._push(OPCODE[name], qubits[i:i + MAX_ARITY], ())
+        else:
+            self._push(OPCODE[name], qubits, params)
+        return self
+
+    def _push(self, opcode, qubits, params):
+        if self._size == len(self._ops):
+            self._ops = np.resize(self._ops, 2 * len(self._ops))
+        self._ops[self._size] = (
+            opcode,
+            len(qubits),
+            tuple(qubits) + (-1,) * (MAX_ARITY - len(qubits)),
+            tuple(params) + (0.0,) * (MAX_ARITY - len(params)),
+        )
+        self._size += 1
+
+    @staticmethod
+    def _decode(record):
+        name = OPCODES[record["opcode"]]
+        arity = int(record["arity"])
+        num_params = GATES[name][1] if name in GATES else 0
+        return Operation(
+            name,
+            tuple(int(q) for q in record["qubits"][:arity]),
+            tuple(float(p) for p in record["params"][:num_params]),
+        )
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for record in self.ops:
+            yield self._decode(record)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(record) for record in self.ops[index]]
+        return self._decode(self.ops[index])
+
+    @property
+    def operations(self):
+        return list(self)
+
+    def copy(self):
+        circuit = Circuit(self.num_qubits)
+        circuit._ops = self.ops.copy()
+        circuit._size = self._size
+        return circuit
+
+    def measured_qubits(self):
+        ops = self.ops
+        qubits = ops["qubits"][ops["opcode"] == OPCODE["measure"], 0]
+        # First occurrence order
+        _, first = np.unique(qubits, return_index=True)
+        return qubits[np.sort(first)].tolist()
+
+    def layer_boundaries(self):
+        """Indices into the operation list where each layer ends.
+
+        Operations keep their order; a new layer starts whenever an operation
+        touches a qubit already used in the current one.
+        """
+        boundaries = []
+        busy = set()
+        ops = self.ops
+        for i, (arity, qubits) in enumerate(zip(ops["arity"].tolist(), ops["qubits"].tolist())):
+            touched = qubits[:arity]
+            if busy.intersection(touched):
+                boundaries.append(i)
+                busy = set()
+            busy.update(touched)
+        if self._size:
+            boundaries.append(self._size)
+        return boundaries
+
+    def canonical_hash(self):
+        """Content hash that is the same for every spelling of the circuit.
+
+        Gate aliases are already resolved on append; on top of that the
+        operations inside a layer act on disjoint qubits and commute, so they
+        are sorted before hashing.
+        """
+        ops = self.ops.copy()
+        ops["params"] = np.round(ops["params"], _HASH_DIGITS) + 0.0  # drop -0.0
+        start = 0
+        for end in self.layer_boundaries():
+            layer = ops[start:end]
+            order = np.lexsort((layer["opcode"], layer["qubits"][:, 2],
+                                layer["qubits"][:, 1], layer["qubits"][:, 0]))
+            ops[start:end] = layer[order]
+            start = end
+        h = hashlib.sha256(_HEADER.pack(MAGIC, FORMAT_VERSION, self.num_qubits, len(ops)))
+        h.update(ops.tobytes())
+        return h.hexdigest()
+
+    def to_bytes(self):
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, self.num_qubits, self._size)
+        return header + self.ops.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _HEADER.size:
+            raise CircuitError("Truncated circuit header")
+        magic, version, num_qubits, count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise CircuitError("Not a serialized circuit")
+        if version != FORMAT_VERSION:
+            raise CircuitError(f"Unsupported circuit format version {version}")
+        expected = _HEADER.size + count * OP_DTYPE.itemsize
+        if len(data) != expected:
+            raise CircuitError(f"Expected {expected} bytes of circuit data, got {len(data)}")
+
+        ops = np.frombuffer(data, dtype=OP_DTYPE, count=count, offset=_HEADER.size)
+        circuit = cls(num_qubits)
+        circuit._validate_records(ops)
+        circuit._ops = ops.copy()
+        circuit._size = count
+        return circuit
+
+    def _validate_records(self, ops):
+        if np.any(ops["opcode"] >= len(OPCODES)):
+            raise CircuitError("Unknown opcode in circuit data")
+        if np.any(ops["arity"] > MAX_ARITY):
+            raise CircuitError("Invalid arity in circuit data")
+        used = np.arange(MAX_ARITY) < ops["arity"][:, None]
+        qubits = ops["qubits"][used]
+        if np.any((qubits < 0) | (qubits >= self.num_qubits)):
+            raise CircuitError("Qubit out of range in circuit data")
+        q = ops["qubits"]
+        for a, b in ((0, 1), (0, 2), (1, 2)):
+            if np.any(used[:, b] & (q[:, a] == q[:, b])):
+                raise CircuitError("Operation repeats a qubit in circuit data")
+        for code in np.unique(ops["opcode"]).tolist():
+            name = OPCODES[code]
+            if name in UNSUPPORTED:
+                raise CircuitError(UNSUPPORTED[name])
+            arity = GATES[name][0] if name in GATES else (None if name == "barrier" else 1)
+            if arity is not None and np.any(ops["arity"][ops["opcode"] == code] != arity):
+                raise CircuitError(f"Wrong number of qubits for '{name}' in circuit data")
+
+    @classmethod
+    def from_json(cls, payload):
+        try:
+            version = int(payload.get("version", FORMAT_VERSION))
+            if version != FORMAT_VERSION:
+                raise CircuitError(f"Unsupported circuit format version {version}")
+            num_qubits = int(payload["num_qubits"])
+            gates = payload.get("gates", [])
+            circuit = cls(num_qubits)
+            for gate in gates:
+                circuit.append(gate["name"], gate.get(
+                    "qubits", []), gate.get("params", []))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise CircuitError(f"Malformed circuit description: {e}") from e
+        return circuit
+
+    def to_json(self):
+        return {
+            "version": FORMAT_VERSION,
+            "num_qubits": self.num_qubits,
+            "gates": [
+                {"name": op.name, "qubits": list(op.qubits), "params": list(op.params)}
+                for op in self
+            ],
+        }
@@ -0,0 +1,130 @@
+# Turns a circuit into the artifacts shown by the frontend: runnable Qiskit
+# code for the code panel and a Quirk link for the circuit editor iframe.
+
+import json
+from urllib.parse import quote
+
+import numpy as np
+
+QUIRK_URL = "https://algassert.com/quirk#circuit="
+
+# Angles that are a small fraction of pi are printed symbolically
+_PI_DENOMINATORS = (1, 2, 3, 4, 6, 8)
+
+
+def format_angle(angle, pi="pi"):
+    for denominator in _PI_DENOMINATORS:
+        numerator = angle * denominator / np.pi
+        if numerator and abs(numerator - round(numerator)) < 1e-9:
+            numerator = round(numerator)
+            sign = "-" if numerator < 0 else ""
+            text = pi if abs(numerator) == 1 else f"{abs(numerator)}*{pi}"
+            return sign + text + ("" if denominator == 1 else f"/{denominator}")
+    return repr(float(angle))
+
+
+def qiskit_code(circuit):
+    measured = [op.qubits[0] for op in circuit if op.name == "measure"]
+    uses_pi = any(
+        format_angle(p) != repr(float(p)) for op in circuit for p in op.params)
+
+    lines = []
+    if uses_pi:
+        lines.append("from math import pi")
+        lines.append("")
+    lines.append("from qiskit import QuantumCircuit")
+    lines.append("")
+    if measured:
+        lines.append(f"qc = QuantumCircuit({circuit.num_qubits}, {len(measured)})")
+    else:
+        lines.append(f"qc = QuantumCircuit({circuit.num_qubits})")
+
+    clbit = 0
+    for op in circuit:
+        if op.name == "measure":
+            lines.append(f"qc.measure({op.qubits[0]}, {clbit})")
+            clbit += 1
+            continue
+        args = [format_angle(p) for p in op.params] + [str(q) for q in op.qubits]
+        lines.append(f"qc.{op.name}({', '.join(args)})")
+
+    lines.append("")
+    lines.append("print(qc)")
+    return "\n".join(lines) + "\n"
+
+
+# Quirk names for gates that need no argument
+_QUIRK_GATES = {
+    "x": "X", "y": "Y", "z": "Z", "h": "H",
+    "s": "Z^½", "sdg": "Z^-½", "t": "Z^¼", "tdg": "Z^-¼", "sx": "X^½",
+    "measure": "Measure",
+}
+_QUIRK_ROTATIONS = {"rx": "Rxft", "ry": "Ryft", "rz": "Rzft"}
+# Controlled gates: target gate name and number of controls
+_QUIRK_CONTROLLED = {
+    "cx": ("x", 1), "cy": ("y", 1), "cz": ("z", 1), "ch": ("h", 1),
+    "crx": ("rx", 1), "cry": ("ry", 1), "crz": ("rz", 1), "cp": ("p", 1),
+    "ccx": ("x", 2), "cswap": ("swap", 1),
+}
+
+
+def _quirk_target(name, params):
+    if name in _QUIRK_GATES:
+        return _QUIRK_GATES[name]
+    if name in _QUIRK_ROTATIONS:
+        return {"id": _QUIRK_ROTATIONS[name], "arg": format_angle(params[0])}
+    if name == "p":
+        # p(lambda) is Z raised to lambda / pi
+        return {"id": "Z^ft", "arg": repr(params[0] / np.pi)}
+    return None
+
+
+def _quirk_columns(name, qubits, params):
+    if name == "u":
+        # u(theta, phi, lambda) = rz(phi) ry(theta) rz(lambda) up to a phase
+        theta, phi, lam = params
+        return (_quirk_columns("rz", qubits, (lam,))
+                + _quirk_columns("ry", qubits, (theta,))
+                + _quirk_columns("rz", qubits, (phi,)))
+
+    column = {}
+    if name == "swap":
+        column = {qubits[0]: "Swap", qubits[1]: "Swap"}
+    elif name in _QUIRK_CONTROLLED:
+        target, num_controls = _QUIRK_CONTROLLED[name]
+        for q in qubits[:num_controls]:
+            column[q] = "•"
+        if target == "swap":
+            column.update({q: "Swap" for q in qubits[num_controls:]})
+        else:
+            column[qubits[num_controls]] = _quirk_target(target, params)
+    else:
+        target = _quirk_target(name, params)
+        if target is not None:
+            column[qubits[0]] = target
+
+    return [column] if column else []
+
+
+def quirk_url(circuit):
+    cols = []
+    # Uncontrolled single-qubit gates on different qubits share a column
+    open_column = None
+    for op in circuit:
+        for column in _quirk_columns(op.name, op.qubits, op.params):
+            single = len(column) == 1 and "•" not in column.values()
+            if single and open_column is not None and not open_column.keys() & column.keys():
+                open_column.update(column)
+                continue
+            cols.append(column)
+            open_column = column if single else None
+
+    width = circuit.num_qubits
+    dense = [[column.get(q, 1) for q in range(width)] for column in cols]
+    # Quirk expects trailing empty slots to be dropped
+    for column in dense:
+        while column and column[-1] == 1:
+            column.pop()
+
+    blob = json.dumps({"cols": dense}, ensure_ascii=False, separators=(",", ":"))
+    return QUIRK_URL + quote(blob, safe="")
@@ -0,0 +1,149 @@
+# Gate definitions shared by the simulators
+#
+# Every gate is described by the number of qubits it acts on, the number of
+# angle parameters it takes and a function building its unitary. Multi-qubit
+# matrices use the textbook ordering: the first qubit in the gate's qubit list
+# is the most significant bit of the matrix index (so the control of "cx" is
+# qubits[0]).
+
+import numpy as np
+
+_SQRT1_2 = 1 / np.sqrt(2)
+
+I2 = np.eye(2, dtype=np.complex128)
+X = np.array([[0, 1], [1, 0]], dtype=np.complex128)
+Y = np.array([[0, -1j], [1j, 0]], dtype=np.complex128)
+Z = np.array([[1, 0], [0, -1]], dtype=np.complex128)
+H = np.array([[1, 1], [1, -1]], dtype=np.complex128) * _SQRT1_2
+S = np.diag([1, 1j]).astype(np.complex128)
+T = np.diag([1, np.exp(1j * np.pi / 4)]).astype(np.complex128)
+SX = np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]], dtype=np.complex128) / 2
+
+
+def rx(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=np.complex128)
+
+
+def ry(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=np.complex128)
+
+
+def rz(theta):
+    return np.diag([np.exp(-0.5j * theta), np.exp(0.5j * theta)])
+
+
+def phase(lam):
+    return np.diag([1, np.exp(1j * lam)]).astype(np.complex128)
+
+
+def u3(theta, phi, lam):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([
+        [c, -np.exp(1j * lam) * s],
+        [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c],
+    ], dtype=np.complex128)
+
+
+def controlled(u):
+    # Controlled version of a k-qubit unitary, control is the first qubit
+    dim = u.shape[0]
+    out = np.eye(2 * dim, dtype=np.complex128)
+    out[dim:, dim:] = u
+    return out
+
+
+SWAP = np.array([
+    [1, 0, 0, 0],
+    [0, 0, 1, 0],
+    [0, 1, 0, 0],
+    [0, 0, 0, 1],
+], dtype=np.complex128)
+
+
+def _const(matrix):
+    return lambda: matrix
+
+
+# name -> (number of qubits, number of params, matrix builder)
+GATES = {
+    "id": (1, 0, _const(I2)),
+    "x": (1, 0, _const(X)),
+    "y": (1, 0, _const(Y)),
+    "z": (1, 0, _const(Z)),
+    "h": (1, 0, _const(H)),
+    "s": (1, 0, _const(S)),
+    "sdg": (1, 0, _const(S.conj().T)),
+    "t": (1, 0, _const(T)),
+    "tdg": (1, 0, _const(T.conj().T)),
+    "sx": (1, 0, _const(SX)),
+    "rx": (1, 1, rx),
+    "ry": (1, 1, ry),
+    "rz": (1, 1, rz),
+    "p": (1, 1, phase),
+    "u": (1, 3, u3),
+    "cx": (2, 0, _const(controlled(X))),
+    "cy": (2, 0, _const(controlled(Y))),
+    "cz": (2, 0, _const(controlled(Z))),
+    "ch": (2, 0, _const(controlled(H))),
+    "swap": (2, 0, _const(SWAP)),
+    "crx": (2, 1, lambda theta: controlled(rx(theta))),
+    "cry": (2, 1, lambda theta: controlled(ry(theta))),
+    "crz": (2, 1, lambda theta: controlled(rz(theta))),
+    "cp": (2, 1, lambda lam: controlled(phase(lam))),
+    "ccx": (3, 0, _const(controlled(controlled(X)))),
+    "cswap": (3, 0, _const(controlled(SWAP))),
+}
+
+# Qiskit spellings that map onto the gates above
+ALIASES = {
+    "i": "id",
+    "cnot": "cx",
+    "toffoli": "ccx",
+    "fredkin": "cswap",
+    "u1": "p",
+    "u3": "u",
+    "cu1": "cp",
+}
+
+# Operations that do not change the statevector used for the plots
+NON_UNITARY = {"measure", "barrier"}
+
+
+def canonical_name(name):
+    name = name.lower()
+    return ALIASES.get(name, name)
+
+
+def gate_matrix(name, params=()):
+    num_qubits, num_params, build = GATES[name]
+    if len(params) != num_params:
+        raise ValueError(
+            f"Gate '{name}' takes {num_params} parameter(s), got {len(params)}")
+    return build(*params)
+
+
+def is_diagonal(name):
+    return name in {"id", "z", "s", "sdg", "t", "tdg", "rz", "p", "cz", "crz", "cp"}
+
+
+# Opcodes used by the binary circuit format. The numbering is part of the
+# format: only ever append to this tuple. "reset" keeps its number but is
+# rejected by Circuit (see UNSUPPORTED).
+OPCODES = (
+    "id", "x", "y", "z", "h", "s", "sdg", "t", "tdg", "sx",
+    "rx", "ry", "rz", "p", "u",
+    "cx", "cy", "cz", "ch", "swap", "crx", "cry", "crz", "cp",
+    "ccx", "cswap",
+    "measure", "barrier", "reset",
+)
+OPCODE = {name: code for code, name in enumerate(OPCODES)}
+
+# Known operations the simulators cannot represent, with the reason. A reset
+# of an entangled qubit leaves a mixed state, which a statevector (and the
+# Bloch spheres drawn from it) cannot show.
+UNSUPPORTED = {
+    "reset": "'reset' is not supported: the simulators track a pure state, "
+             "and resetting an entangled qubit leaves a mixed one",
+}
@@ -0,0 +1,267 @@
+# Out-of-core statevector for circuits that do not fit in RAM
+#
+# The amplitudes live in a numpy.memmap file split into 2**c-amplitude chunks.
+# The low c physical bits index inside a chunk and the high bits pick the
+# chunk, so a gate on low ("local") bits is applied one chunk at a time with
+# only that chunk resident. Before a non-diagonal gate touches a high
+# ("global") bit, that qubit is swapped with a local bit whose next use is
+# furthest away, so later gates on it stay chunk-local. Diagonal gates never
+# need a swap: within a chunk the global bits are constants.
+#
+# Opt in with method="memmap" (over HTTP only where the server sets
+# QUANTUMVIZ_HTTP_MEMMAP_QUBITS), or run a batch job from the command line:
+#
+#     cd api && python -m quantum.ooc circuit.json --chunk-qubits 26 --dir /scratch
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .gates import NON_UNITARY, gate_matrix, is_diagonal
+from .passes import Kernel
+from .statevector import Statevector
+
+CHUNK_QUBITS = int(os.environ.get("QUANTUMVIZ_MEMMAP_CHUNK_QUBITS", 24))
+MEMMAP_DIR = os.environ.get("QUANTUMVIZ_MEMMAP_DIR")
+MAX_QUBITS = 36
+# How many upcoming kernels are considered when picking a qubit to swap out
+LOOKAHEAD = 256
+
+
+class MemmapStatevector:
+    def __init__(self, num_qubits, chunk_qubits=CHUNK_QUBITS, directory=MEMMAP_DIR):
+        if num_qubits > MAX_QUBITS:
+            raise ValueError(
+                f"{num_qubits} qubits exceeds the out-of-core limit of {MAX_QUBITS}")
+        # Three local bits are needed so any gate can be made chunk-local
+        c = min(num_qubits, max(3, chunk_qubits))
+        self.num_qubits = num_qubits
+        self.chunk_qubits = c
+        self.num_chunks = 2 ** (num_qubits - c)
+
+        fd, self.path = tempfile.mkstemp(prefix="statevector-", suffix=".amps", dir=directory)
+        os.close(fd)
+        self.amps = np.memmap(self.path, dtype=np.complex128, mode="w+",
+                              shape=(self.num_chunks, 2 ** c))
+        self.amps[0, 0] = 1.0
+
+        # Logical qubit -> physical bit and back
+        self.perm = list(range(num_qubits))
+        self.where = list(range(num_qubits))
+        self.swaps = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if getattr(self, "amps", None) is not None:
+            self.amps._mmap.close()
+            self.amps = None
+            os.remove(self.path)
+
+    @property
+    def nbytes(self):
+        return self.amps.nbytes
+
+    def _load(self, i):
+        return np.array(self.amps[i])
+
+    # Gates
+
+    def apply(self, name, qubits, params=()):
+        if name in NON_UNITARY:
+            return
+        self.apply_kernel(Kernel(name, qubits, params,
+                                 gate_matrix(name, params), is_diagonal(name)))
+
+    def apply_kernel(self, kernel, upcoming=()):
+        if kernel.diagonal:
+            self._apply_diagonal(kernel)
+            return
+
+        c = self.chunk_qubits
+        if any(self.perm[q] >= c for q in kernel.qubits):
+            self._localize(kernel.qubits, upcoming)
+        phys = [self.perm[q] for q in kernel.qubits]
+        for i in range(self.num_chunks):
+            chunk = Statevector.wrap(self._load(i))
+            chunk.apply_matrix(kernel.matrix, phys)
+            self.amps[i] = chunk.tensor.reshape(-1)
+
+    def _apply_diagonal(self, kernel):
+        c = self.chunk_qubits
+        phys = [self.perm[q] for q in kernel.qubits]
+        local = [j for j, p in enumerate(phys) if p < c]
+        diag = np.diagonal(kernel.matrix).reshape((2,) * len(phys))
+
+        for i in range(self.num_chunks):
+            # Fix the global bits to this chunk's values
+            index = tuple(slice(None) if p < c else (i >> (p - c)) & 1 for p in phys)
+            sub = diag[index]
+            if np.all(sub == 1):
+                continue
+            amps = self._load(i)
+            if local:
+                Statevector.wrap(amps).apply_diagonal(sub.reshape(-1), [phys[j] for j in local])
+            else:
+                amps *= sub
+            self.amps[i] = amps
+
+    def _localize(self, qubits, upcoming):
+        c = self.chunk_qubits
+        next_use = {}
+        for distance, k in enumerate(upcoming):
+            for q in k.qubits:
+                next_use.setdefault(q, distance)
+
+        for q in qubits:
+            if self.perm[q] < c:
+                continue
+            # Evict the local qubit needed last (or never) among those the
+            # current gate does not use
+            candidates = [p for p in range(c) if self.where[p] not in qubits]
+            victim = max(candidates, key=lambda p: next_use.get(self.where[p], len(upcoming)))
+            self._swap_bits(victim, self.perm[q])
+
+    def _swap_bits(self, local, global_):
+        """Exchange a local and a global physical bit across chunk pairs."""
+        c = self.chunk_qubits
+        bit = 1 << (global_ - c)
+        axis = c - 1 - local
+        one = (slice(None),) * axis + (1,)
+        zero = (slice(None),) * axis + (0,)
+        for i0 in range(self.num_chunks):
+            if i0 & bit:
+                continue
+            i1 = i0 | bit
+            a = self._load(i0).reshape((2,) * c)
+            b = self._load(i1).reshape((2,) * c)
+            # (global=0, local=1) <-> (global=1, local=0)
+            held = a[one].copy()
+            a[one] = b[zero]
+            b[zero] = held
+            self.amps[i0] = a.reshape(-1)
+            self.amps[i1] = b.reshape(-1)
+
+        ql, qg = self.where[local], self.where[global_]
+        self.where[local], self.where[global_] = qg, ql
+        self.perm[ql], self.perm[qg] = global_, local
+        self.swaps += 1
+
+    def run_kernels(self, kernels, progress=None):
+        """Apply `kernels` in order; `progress(done, total)` is called after
+        each one."""
+        total = len(kernels)
+        for i, kernel in enumerate(kernels):
+            self.apply_kernel(kernel, kernels[i + 1:i + 1 + LOOKAHEAD])
+            if progress is not None:
+                progress(i + 1, total)
+        self.amps.flush()
+        return self
+
+    # Readout, one chunk (or chunk pair) resident at a time
+
+    def bloch_vectors(self):
+        n, c = self.num_qubits, self.chunk_qubits
+        z = np.zeros(n)
+        rho10 = np.zeros(n, dtype=np.complex128)
+
+        for i in range(self.num_chunks):
+            amps = self._load(i)
+            local = Statevector.wrap(amps).bloch_vectors()
+            for p in range(c):
+                q = self.where[p]
+                z[q] += local[p, 2]
+                rho10[q] += (local[p, 0] + 1j * local[p, 1]) / 2
+            weight = np.vdot(amps, amps).real
+            for p in range(c, n):
+                z[self.where[p]] += -weight if (i >> (p - c)) & 1 else weight
+
+        for p in range(c, n):
+            bit = 1 << (p - c)
+            for i0 in range(self.num_chunks):
+                if not i0 & bit:
+                    rho10[self.where[p]] += np.vdot(self._load(i0), self._load(i0 | bit))
+
+        return np.column_stack([2 * rho10.real, 2 * rho10.imag, z])
+
+    def marginal_probabilities(self, qubits):
+        """Probabilities over `qubits`, indexed with qubits[0] as the lowest bit."""
+        c = self.chunk_qubits
+        phys = [self.perm[q] for q in qubits]
+        local = [(j, p) for j, p in enumerate(phys) if p < c]
+        glob = [(j, p) for j, p in enumerate(phys) if p >= c]
+
+        keep = [c - 1 - p for _, p in reversed(local)]
+        others = tuple(ax for ax in range(c) if ax not in keep)
+        order = np.argsort(np.argsort(keep))
+        # Position of each local marginal entry in the output histogram
+        positions = np.zeros(2 ** len(local), dtype=np.int64)
+        entries = np.arange(2 ** len(local))
+        for bit, (j, _) in enumerate(local):
+            positions |= ((entries >> bit) & 1) << j
+
+        out = np.zeros(2 ** len(qubits))
+        for i in range(self.num_chunks):
+            amps = self._load(i)
+            probs = (amps.real ** 2 + amps.imag ** 2).reshape((2,) * c)
+            marginal = probs.sum(axis=others) if others else probs
+            marginal = np.transpose(marginal, order).reshape(-1)
+            offset = sum(((i >> (p - c)) & 1) << j for j, p in glob)
+            out[positions + offset] += marginal
+        return out / out.sum()
+
+
+def main(argv=None):
+    from .circuit import Circuit
+    from .passes import default_pass_manager
+    from .sampling import sample_counts
+
+    parser = argparse.ArgumentParser(description="Out-of-core statevector simulation")
+    parser.add_argument("circuit", help="circuit JSON file")
+    parser.add_argument("--chunk-qubits", type=int, default=CHUNK_QUBITS,
+                        help="log2 of the amplitudes kept in memory per chunk")
+    parser.add_argument("--dir", default=MEMMAP_DIR, help="directory for the amplitude file")
+    parser.add_argument("--shots", type=int, default=0, help="sample the measured qubits")
+    parser.add_argument("--output", help="write the results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with open(args.circuit, encoding="utf-8") as f:
+        circuit = Circuit.from_json(json.load(f))
+    kernels, stats = default_pass_manager().run(circuit)
+    print(f"{len(circuit)} gates -> {len(kernels)} kernels after optimization", file=sys.stderr)
+
+    start = time.time()
+
+    def progress(done, total):
+        print(f"\r{done}/{total} kernels, {time.time() - start:.1f}s", end="", file=sys.stderr)
+
+    with MemmapStatevector(circuit.num_qubits, args.chunk_qubits, args.dir) as state:
+        state.run_kernels(kernels, progress)
+        print(f"\nDone with {state.swaps} qubit swaps", file=sys.stderr)
+        result = {"bloch_vectors": state.bloch_vectors().tolist(), "passes": stats}
+        measured = circuit.measured_qubits()
+        if args.shots and measured:
+            result["counts"] = sample_counts(state, measured, args.shots)
+
+    text = json.dumps(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Optimization passes run on a circuit before dense simulation
+#
+# Passes work on a flat list of kernels, each a unitary matrix plus the qubits
+# it acts on. The pipeline first cancels gates against their inverses (looking
+# through gates they commute with), then fuses runs of single-qubit gates into
+# one 2x2 unitary and finally merges everything acting on the same pair of
+# qubits into one 4x4 unitary. Fewer, denser kernels mean fewer passes over
+# the statevector.
+#
+# New passes subclass Pass and are handed to a PassManager.
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .gates import NON_UNITARY, SWAP, gate_matrix, is_diagonal
+
+Kernel = namedtuple("Kernel", ["name", "qubits", "params", "matrix", "diagonal"])
+
+_TOL = 1e-10
+_I2 = np.eye(2, dtype=np.complex128)
+
+
+def kernels_from_circuit(circuit):
+    # Measurements, barriers and resets do not enter the statevector
+    return [
+        Kernel(op.name, op.qubits, op.params,
+               gate_matrix(op.name, op.params), is_diagonal(op.name))
+        for op in circuit if op.name not in NON_UNITARY
+    ]
+
+
+def depth(kernels):
+    levels = {}
+    deepest = 0
+    for k in kernels:
+        level = 1 + max((levels.get(q, 0) for q in k.qubits), default=0)
+        for q in k.qubits:
+            levels[q] = level
+        deepest = max(deepest, level)
+    return deepest
+
+
+def is_identity(matrix):
+    # Identity up to a global phase
+    phase = matrix[0, 0]
+    if abs(abs(phase) - 1) > _TOL:
+        return False
+    return np.allclose(matrix, phase * np.eye(len(matrix)), atol=_TOL)
+
+
+def _is_diagonal_matrix(matrix):
+    return np.allclose(matrix, np.diag(np.diagonal(matrix)), atol=_TOL)
+
+
+def _fused(qubits, matrix, parts):
+    # Keep the original kernel when nothing was actually merged
+    if len(parts) == 1:
+        return parts[0]
+    return Kernel("unitary", qubits, (), matrix, _is_diagonal_matrix(matrix))
+
+
+class Pass:
+    name = "pass"
+
+    def run(self, kernels):
+        raise NotImplementedError
+
+
+class CancelInverses(Pass):
+    """Drop pairs of gates that multiply to the identity.
+
+    The partner of a gate is searched backwards past gates on other qubits
+    and past diagonal gates when the gate itself is diagonal, since those
+    commute.
+    """
+
+    name = "cancel_inverses"
+
+    def __init__(self, lookback=64):
+        self.lookback = lookback
+
+    def run(self, kernels):
+        out = []
+        for k in kernels:
+            if is_identity(k.matrix):
+                continue
+            partner = self._find_partner(out, k)
+            if partner is None:
+                out.append(k)
+            else:
+                out[partner] = None
+        return [k for k in out if k is not None]
+
+    def _find_partner(self, out, k):
+        qubits = set(k.qubits)
+        seen = 0
+        for i in range(len(out) - 1, -1, -1):
+            other = out[i]
+            if other is None or qubits.isdisjoint(other.qubits):
+                continue
+            if other.qubits == k.qubits and is_identity(k.matrix @ other.matrix):
+                return i
+            if not (k.diagonal and other.diagonal):
+                return None
+            seen += 1
+            if seen >= self.lookback:
+                return None
+        return None
+
+
+class FuseSingleQubit(Pass):
+    """Multiply each run of single-qubit gates on a qubit into one 2x2."""
+
+    name = "fuse_single_qubit"
+
+    def run(self, kernels):
+        out = []
+        pending = {}  # qubit -> (matrix, kernels)
+
+        def flush(q):
+            matrix, parts = pending.pop(q)
+            if not is_identity(matrix):
+                out.append(_fused((q,), matrix, parts))
+
+        for k in kernels:
+            if len(k.qubits) == 1:
+                q = k.qubits[0]
+                matrix, parts = pending.get(q, (_I2, []))
+                pending[q] = (k.matrix @ matrix, parts + [k])
+                continue
+            for q in k.qubits:
+                if q in pending:
+                    flush(q)
+            out.append(k)
+
+        for q in list(pending):
+            flush(q)
+        return out
+
+
+class FuseTwoQubitBlocks(Pass):
+    """Merge gates confined to the same pair of qubits into one 4x4.
+
+    Single-qubit gates directly before a block are absorbed into it as well.
+    """
+
+    name = "fuse_two_qubit_blocks"
+
+    def run(self, kernels):
+        out = []
+        blocks = {}   # pair -> [matrix, parts]
+        owner = {}    # qubit -> pair of its open block
+        single = {}   # qubit -> single-qubit kernel waiting for a block
+
+        def close(pair):
+            matrix, parts = blocks.pop(pair)
+            for q in pair:
+                del owner[q]
+            out.append(_fused(pair, matrix, parts))
+
+        def release(q):
+            if q in owner:
+                close(owner[q])
+            if q in single:
+                out.append(single.pop(q))
+
+        for k in kernels:
+            if len(k.qubits) == 1:
+                q = k.qubits[0]
+                if q in owner:
+                    pair = owner[q]
+                    blocks[pair][0] = self._embed(k, pair) @ blocks[pair][0]
+                    blocks[pair][1].append(k)
+                else:
+                    if q in single:
+                        out.append(single.pop(q))
+                    single[q] = k
+                continue
+
+            if len(k.qubits) == 2:
+                pair = tuple(k.qubits)
+                if owner.get(pair[0]) is not None and owner.get(pair[0]) == owner.get(pair[1]):
+                    pair = owner[pair[0]]
+                    blocks[pair][0] = self._embed(k, pair) @ blocks[pair][0]
+                    blocks[pair][1].append(k)
+                    continue
+                for q in pair:
+                    if q in owner:
+                        close(owner[q])
+                # Start the block with any single-qubit gates waiting on it
+                matrix = np.eye(4, dtype=np.complex128)
+                parts = []
+                for q in pair:
+                    if q in single:
+                        s = single.pop(q)
+                        matrix = self._embed(s, pair) @ matrix
+                        parts.append(s)
+                blocks[pair] = [self._embed(k, pair) @ matrix, parts + [k]]
+                owner[pair[0]] = owner[pair[1]] = pair
+                continue
+
+            for q in k.qubits:
+                release(q)
+            out.append(k)
+
+        for pair in list(blocks):
+            close(pair)
+        out.extend(single.values())
+        return out
+
+    @staticmethod
+    def _embed(k, pair):
+        # The kernel's matrix on the pair, first qubit most significant
+        if len(k.qubits) == 1:
+            if k.qubits[0] == pair[0]:
+                return np.kron(k.matrix, _I2)
+            return np.kron(_I2, k.matrix)
+        if k.qubits == pair:
+            return k.matrix
+        return SWAP @ k.matrix @ SWAP
+
+
+class PassManager:
+    def __init__(self, passes):
+        self.passes = list(passes)
+
+    def run(self, circuit):
+        """Optimized kernels for `circuit` and per-pass statistics."""
+        kernels = kernels_from_circuit(circuit)
+        stats = []
+        for p in self.passes:
+            before, depth_before = len(kernels), depth(kernels)
+            start = time.perf_counter()
+            kernels = p.run(kernels)
+            stats.append({
+                "pass": p.name,
+                "gates_before": before,
+                "gates_after": len(kernels),
+                "depth_before": depth_before,
+                "depth_after": depth(kernels),
+                "seconds": time.perf_counter() - start,
+            })
+        return kernels, stats
+
+
+def default_pass_manager():
+    return PassManager([CancelInverses(), FuseSingleQubit(), FuseTwoQubitBlocks()])
@@ -0,0 +1,70 @@
+# Plotly rendering of the per-qubit Bloch spheres served under /plots
+
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+PLOT_FILENAME = "qubit_{}_bloch_sphere.html"
+
+# The sphere mesh is the same for every plot, so build it once
+_u, _v = np.mgrid[0:2 * np.pi:40j, 0:np.pi:20j]
+_SPHERE = (np.cos(_u) * np.sin(_v), np.sin(_u) * np.sin(_v), np.cos(_v))
+
+
+def bloch_sphere_figure(vector, title):
+    x, y, z = (float(c) for c in vector)
+    sx, sy, sz = _SPHERE
+
+    fig = go.Figure()
+    fig.add_trace(go.Surface(
+        x=sx, y=sy, z=sz, opacity=0.15, showscale=False,
+        colorscale=[[0, "#6b7280"], [1, "#6b7280"]], hoverinfo="skip"))
+
+    # Reference axes with the usual state labels at the poles
+    for end, label in (((1, 0, 0), "|+⟩"), ((0, 1, 0), "|+i⟩"), ((0, 0, 1), "|0⟩"), ((0, 0, -1), "|1⟩")):
+        fig.add_trace(go.Scatter3d(
+            x=[0, end[0]], y=[0, end[1]], z=[0, end[2]], mode="lines+text",
+            text=["", label], line=dict(color="#9ca3af", width=2),
+            hoverinfo="skip", showlegend=False))
+
+    fig.add_trace(go.Scatter3d(
+        x=[0, x], y=[0, y], z=[0, z], mode="lines",
+        line=dict(color="#ec4899", width=6), showlegend=False,
+        hovertemplate=f"x={x:.3f}<br>y={y:.3f}<br>z={z:.3f}<extra></extra>"))
+    if x or y or z:
+        fig.add_trace(go.Cone(
+            x=[x], y=[y], z=[z], u=[x], v=[y], w=[z], sizemode="absolute",
+            sizeref=0.15, anchor="tip", showscale=False,
+            colorscale=[[0, "#ec4899"], [1, "#ec4899"]], hoverinfo="skip"))
+
+    axis = dict(range=[-1.1, 1.1], showbackground=False, visible=False)
+    fig.update_layout(
+        title=title, template="plotly_dark", showlegend=False,
+        margin=dict(l=0, r=0, t=40, b=0),
+        scene=dict(xaxis=axis, yaxis=axis, zaxis=axis, aspectmode="cube"))
+    return fig
+
+
+def render_bloch_spheres(vectors, directory=None, qubits=None):
+    """Render one HTML page per qubit and return them keyed by filename.
+
+    `qubits` restricts rendering to a subset of the vectors. When `directory`
+    is given the pages are also written there so they can be served from
+    /plots.
+    """
+    if qubits is None:
+        qubits = range(len(vectors))
+    html_files = {}
+    for qubit in qubits:
+        filename = PLOT_FILENAME.format(qubit)
+        fig = bloch_sphere_figure(vectors[qubit], f"Qubit {qubit}")
+        html_files[filename] = fig.to_html(include_plotlyjs="cdn", full_html=True)
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        for filename, html in html_files.items():
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                f.write(html)
+
+    return html_files
@@ -0,0 +1,142 @@
+# Measurement sampling for many shots at once
+#
+# Dense states are sampled from the marginal probability vector of the
+# measured qubits: a multinomial draw when the histogram is small, otherwise
+# inverse-CDF sampling (one searchsorted over the cumulative sum) followed by a
+# bincount. Stabilizer states use their affine outcome structure, so neither
+# path loops over shots in Python.
+#
+# Bitstrings follow Qiskit's order: the first measured qubit is the rightmost
+# character.
+
+import numpy as np
+
+from .stabilizer import StabilizerState
+
+# Stabilizer outcomes with at most this many random bits are counted over all
+# 2**k equally likely patterns instead of shot by shot
+_MAX_PATTERN_BITS = 20
+# Dense sampling holds a float64 histogram over every outcome of the measured
+# qubits; this many is 2 GiB, as much as the largest in-memory statevector
+MAX_MARGINAL_QUBITS = 28
+# Random bits drawn at once when sampling stabilizer outcomes shot by shot
+_SLICE_BYTES = 1 << 24
+
+
+def marginal_probabilities(state, qubits):
+    """Probabilities over `qubits`, indexed with qubits[0] as the lowest bit."""
+    if len(qubits) > MAX_MARGINAL_QUBITS:
+        raise ValueError(
+            f"Sampling {len(qubits)} qubits at once exceeds the limit of {MAX_MARGINAL_QUBITS}")
+    if hasattr(state, "marginal_probabilities"):
+        # Out-of-core states reduce chunk by chunk
+        return state.marginal_probabilities(qubits)
+    n = state.num_qubits
+    probs = state.probabilities().reshape((2,) * n)
+    keep = [state.axis(q) for q in reversed(qubits)]
+    others = tuple(ax for ax in range(n) if ax not in keep)
+    marginal = probs.sum(axis=others) if others else probs
+    # sum() leaves the kept axes in increasing order; put them in `keep` order
+    order = np.argsort(np.argsort(keep))
+    marginal = np.transpose(marginal, order).reshape(-1)
+    return marginal / marginal.sum()
+
+
+def outcome_probabilities(state, qubits):
+    """Exact distribution of measuring `qubits`, qubits[0] as the lowest bit."""
+    if not isinstance(state, StabilizerState):
+        return marginal_probabilities(state, qubits)
+    # Every assignment of the random bits is equally likely
+    base, deps = state.outcome_structure(qubits)
+    k = len(deps)
+    m = (np.arange(2 ** k)[:, None] >> np.arange(k)) & 1
+    outcomes = base ^ ((m @ deps) & 1)
+    indices = outcomes.astype(np.int64) @ (1 << np.arange(len(qubits), dtype=np.int64))
+    return np.bincount(indices, minlength=2 ** len(qubits)) / 2 ** k
+
+
+def _bitstrings(indices, width):
+    return [format(i, f"0{width}b") for i in indices]
+
+
+class DenseSampler:
+    def __init__(self, state, qubits, rng):
+        self.width = len(qubits)
+        self.probs = marginal_probabilities(state, qubits)
+        self.rng = rng
+        self._cdf = None
+
+    def sample(self, shots):
+        """Outcome index of every shot."""
+        if self._cdf is None:
+            self._cdf = np.cumsum(self.probs)
+            self._cdf[-1] = 1.0
+        return np.searchsorted(self._cdf, self.rng.random(shots), side="right")
+
+    def counts(self, shots):
+        if len(self.probs) <= shots:
+            hist = self.rng.multinomial(shots, self.probs)
+        else:
+            hist = np.bincount(self.sample(shots), minlength=len(self.probs))
+        nonzero = np.flatnonzero(hist)
+        return dict(zip(_bitstrings(nonzero, self.width), hist[nonzero].tolist()))
+
+
+class StabilizerSampler:
+    def __init__(self, state, qubits, rng):
+        self.width = len(qubits)
+        self.base, self.deps = state.outcome_structure(qubits)
+        self.rng = rng
+        self._patterns = None
+
+    def _outcome_strings(self, bits):
+        # Rows of 0/1 outcomes, first measured qubit last in the string
+        chars = (bits[:, ::-1] + ord("0")).astype(np.uint8)
+        return [row.tobytes().decode() for row in chars]
+
+    def counts(self, shots):
+        k = len(self.deps)
+        if k <= _MAX_PATTERN_BITS and 2 ** k <= shots:
+            if self._patterns is None:
+                m = (np.arange(2 ** k)[:, None] >> np.arange(k)) & 1
+                outcomes = self.base ^ ((m @ self.deps) & 1).astype(np.uint8)
+                self._patterns = self._outcome_strings(outcomes)
+            hist = self.rng.multinomial(shots, np.full(2 ** k, 1 / 2 ** k))
+            counts = {}
+            for i in np.flatnonzero(hist).tolist():
+                counts[self._patterns[i]] = int(hist[i])
+            return counts
+
+        # Shots are drawn in slices of about _SLICE_BYTES of random bits so
+        # memory stays bounded however many shots are asked for
+        deps = self.deps.astype(np.float32)
+        rows = max(1, _SLICE_BYTES // max(k, self.width, 1))
+        counts = {}
+        for start in range(0, shots, rows):
+            bits = self.rng.integers(0, 2, size=(min(rows, shots - start), k), dtype=np.uint8)
+            parity = (bits.astype(np.float32) @ deps).astype(np.int64) & 1
+            keys, hist = np.unique(self.base ^ parity.astype(np.uint8), axis=0, return_counts=True)
+            for key, n in zip(self._outcome_strings(keys), hist.tolist()):
+                counts[key] = counts.get(key, 0) + n
+        return counts
+
+
+def sampler(state, qubits, seed=None):
+    rng = np.random.default_rng(seed)
+    if isinstance(state, StabilizerState):
+        return StabilizerSampler(state, qubits, rng)
+    return DenseSampler(state, qubits, rng)
+
+
+def sample_counts(state, qubits, shots, seed=None):
+    return sampler(state, qubits, seed).counts(shots)
+
+
+def stream_counts(draws, shots, batch_size):
+    """Yield (shots in batch, counts of the batch) from the sampler `draws`
+    until `shots` are drawn."""
+    done = 0
+    while done < shots:
+        batch = min(batch_size, shots - done)
+        yield batch, draws.counts(batch)
+        done += batch
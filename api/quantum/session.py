@@ -0,0 +1,159 @@
+# Incremental re-simulation for interactive circuit editing
+#
+# A circuit is cut into layers (runs of gates on disjoint qubits) and the state
+# after each layer is kept as a checkpoint. Checkpoints are keyed by a hash of
+# the whole gate prefix that produced them, so an edited circuit can resume
+# from the deepest layer boundary whose prefix is unchanged, and sessions
+# editing the same circuit share checkpoints safely.
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from .simulator import choose_method, evolve, initial_state
+
+CHECKPOINT_MEMORY = int(os.environ.get(
+    "QUANTUMVIZ_CHECKPOINT_MEMORY", 512 * 1024 * 1024))
+MAX_SESSIONS = 256
+BLOCH_TOL = 1e-9
+
+
+def prefix_keys(circuit, method, boundaries):
+    # Rolling hash of the operations, sampled at every layer boundary
+    h = hashlib.blake2b(f"{method}:{circuit.num_qubits}".encode(), digest_size=16)
+    keys = []
+    start = 0
+    ops = circuit.ops
+    for end in boundaries:
+        h.update(ops[start:end].tobytes())
+        keys.append(h.copy().hexdigest())
+        start = end
+    return keys
+
+
+class CheckpointCache:
+    """LRU of simulator states bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=CHECKPOINT_MEMORY):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return None
+            self._states.move_to_end(key)
+            return state.copy()
+
+    def put(self, key, state):
+        if state.nbytes > self.max_bytes:
+            return
+        state = state.copy()
+        with self._lock:
+            old = self._states.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._states[key] = state
+            self.nbytes += state.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._states.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def __len__(self):
+        return len(self._states)
+
+
+checkpoints = CheckpointCache()
+
+
+class EditResult:
+    def __init__(self, state, method, bloch_vectors, changed_qubits, resumed_from, layers):
+        self.state = state
+        self.method = method
+        self.bloch_vectors = bloch_vectors
+        self.changed_qubits = changed_qubits
+        # Number of layers reused from a checkpoint
+        self.resumed_from = resumed_from
+        self.layers = layers
+
+
+class SimulationSession:
+    def __init__(self, session_id=None, cache=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.cache = cache if cache is not None else checkpoints
+        self.bloch_vectors = None
+        self._lock = threading.Lock()
+
+    def update(self, circuit, method="auto"):
+        if method == "auto":
+            method = choose_method(circuit)
+        if method == "memmap":
+            raise ValueError("Checkpointed editing does not support the memmap method")
+        boundaries = circuit.layer_boundaries()
+        keys = prefix_keys(circuit, method, boundaries)
+
+        # Deepest layer whose prefix was already simulated
+        state, resumed_from = None, 0
+        for layer in range(len(keys), 0, -1):
+            state = self.cache.get(keys[layer - 1])
+            if state is not None:
+                resumed_from = layer
+                break
+        if state is None:
+            state = initial_state(circuit.num_qubits, method)
+
+        # Space the checkpoints out so one circuit uses at most half the
+        # cache; the final layer is always kept since appending is the most
+        # common edit.
+        fits = max(1, self.cache.max_bytes // (2 * state.nbytes))
+        stride = -(-len(boundaries) // fits)
+
+        start = boundaries[resumed_from - 1] if resumed_from else 0
+        for layer in range(resumed_from, len(boundaries)):
+            end = boundaries[layer]
+            evolve(state, circuit[start:end])
+            if (layer + 1) % stride == 0 or layer == len(boundaries) - 1:
+                self.cache.put(keys[layer], state)
+            start = end
+
+        vectors = state.bloch_vectors()
+        with self._lock:
+            previous = self.bloch_vectors
+            self.bloch_vectors = vectors
+        if previous is None or previous.shape != vectors.shape:
+            changed = list(range(circuit.num_qubits))
+        else:
+            diff = np.abs(vectors - previous).max(axis=1)
+            changed = np.flatnonzero(diff > BLOCH_TOL).tolist()
+
+        return EditResult(state, method, vectors, changed, resumed_from, len(boundaries))
+
+
+class SessionStore:
+    """Editing sessions by id, dropping the least recently used ones."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id=None):
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = SimulationSession(session_id)
+                self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+
+sessions = SessionStore()
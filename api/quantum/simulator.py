@@ -0,0 +1,60 @@
+# Picks the simulation method for a circuit
+#
+# Clifford-only circuits go to the stabilizer tableau, which scales to hundreds
+# of qubits; everything else uses the dense statevector. The memory-mapped
+# out-of-core statevector is never picked automatically; ask for "memmap".
+
+from .passes import default_pass_manager, kernels_from_circuit
+from .stabilizer import StabilizerState, is_clifford
+from .statevector import Statevector
+
+METHODS = ("auto", "statevector", "stabilizer", "memmap")
+
+
+def choose_method(circuit):
+    return "stabilizer" if is_clifford(circuit) else "statevector"
+
+
+def initial_state(num_qubits, method, seed=None):
+    if method == "stabilizer":
+        return StabilizerState(num_qubits, seed=seed)
+    if method == "statevector":
+        return Statevector(num_qubits)
+    if method == "memmap":
+        # Imported here so `python -m quantum.ooc` does not load itself twice
+        from .ooc import MemmapStatevector
+        return MemmapStatevector(num_qubits)
+    raise ValueError(f"Unknown simulation method '{method}'")
+
+
+def evolve(state, operations):
+    # Measurements are left out of the state and sampled separately, so both
+    # methods describe the same pre-measurement state
+    for op in operations:
+        if op.name != "measure":
+            state.apply(op.name, op.qubits, op.params)
+    return state
+
+
+def simulate(circuit, method="auto", seed=None, optimize=True, stats=None):
+    """Final (pre-measurement) state of `circuit`.
+
+    Dense simulation runs the optimization passes first unless `optimize` is
+    false; pass a list as `stats` to receive their per-pass statistics.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown simulation method '{method}'")
+    if method == "auto":
+        method = choose_method(circuit)
+    state = initial_state(circuit.num_qubits, method, seed)
+
+    if method in ("statevector", "memmap") and optimize:
+        kernels, pass_stats = default_pass_manager().run(circuit)
+        if stats is not None:
+            stats.extend(pass_stats)
+        return state.run_kernels(kernels)
+    if method == "memmap":
+        # Kernels let the memmap state look ahead when choosing swaps
+        return state.run_kernels(kernels_from_circuit(circuit))
+    return evolve(state, circuit)
+
@@ -0,0 +1,330 @@
+# Stabilizer (CHP) simulator for Clifford circuits
+#
+# Implements the tableau algorithm of Aaronson and Gottesman, "Improved
+# simulation of stabilizer circuits" (2004). A state of n qubits is described
+# by 2n Pauli generators (n destabilizers followed by n stabilizers), so memory
+# is O(n^2) bits instead of 2^n amplitudes.
+#
+# Each row's X and Z bits are packed into uint64 words, 64 qubits per word.
+# Gates touch one bit column across every row at once, and products of rows are
+# word-wise XORs plus a popcount for the phase.
+
+import numpy as np
+
+from .gates import OPCODE, canonical_name
+
+# Gates the tableau applies natively, everything else is rejected
+CLIFFORD_GATES = {
+    "id", "x", "y", "z", "h", "s", "sdg", "sx",
+    "cx", "cy", "cz", "swap",
+}
+# Rotations are Clifford when the angle is a multiple of pi/2
+CLIFFORD_ROTATIONS = {"rz", "p"}
+NON_UNITARY = {"measure", "barrier"}
+
+# The X and Z tableaus hold 2n rows of n bits each, n^2 / 2 bytes in total
+MAX_QUBITS = 16_384  # 128 MiB of tableau
+
+_ONE = np.uint64(1)
+_ANGLE_TOL = 1e-9
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+    def _popcount(words):
+        as_bytes = np.ascontiguousarray(words).view(np.uint8)
+        return _BYTE_COUNTS[as_bytes].reshape(*words.shape[:-1], -1).sum(axis=-1)
+
+
+def _quarter_turns(angle):
+    # Number of pi/2 turns in `angle`, or None if it is not a multiple of pi/2
+    turns = angle / (np.pi / 2)
+    k = round(turns)
+    if abs(turns - k) > _ANGLE_TOL:
+        return None
+    return k % 4
+
+
+def is_clifford_operation(name, params=()):
+    name = canonical_name(name)
+    if name in CLIFFORD_GATES or name in NON_UNITARY:
+        return True
+    if name in CLIFFORD_ROTATIONS:
+        return _quarter_turns(params[0]) is not None
+    return False
+
+
+_CLIFFORD_OPCODES = [OPCODE[name] for name in CLIFFORD_GATES | NON_UNITARY]
+_ROTATION_OPCODES = [OPCODE[name] for name in CLIFFORD_ROTATIONS]
+
+
+def is_clifford(circuit):
+    ops = circuit.ops
+    plain = np.isin(ops["opcode"], _CLIFFORD_OPCODES)
+    rotations = np.isin(ops["opcode"], _ROTATION_OPCODES)
+    turns = ops["params"][rotations, 0] / (np.pi / 2)
+    return bool(plain.sum() + rotations.sum() == len(ops)
+                and np.all(np.abs(turns - np.round(turns)) <= _ANGLE_TOL))
+
+
+def _product_phase(x, z, r):
+    """Phase exponent (mod 4, in units of i) of the ordered product of rows.
+
+    Equivalent to chaining the paper's rowsum over the rows, but the running
+    product is a prefix XOR so all the g() terms are evaluated in one go.
+    """
+    if len(x) == 0:
+        return 0
+    # Running product before each row is multiplied in
+    px = np.bitwise_xor.accumulate(x, axis=0)
+    pz = np.bitwise_xor.accumulate(z, axis=0)
+    px = np.vstack([np.zeros_like(px[:1]), px[:-1]])
+    pz = np.vstack([np.zeros_like(pz[:1]), pz[:-1]])
+    return (2 * int(r.sum()) + int(_g_sum(x, z, px, pz).sum())) % 4
+
+
+def _g_sum(x1, z1, x2, z2):
+    # Sum over qubits of g(x1, z1, x2, z2): the power of i picked up when the
+    # Pauli (x1, z1) multiplies (x2, z2) from the left.
+    nx1, nz1, nx2, nz2 = ~x1, ~z1, ~x2, ~z2
+    pos = (x1 & z1 & z2 & nx2) | (x1 & nz1 & z2 & x2) | (nx1 & z1 & x2 & nz2)
+    neg = (x1 & z1 & x2 & nz2) | (x1 & nz1 & z2 & nx2) | (nx1 & z1 & x2 & z2)
+    return _popcount(pos) - _popcount(neg)
+
+
+class StabilizerState:
+    def __init__(self, num_qubits, seed=None):
+        if num_qubits > MAX_QUBITS:
+            raise ValueError(
+                f"{num_qubits} qubits exceeds the stabilizer simulator limit of {MAX_QUBITS}")
+        n = num_qubits
+        words = (n + 63) // 64
+        self.num_qubits = n
+        # Rows 0..n-1 are destabilizers, rows n..2n-1 stabilizers
+        self.x = np.zeros((2 * n, words), dtype=np.uint64)
+        self.z = np.zeros((2 * n, words), dtype=np.uint64)
+        self.r = np.zeros(2 * n, dtype=np.uint8)
+        rows = np.arange(n)
+        self.x[rows, rows // 64] = _ONE << (rows % 64).astype(np.uint64)
+        self.z[rows + n, rows // 64] = _ONE << (rows % 64).astype(np.uint64)
+        self.rng = np.random.default_rng(seed)
+
+    def copy(self):
+        other = StabilizerState.__new__(StabilizerState)
+        other.num_qubits = self.num_qubits
+        other.x = self.x.copy()
+        other.z = self.z.copy()
+        other.r = self.r.copy()
+        other.rng = self.rng
+        return other
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.z.nbytes + self.r.nbytes
+
+    @staticmethod
+    def _locate(qubit):
+        return qubit // 64, np.uint64(qubit % 64)
+
+    def _column(self, table, qubit):
+        word, shift = self._locate(qubit)
+        return ((table[:, word] >> shift) & _ONE).astype(np.uint8)
+
+    def _flip(self, table, qubit, bits):
+        word, shift = self._locate(qubit)
+        table[:, word] ^= bits.astype(np.uint64) << shift
+
+    # Elementary gates from the paper
+
+    def h(self, a):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        self.r ^= xa & za
+        diff = xa ^ za
+        self._flip(self.x, a, diff)
+        self._flip(self.z, a, diff)
+
+    def s(self, a):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        self.r ^= xa & za
+        self._flip(self.z, a, xa)
+
+    def cx(self, a, b):
+        xa, za = self._column(self.x, a), self._column(self.z, a)
+        xb, zb = self._column(self.x, b), self._column(self.z, b)
+        self.r ^= xa & zb & (xb ^ za ^ 1)
+        self._flip(self.x, b, xa)
+        self._flip(self.z, a, zb)
+
+    # Paulis only change signs
+
+    def px(self, a):
+        self.r ^= self._column(self.z, a)
+
+    def pz(self, a):
+        self.r ^= self._column(self.x, a)
+
+    def py(self, a):
+        self.r ^= self._column(self.x, a) ^ self._column(self.z, a)
+
+    def apply(self, name, qubits, params=()):
+        name = canonical_name(name)
+        if name == "measure":
+            return self.measure(qubits[0])
+        if name in ("id", "barrier"):
+            return None
+
+        if name in CLIFFORD_ROTATIONS:
+            turns = _quarter_turns(params[0])
+            if turns is None:
+                raise ValueError(f"{name}({params[0]}) is not a Clifford gate")
+            for _ in range(turns):
+                self.s(qubits[0])
+            return None
+
+        a = qubits[0]
+        b = qubits[1] if len(qubits) > 1 else None
+        if name == "x":
+            self.px(a)
+        elif name == "y":
+            self.py(a)
+        elif name == "z":
+            self.pz(a)
+        elif name == "h":
+            self.h(a)
+        elif name == "s":
+            self.s(a)
+        elif name == "sdg":
+            self.pz(a)
+            self.s(a)
+        elif name == "sx":
+            self.h(a)
+            self.s(a)
+            self.h(a)
+        elif name == "cx":
+            self.cx(a, b)
+        elif name == "cz":
+            self.h(b)
+            self.cx(a, b)
+            self.h(b)
+        elif name == "cy":
+            self.pz(b)
+            self.s(b)
+            self.cx(a, b)
+            self.s(b)
+        elif name == "swap":
+            self.cx(a, b)
+            self.cx(b, a)
+            self.cx(a, b)
+        else:
+            raise ValueError(f"Gate '{name}' is not supported by the stabilizer simulator")
+        return None
+
+    def run(self, circuit):
+        for op in circuit:
+            self.apply(op.name, op.qubits, op.params)
+        return self
+
+    def _rowsum_into(self, targets, source):
+        # rowsum(h, source) for every h in `targets` at once; each target only
+        # depends on itself and the source row so they are independent.
+        if len(targets) == 0:
+            return
+        x1, z1 = self.x[source], self.z[source]
+        x2, z2 = self.x[targets], self.z[targets]
+        total = 2 * self.r[targets].astype(np.int64) + 2 * int(self.r[source]) \
+            + _g_sum(x1, z1, x2, z2)
+        self.r[targets] = (total % 4 == 2).astype(np.uint8)
+        self.x[targets] = x2 ^ x1
+        self.z[targets] = z2 ^ z1
+
+    def _stabilizer_product_sign(self, rows):
+        # Sign of the product of the given stabilizer rows (0 for +, 1 for -)
+        phase = _product_phase(self.x[rows], self.z[rows], self.r[rows])
+        return phase // 2
+
+    def _random_row(self, a):
+        # A stabilizer anticommuting with Z_a makes the outcome random
+        n = self.num_qubits
+        rows = np.flatnonzero(self._column(self.x, a)[n:])
+        return rows[0] + n if len(rows) else None
+
+    def _collapse(self, a, p, outcome):
+        n = self.num_qubits
+        others = np.flatnonzero(self._column(self.x, a))
+        others = others[others != p]
+        self._rowsum_into(others, p)
+
+        # Old stabilizer becomes the destabilizer, the new stabilizer is +/- Z_a
+        self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+        self.x[p] = 0
+        self.z[p] = 0
+        word, shift = self._locate(a)
+        self.z[p, word] = _ONE << shift
+        self.r[p] = outcome
+
+    def _deterministic_rows(self, a):
+        # Z_a is (up to sign) the product of the stabilizers whose
+        # destabilizers anticommute with it
+        n = self.num_qubits
+        return np.flatnonzero(self._column(self.x, a)[:n]) + n
+
+    def measure(self, a):
+        p = self._random_row(a)
+        if p is not None:
+            outcome = int(self.rng.integers(2))
+            self._collapse(a, p, outcome)
+            return outcome
+        return int(self._stabilizer_product_sign(self._deterministic_rows(a)))
+
+    def outcome_structure(self, qubits):
+        """Joint distribution of measuring `qubits`, as an affine map.
+
+        Measuring in order, every random outcome adds a fresh fair bit and
+        every deterministic outcome is fixed up to the parity of some earlier
+        random bits (the +/-Z rows they left behind only enter its sign).
+        Returns (base, deps) such that the outcomes for random bits m are
+        base ^ (m @ deps mod 2); deps has one row per random outcome.
+        """
+        state = self.copy()
+        base = np.zeros(len(qubits), dtype=np.uint8)
+        deps = np.zeros((len(qubits), len(qubits)), dtype=np.uint8)
+        random_rows = {}
+        for i, a in enumerate(qubits):
+            p = state._random_row(a)
+            if p is not None:
+                # Collapse onto 0; the other branch only flips this row's sign
+                deps[len(random_rows), i] = 1
+                random_rows[int(p)] = len(random_rows)
+                state._collapse(a, p, 0)
+                continue
+            rows = state._deterministic_rows(a)
+            base[i] = state._stabilizer_product_sign(rows)
+            for row in rows.tolist():
+                if row in random_rows:
+                    deps[random_rows[row], i] ^= 1
+        return base, deps[:len(random_rows)]
+
+    def _pauli_expectation(self, anticommutes):
+        # `anticommutes` marks, for every row, whether it anticommutes with a
+        # single-qubit Pauli P. P has expectation +/-1 if it commutes with all
+        # stabilizers and 0 otherwise.
+        n = self.num_qubits
+        if anticommutes[n:].any():
+            return 0.0
+        rows = np.flatnonzero(anticommutes[:n]) + n
+        return -1.0 if self._stabilizer_product_sign(rows) else 1.0
+
+    def bloch_vectors(self):
+        n = self.num_qubits
+        vectors = np.zeros((n, 3))
+        for q in range(n):
+            xq, zq = self._column(self.x, q), self._column(self.z, q)
+            vectors[q] = (
+                self._pauli_expectation(zq),
+                self._pauli_expectation(xq ^ zq),
+                self._pauli_expectation(xq),
+            )
+        return vectors
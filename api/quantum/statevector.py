@@ -0,0 +1,133 @@
+# Dense statevector simulator
+#
+# The state of n qubits is kept as a complex128 tensor of shape (2,) * n so a
+# k-qubit gate is a single tensordot over k axes instead of a loop over
+# amplitudes. Qubit q lives on axis n - 1 - q, which keeps the flattened
+# amplitudes in Qiskit's little-endian order (qubit 0 is the lowest bit).
+
+import numpy as np
+
+from .gates import NON_UNITARY, gate_matrix, is_diagonal
+
+MAX_QUBITS = 28  # 4 GiB of complex128 amplitudes
+
+
+class Statevector:
+    def __init__(self, num_qubits):
+        if num_qubits > MAX_QUBITS:
+            raise ValueError(
+                f"{num_qubits} qubits exceeds the dense simulator limit of {MAX_QUBITS}")
+        self.num_qubits = num_qubits
+        self.tensor = np.zeros((2,) * num_qubits, dtype=np.complex128)
+        self.tensor[(0,) * num_qubits] = 1.0
+
+    @classmethod
+    def wrap(cls, amplitudes):
+        """Statevector over an existing amplitude array, without copying it.
+
+        Diagonal gates update the array in place; other gates replace
+        `tensor`, so callers that own the buffer copy it back.
+        """
+        state = cls.__new__(cls)
+        state.num_qubits = int(np.log2(amplitudes.size))
+        state.tensor = amplitudes.reshape((2,) * state.num_qubits)
+        return state
+
+    def axis(self, qubit):
+        return self.num_qubits - 1 - qubit
+
+    def copy(self):
+        other = Statevector.__new__(Statevector)
+        other.num_qubits = self.num_qubits
+        other.tensor = self.tensor.copy()
+        return other
+
+    @property
+    def nbytes(self):
+        return self.tensor.nbytes
+
+    @property
+    def amplitudes(self):
+        return self.tensor.reshape(-1)
+
+    def apply_matrix(self, matrix, qubits):
+        k = len(qubits)
+        axes = [self.axis(q) for q in qubits]
+        u = matrix.reshape((2,) * (2 * k))
+        # Contract the gate's input legs with the target axes; tensordot puts
+        # the gate's output legs first so they are moved back into place.
+        out = np.tensordot(u, self.tensor, axes=(list(range(k, 2 * k)), axes))
+        self.tensor = np.moveaxis(out, list(range(k)), axes)
+
+    def apply_diagonal(self, diagonal, qubits):
+        # Diagonal gates are an elementwise product broadcast over the
+        # untouched axes, which avoids the transpose done by tensordot.
+        k = len(qubits)
+        shape = [1] * self.num_qubits
+        for q in qubits:
+            shape[self.axis(q)] = 2
+        # Reorder the diagonal so its legs follow the tensor's axis order
+        diag = diagonal.reshape((2,) * k)
+        order = np.argsort([self.axis(q) for q in qubits])
+        diag = np.transpose(diag, order).reshape(shape)
+        self.tensor *= diag
+
+    def apply(self, name, qubits, params=()):
+        if name in NON_UNITARY:
+            return
+        matrix = gate_matrix(name, params)
+        if is_diagonal(name):
+            self.apply_diagonal(np.diagonal(matrix), qubits)
+        else:
+            self.apply_matrix(matrix, qubits)
+
+    def apply_kernel(self, kernel):
+        if kernel.diagonal:
+            self.apply_diagonal(np.diagonal(kernel.matrix), kernel.qubits)
+        else:
+            self.apply_matrix(kernel.matrix, kernel.qubits)
+
+    def run_kernels(self, kernels):
+        for kernel in kernels:
+            self.apply_kernel(kernel)
+        return self
+
+    def run(self, circuit):
+        for op in circuit:
+            self.apply(op.name, op.qubits, op.params)
+        return self
+
+    def probabilities(self):
+        amps = self.amplitudes
+        return amps.real ** 2 + amps.imag ** 2
+
+    def bloch_vectors(self):
+        """Bloch vector of every qubit's reduced state, shape (n, 3).
+
+        z comes from the single-qubit marginals of |psi|^2, all read off one
+        (2,) * n probability tensor. x and y come from rho_10 = <a0|a1>, the
+        overlap of the amplitudes with that qubit's bit at 0 and at 1.
+        """
+        n = self.num_qubits
+        vectors = np.empty((n, 3))
+        probs = self.tensor.real ** 2 + self.tensor.imag ** 2
+        # Peel off the leading axis each step: its marginal is a sum over the
+        # rest, and the rest summed over it feeds the next axis, so all n
+        # marginals cost about two passes over the state in total
+        for ax in range(n):
+            halves = probs.reshape(2, -1)
+            p0, p1 = halves.sum(axis=1)
+            vectors[n - 1 - ax, 2] = p0 - p1
+            probs = halves[0] + halves[1]
+        # rho_10 pairs different amplitudes for every qubit, so it is one
+        # contraction per axis; the interleaved float view lets each be a
+        # pair of einsums over views instead of copying conj(a0) and a1
+        floats = self.amplitudes.view(np.float64)
+        for ax in range(n):
+            v = floats.reshape(2 ** ax, 2, -1, 2)
+            a0, a1 = v[:, 0], v[:, 1]
+            re = np.einsum("ijk,ijk->", a0, a1)
+            im = (np.einsum("ij,ij->", a0[..., 0], a1[..., 1])
+                  - np.einsum("ij,ij->", a0[..., 1], a1[..., 0]))
+            vectors[n - 1 - ax, :2] = (2 * re, 2 * im)
+        return vectors
@@ -0,0 +1,393 @@
+# Speech to text while the recording is still arriving
+#
+# Audio comes in as it is recorded, either as a chunked request body or as
+# one request per chunk for clients that cannot stream an upload. Each chunk
+# is decoded to 16 kHz mono PCM into a bounded ring buffer. Raw PCM
+# (audio/pcm little-endian, audio/L16 big-endian) at that rate is read
+# directly. Anything else, such as WebM/Opus from MediaRecorder, goes through
+# an ffmpeg process that is fed the bytes as they arrive.
+#
+# Whenever PARTIAL_SECONDS of new audio have come in, the buffered audio is
+# transcribed in the background to give a partial transcript. At a pause, or
+# after SEGMENT_SECONDS at most, the audio so far is committed: it is
+# transcribed once more, its text is kept, and its samples leave the buffer.
+# When the recording ends, only the audio since the last pause is still
+# untranscribed, so the prompt is ready soon after the user stops talking.
+
+import io
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import uuid
+import wave
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import requests
+
+TRANSCRIBE_API_URL = "https://api.openai.com/v1/audio/transcriptions"
+TRANSCRIBE_MODEL = os.environ.get("QUANTUMVIZ_TRANSCRIBE_MODEL", "whisper-1")
+FFMPEG = os.environ.get("QUANTUMVIZ_FFMPEG", "ffmpeg")
+
+SAMPLE_RATE = 16000
+# Upper bound on buffered audio; commits keep it well below this
+BUFFER_SECONDS = 60
+PARTIAL_SECONDS = 2.0
+# Segments are committed at a pause once they are this long...
+MIN_SEGMENT_SECONDS = 3.0
+# ...and cut at the quietest moment of the last CUT_WINDOW_SECONDS if the
+# speaker never pauses
+SEGMENT_SECONDS = 20.0
+CUT_WINDOW_SECONDS = 2.0
+PAUSE_SECONDS = 0.5
+# Loudness is measured over 20 ms frames; below SILENCE_RMS (of 32767)
+# counts as quiet. Quiet segments are not sent, since speech models
+# tend to make up words for silence.
+FRAME = SAMPLE_RATE // 50
+SILENCE_RMS = 300
+# Characters of the transcript so far sent along to keep segments consistent
+PROMPT_CHARS = 200
+MAX_STREAMS = 64
+
+RAW_FORMATS = {"audio/pcm": "s16le", "audio/l16": "s16be"}
+
+
+class TranscribeError(RuntimeError):
+    pass
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of int16 samples; once it is full the oldest
+    samples are overwritten (and counted in `dropped`)."""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, samples):
+        capacity = len(self.data)
+        n = len(samples)
+        if n >= capacity:
+            self.dropped += self.size + n - capacity
+            self.data[:] = samples[n - capacity:]
+            self.start, self.size = 0, capacity
+            return
+        overflow = self.size + n - capacity
+        if overflow > 0:
+            self.discard(overflow)
+            self.dropped += overflow
+        end = (self.start + self.size) % capacity
+        first = min(n, capacity - end)
+        self.data[end:end + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.size += n
+
+    def discard(self, n):
+        """Drop the oldest `n` samples."""
+        n = min(n, self.size)
+        self.start = (self.start + n) % len(self.data)
+        self.size -= n
+
+    def view(self, start=0, end=None):
+        """Copy of samples [start, end), counted from the oldest."""
+        end = self.size if end is None else min(end, self.size)
+        capacity = len(self.data)
+        first = (self.start + start) % capacity
+        length = max(0, end - start)
+        if first + length <= capacity:
+            return self.data[first:first + length].copy()
+        return np.concatenate((self.data[first:], self.data[:first + length - capacity]))
+
+
+class PcmDecoder:
+    """16-bit mono PCM already at SAMPLE_RATE."""
+
+    def __init__(self, dtype="<i2"):
+        self.dtype = dtype
+        self._carry = b""
+
+    def feed(self, data):
+        data = self._carry + data
+        end = len(data) - len(data) % 2
+        self._carry = data[end:]
+        return np.frombuffer(data[:end], dtype=self.dtype).astype(np.int16)
+
+    def close(self):
+        return np.zeros(0, dtype=np.int16)
+
+
+class FfmpegDecoder:
+    """Any format ffmpeg reads, decoded as the bytes are fed in."""
+
+    def __init__(self, input_args=()):
+        if shutil.which(FFMPEG) is None:
+            raise TranscribeError("Decoding this audio format needs ffmpeg; send audio/pcm instead")
+        # Small probe sizes so decoding starts with the first chunk instead
+        # of after several seconds of input
+        self.process = subprocess.Popen(
+            [FFMPEG, "-loglevel", "error", "-probesize", "32768", "-analyzeduration", "0",
+             *input_args, "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._chunks = queue.SimpleQueue()
+        self._pcm = PcmDecoder()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for chunk in iter(lambda: self.process.stdout.read1(65536), b""):
+            self._chunks.put(chunk)
+
+    def _decoded(self):
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._chunks.get_nowait())
+            except queue.Empty:
+                return self._pcm.feed(b"".join(chunks))
+
+    def feed(self, data):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            self.process.wait()
+            raise TranscribeError(f"Could not decode the audio: {self.process.stderr.read().decode().strip()}")
+        return self._decoded()
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        if self.process.wait() != 0:
+            raise TranscribeError(f"Could not decode the audio: {self.process.stderr.read().decode().strip()}")
+        return self._decoded()
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+def decoder_for(mimetype, params=None):
+    """Decoder for audio of `mimetype`; `params` are its parameters (rate
+    and channels for raw PCM)."""
+    params = params or {}
+    raw = RAW_FORMATS.get(mimetype.lower())
+    if raw is None:
+        return FfmpegDecoder()
+    try:
+        rate = int(params.get("rate", SAMPLE_RATE))
+        channels = int(params.get("channels", 1))
+    except ValueError:
+        raise TranscribeError("rate and channels must be integers") from None
+    if rate == SAMPLE_RATE and channels == 1:
+        return PcmDecoder("<i2" if raw == "s16le" else ">i2")
+    return FfmpegDecoder(["-f", raw, "-ar", str(rate), "-ac", str(channels)])
+
+
+def frame_levels(samples):
+    """RMS loudness of every whole FRAME of `samples`."""
+    frames = samples[:len(samples) - len(samples) % FRAME].reshape(-1, FRAME).astype(np.float64)
+    return np.sqrt((frames * frames).mean(axis=1))
+
+
+def has_speech(samples):
+    return bool(len(samples)) and bool((frame_levels(samples) >= SILENCE_RMS).any())
+
+
+def wav_bytes(samples):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def transcribe_samples(samples, prompt=""):
+    """Text spoken in `samples` (16 kHz mono int16)."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise TranscribeError("OPENAI_API_KEY is not set")
+
+    try:
+        response = requests.post(
+            TRANSCRIBE_API_URL,
+            headers={'Authorization': f'Bearer {api_key}'},
+            data={"model": TRANSCRIBE_MODEL, "prompt": prompt, "response_format": "json"},
+            files={"file": ("audio.wav", wav_bytes(samples), "audio/wav")},
+            timeout=60,
+        )
+    except requests.RequestException as e:
+        raise TranscribeError(f"Could not reach the transcription API: {e}") from e
+    if response.status_code != 200:
+        raise TranscribeError(f"Error {response.status_code}: {response.text}")
+    try:
+        return response.json()["text"].strip()
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise TranscribeError(f"Unexpected transcription response: {response.text[:200]}") from e
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class Transcription:
+    """Transcript of one recording, kept up to date as its audio arrives.
+
+    Transcription runs on `executor`. Segments are (future, start, end), in
+    samples from the beginning of the recording.
+    """
+
+    def __init__(self, executor, mimetype="audio/pcm", params=None, stream_id=None,
+                 transcribe=transcribe_samples):
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.executor = executor
+        self.transcribe = transcribe
+        self.decoder = decoder_for(mimetype, params)
+        self.buffer = RingBuffer(BUFFER_SECONDS * SAMPLE_RATE)
+        self.received = 0
+        self.segments = []
+        self._partial = None
+        self._partial_end = 0
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self):
+        return self.received / SAMPLE_RATE
+
+    def feed(self, data):
+        with self._lock:
+            self._add(self.decoder.feed(data))
+
+    def _add(self, samples):
+        if not len(samples):
+            return
+        self.buffer.append(samples)
+        self.received += len(samples)
+        self._commit_at_pause()
+        if self._partial is None or self._partial[0].done():
+            if self.received - self._partial_end >= PARTIAL_SECONDS * SAMPLE_RATE:
+                self._start_partial()
+
+    def _start_partial(self):
+        start = self.received - len(self.buffer)
+        samples = self.buffer.view()
+        self._partial_end = self.received
+        if has_speech(samples):
+            future = self.executor.submit(self.transcribe, samples, self._prompt())
+            self._partial = (future, start, self.received)
+
+    def _commit_at_pause(self):
+        if len(self.buffer) < MIN_SEGMENT_SECONDS * SAMPLE_RATE:
+            return
+        quiet = frame_levels(self.buffer.view()) < SILENCE_RMS
+        edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        pauses = np.flatnonzero(ends - starts >= PAUSE_SECONDS * SAMPLE_RATE / FRAME)
+        cut = 0
+        if len(pauses):
+            # Middle of the latest pause, so neither side clips a word
+            cut = int(starts[pauses[-1]] + ends[pauses[-1]]) // 2 * FRAME
+        if cut < MIN_SEGMENT_SECONDS * SAMPLE_RATE and len(self.buffer) >= SEGMENT_SECONDS * SAMPLE_RATE:
+            window = int(CUT_WINDOW_SECONDS * SAMPLE_RATE / FRAME)
+            levels = frame_levels(self.buffer.view())
+            cut = (len(levels) - window + int(np.argmin(levels[-window:]))) * FRAME
+        if cut >= MIN_SEGMENT_SECONDS * SAMPLE_RATE:
+            self._commit(cut)
+
+    def _commit(self, length):
+        start = self.received - len(self.buffer)
+        end = start + length
+        samples = self.buffer.view(0, length)
+        self.buffer.discard(length)
+        partial = self._partial
+        if partial is not None and partial[1:] == (start, end):
+            # The latest partial heard exactly this audio
+            future = partial[0]
+        elif has_speech(samples):
+            future = self.executor.submit(self.transcribe, samples, self._prompt())
+        else:
+            future = _done("")
+        self.segments.append((future, start, end))
+
+    def _prompt(self):
+        return self._text(partial=False)[-PROMPT_CHARS:]
+
+    def _text(self, partial=True):
+        texts, covered = [], 0
+        for future, start, end in self.segments:
+            if not future.done():
+                break
+            if future.exception() is None and future.result():
+                texts.append(future.result())
+            covered = end
+        if partial and self._partial is not None:
+            future, start, _ = self._partial
+            # Only a partial that starts where the finished text ends adds
+            # to it; older ones overlap committed audio
+            if start == covered and future.done() and future.exception() is None and future.result():
+                texts.append(future.result())
+        return " ".join(texts)
+
+    @property
+    def text(self):
+        """Transcript so far: committed segments that are done, then the
+        latest partial."""
+        with self._lock:
+            return self._text()
+
+    def finish(self):
+        """Full transcript, once the remaining audio is transcribed; raises
+        TranscribeError if any segment failed."""
+        with self._lock:
+            self._add(self.decoder.close())
+            if len(self.buffer):
+                self._commit(len(self.buffer))
+            segments = list(self.segments)
+        return " ".join(text for text in (future.result() for future, _, _ in segments) if text)
+
+    def close(self):
+        kill = getattr(self.decoder, "kill", None)
+        if kill is not None:
+            kill()
+
+
+class TranscriptionStore:
+    """Recordings sent one chunk per request, by stream id, dropping the
+    least recently used ones."""
+
+    def __init__(self, max_streams=MAX_STREAMS):
+        self.max_streams = max_streams
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, stream_id, create):
+        """The stream `stream_id`, made with `create()` if it is new."""
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                stream = create()
+                self._streams[stream_id] = stream
+            self._streams.move_to_end(stream_id)
+            while len(self._streams) > self.max_streams:
+                _, evicted = self._streams.popitem(last=False)
+                evicted.close()
+            return stream
+
+    def pop(self, stream_id):
+        with self._lock:
+            return self._streams.pop(stream_id, None)
@@ -0,0 +1,416 @@
+# Embedding index for the chatbot's retrieval
+#
+# Chunk embeddings live in one row-major matrix on disk (vectors.bin,
+# float16 by default). The matrix is memory-mapped, so only the pages a
+# search touches are in RAM and the process does not grow with the corpus.
+# Rows are unit length, so the inner product is cosine similarity. New
+# documents are appended in place and the file grows in steps. The row count
+# is committed to index.sqlite3 together with the chunks' text, so a crash
+# mid-append only leaves rows past the count, which are ignored.
+#
+# Two ways to search:
+#
+#   exact  scores every row for a whole batch of queries, one matrix
+#          product per BLOCK_BYTES block of the matrix
+#   ivfpq  an inverted file over k-means centroids, with each row's
+#          residual product-quantized to one byte per subspace. A query
+#          scores the rows of its NPROBE nearest lists from lookup tables,
+#          then re-scores the best RERANK * k candidates exactly
+#
+# "auto" uses ivfpq once it is trained and exact before that. Training
+# starts in the background at IVF_TRAIN_ROWS rows, or on demand with
+# python vectors.py train DIR (which also retrains on a grown corpus).
+#
+#     python vectors.py stats DIR
+#     python vectors.py train DIR [--nlist N] [--subspaces M]
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+LIBRARY_DIR = os.environ.get(
+    "QUANTUMVIZ_LIBRARY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "library"))
+SEARCH_MODE = os.environ.get("QUANTUMVIZ_RETRIEVAL_MODE", "auto")
+# Rows scored per matrix product in exact search, as float32 bytes
+BLOCK_BYTES = 16 * 1024 * 1024
+# The matrix file grows by at least this many rows at a time
+GROW_ROWS = 4096
+IVF_TRAIN_ROWS = int(os.environ.get("QUANTUMVIZ_IVF_TRAIN_ROWS", 20_000))
+# Most rows k-means is trained on
+TRAIN_SAMPLE = 65536
+NPROBE = int(os.environ.get("QUANTUMVIZ_IVF_NPROBE", 32))
+RERANK = 8
+KMEANS_ITERATIONS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    chunks INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    text TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS chunks_by_doc ON chunks (doc_id);
+"""
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def nearest(data, centroids, block=8192):
+    """Index of the nearest centroid (squared L2) for every row of `data`."""
+    half_norms = 0.5 * (centroids * centroids).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), block):
+        scores = np.asarray(data[start:start + block], dtype=np.float32) @ centroids.T - half_norms
+        labels[start:start + block] = scores.argmax(axis=1)
+    return labels
+
+
+def kmeans(data, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """`k` centroids of the rows of `data` (Lloyd's algorithm)."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        labels = nearest(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        present = np.flatnonzero(counts)
+        sums = np.add.reduceat(data[order], np.cumsum(counts)[present] - counts[present], axis=0)
+        centroids[present] = sums / counts[present, None]
+        # Empty clusters restart from random rows
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def _top_k(scores, rows, k):
+    # Best k columns of every row of `scores`, with their `rows` ids
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    return scores, rows
+
+
+class VectorIndex:
+    """Unit-length embeddings of text chunks with the chunks' text, found by
+    inner product."""
+
+    def __init__(self, directory=LIBRARY_DIR, dim=None, dtype="float16", mode=SEARCH_MODE):
+        self.directory = directory
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if meta:
+            if dim is not None and int(meta["dim"]) != dim:
+                raise ValueError(f"{directory} holds {meta['dim']}-dimensional vectors, not {dim}")
+            dim, dtype = int(meta["dim"]), meta["dtype"]
+        elif dim is None:
+            raise ValueError("A new index needs its dimension")
+        else:
+            self.db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                [("dim", str(dim)), ("dtype", dtype), ("count", "0")])
+        self.db.commit()
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.count = int(meta.get("count", 0))
+        self.deleted = np.array([row for row, in self.db.execute(
+            "SELECT row FROM chunks WHERE deleted = 1 AND row < ? ORDER BY row", (self.count,))],
+            dtype=np.int64)
+        self._lock = threading.Lock()
+        self._training = threading.Lock()
+        self._trainer = None
+        self.vectors = self._open("vectors.bin", self.dtype, (dim,))
+        self.ivf = None
+        self._load_ivf()
+
+    def __len__(self):
+        return self.count
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self, name, dtype, row_shape, rows=0):
+        """Memory map of `name` with room for at least `rows` rows."""
+        path = self._path(name)
+        row_bytes = int(np.prod(row_shape)) * np.dtype(dtype).itemsize
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < rows * row_bytes:
+            size = max(rows, size // row_bytes * 2, GROW_ROWS) * row_bytes
+            with open(path, "ab") as f:
+                f.truncate(size)
+        if size == 0:
+            return np.zeros((0, *row_shape), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(size // row_bytes, *row_shape))
+
+    def content_hash(self, doc_id):
+        with self._lock:
+            row = self.db.execute("SELECT content_hash FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def add(self, doc_id, content_hash, vectors, chunks):
+        """Index the chunks of document `doc_id`, replacing any earlier
+        version; `chunks` are dicts with text (and title, url) in the order
+        of `vectors`."""
+        vectors = normalize(vectors).reshape(-1, self.dim)
+        with self._lock:
+            start, end = self.count, self.count + len(vectors)
+            if len(self.vectors) < end:
+                self.vectors = self._open("vectors.bin", self.dtype, (self.dim,), end)
+            self.vectors[start:end] = vectors
+            self.vectors.flush()
+            ivf = self.ivf
+            if ivf is not None:
+                ivf = self._encode(ivf, self.vectors, start, end)
+
+            replaced = [row for row, in self.db.execute(
+                "SELECT row FROM chunks WHERE doc_id = ? AND deleted = 0", (doc_id,))]
+            with self.db:
+                self.db.execute("UPDATE chunks SET deleted = 1 WHERE doc_id = ?", (doc_id,))
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO chunks (row, doc_id, title, url, text) VALUES (?, ?, ?, ?, ?)",
+                    [(start + i, doc_id, c.get("title"), c.get("url"), c["text"]) for i, c in enumerate(chunks)])
+                self.db.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                                (doc_id, content_hash, len(chunks)))
+                self.db.execute("UPDATE meta SET value = ? WHERE key = 'count'", (str(end),))
+                if ivf is not None:
+                    self.db.execute("UPDATE meta SET value = ? WHERE key = 'encoded'", (str(end),))
+            self.count, self.ivf = end, ivf
+            if replaced:
+                self.deleted = np.union1d(self.deleted, replaced).astype(np.int64)
+
+        if self.mode == "auto" and ivf is None and end >= IVF_TRAIN_ROWS:
+            self._train_in_background()
+
+    def chunks(self, rows):
+        """Chunk dicts (row, doc_id, title, url, text) for `rows`."""
+        rows = [int(row) for row in rows]
+        if not rows:
+            return []
+        with self._lock:
+            found = {r[0]: r for r in self.db.execute(
+                f"SELECT row, doc_id, title, url, text FROM chunks WHERE row IN ({','.join('?' * len(rows))})",
+                rows)}
+        return [dict(zip(("row", "doc_id", "title", "url", "text"), found[row])) for row in rows if row in found]
+
+    def search(self, queries, k=8, mode=None):
+        """(scores, rows) of the `k` best rows for each query, best first;
+        rows are -1 where fewer than `k` are indexed."""
+        queries = normalize(queries).reshape(-1, self.dim)
+        with self._lock:
+            vectors, count, deleted, ivf = self.vectors, self.count, self.deleted, self.ivf
+        mode = mode or self.mode
+        if mode == "ivfpq" and ivf is None:
+            raise ValueError("The IVF-PQ index is not trained")
+        if mode != "exact" and ivf is not None and ivf["count"] == count:
+            scores, rows = self._search_ivf(queries, k, vectors, deleted, ivf)
+        else:
+            scores, rows = self._search_exact(queries, k, vectors, count, deleted)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        rows[~np.isfinite(scores)] = -1
+        if scores.shape[1] < k:
+            pad = k - scores.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+        return scores, rows
+
+    def _search_exact(self, queries, k, vectors, count, deleted):
+        n = len(queries)
+        best_scores = np.empty((n, 0), dtype=np.float32)
+        best_rows = np.empty((n, 0), dtype=np.int64)
+        step = max(1, BLOCK_BYTES // (4 * self.dim))
+        for start in range(0, count, step):
+            end = min(start + step, count)
+            scores = queries @ np.asarray(vectors[start:end], dtype=np.float32).T
+            dead = deleted[(deleted >= start) & (deleted < end)]
+            scores[:, dead - start] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            scores, rows = _top_k(scores, rows, k)
+            best_scores, best_rows = _top_k(np.concatenate((best_scores, scores), axis=1),
+                                            np.concatenate((best_rows, rows), axis=1), k)
+        return best_scores, best_rows
+
+    def _search_ivf(self, queries, k, vectors, deleted, ivf):
+        centroids, codebooks, codes, members, offsets = (
+            ivf["centroids"], ivf["codebooks"], ivf["codes"], ivf["members"], ivf["offsets"])
+        m, _, sub = codebooks.shape
+        nprobe = min(NPROBE, len(centroids))
+        coarse = queries @ centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        # Inner product of every query subvector with every codeword
+        tables = np.einsum("nmd,mkd->nmk", queries.reshape(len(queries), m, sub), codebooks)
+        subspaces = np.arange(m)
+
+        results_scores, results_rows = [], []
+        for i, query in enumerate(queries):
+            lists = probes[i]
+            rows = np.concatenate([members[offsets[l]:offsets[l + 1]] for l in lists])
+            list_of_row = np.repeat(lists, offsets[lists + 1] - offsets[lists])
+            scores = coarse[i, list_of_row] + tables[i][subspaces, codes[rows]].sum(axis=1)
+            scores[np.isin(rows, deleted)] = -np.inf
+            candidates = min(len(rows), RERANK * k)
+            if candidates:
+                keep = np.argpartition(-scores, candidates - 1)[:candidates]
+                # Sorted rows read the matrix front to back
+                rows = np.sort(rows[keep])
+                scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+                scores[np.isin(rows, deleted)] = -np.inf
+            scores, rows = _top_k(scores[None], rows[None], k)
+            results_scores.append(np.pad(scores[0], (0, k - scores.shape[1]), constant_values=-np.inf))
+            results_rows.append(np.pad(rows[0], (0, k - rows.shape[1]), constant_values=-1))
+        return np.stack(results_scores), np.stack(results_rows)
+
+    def train(self, nlist=None, subspaces=None):
+        """Train IVF-PQ on the rows indexed now and encode every row.
+
+        Searches and adds carry on meanwhile; the new lists replace the old
+        ones (if any) once they cover every row.
+        """
+        with self._training:
+            with self._lock:
+                vectors, count = self.vectors, self.count
+            ivf = self._fit(vectors, count, nlist, subspaces)
+            # Indexed rows never change, so most of the encoding needs no lock
+            ivf = self._encode(ivf, vectors, 0, count)
+            with self._lock:
+                ivf = self._encode(ivf, self.vectors, count, self.count)
+                old, self.ivf = self.ivf, ivf
+                with self.db:
+                    self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                        ("ivf_generation", str(ivf["generation"])), ("encoded", str(ivf["count"]))])
+        if old is not None:
+            for name in ("ivf-{}.npz", "codes-{}.bin", "lists-{}.bin"):
+                os.remove(self._path(name.format(old["generation"])))
+
+    def _train_in_background(self):
+        with self._lock:
+            if self._trainer is not None:
+                return
+            self._trainer = threading.Thread(target=self.train, daemon=True)
+        self._trainer.start()
+
+    def _fit(self, vectors, count, nlist=None, subspaces=None):
+        if count < 256:
+            raise ValueError("IVF-PQ needs at least 256 indexed chunks")
+        nlist = min(nlist or int(np.clip(4 * np.sqrt(count), 16, 4096)), count)
+        subspaces = subspaces or max(1, self.dim // 8)
+        if self.dim % subspaces:
+            raise ValueError(f"{subspaces} subspaces do not divide dimension {self.dim}")
+        rng = np.random.default_rng(0)
+        # About 32 rows per centroid is plenty for k-means
+        sample_rows = np.sort(rng.choice(count, min(count, TRAIN_SAMPLE, 32 * max(nlist, 256)), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = kmeans(sample, nlist)
+        residuals = (sample - centroids[nearest(sample, centroids)]).reshape(len(sample), subspaces, -1)
+        codebooks = np.stack([kmeans(np.ascontiguousarray(residuals[:, j]), 256) for j in range(subspaces)])
+
+        generation = (self.ivf["generation"] + 1) if self.ivf is not None else 1
+        np.savez(self._path(f"ivf-{generation}.npz"), centroids=centroids, codebooks=codebooks)
+        return self._ivf(generation, centroids, codebooks, count)
+
+    def _ivf(self, generation, centroids, codebooks, rows, encoded=0):
+        return {"generation": generation, "centroids": centroids, "codebooks": codebooks,
+                "codes": self._open(f"codes-{generation}.bin", np.uint8, (len(codebooks),), rows),
+                "lists": self._open(f"lists-{generation}.bin", np.int32, (), rows),
+                "count": encoded}
+
+    def _load_ivf(self):
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if "ivf_generation" not in meta:
+            return
+        generation = int(meta["ivf_generation"])
+        with np.load(self._path(f"ivf-{generation}.npz")) as saved:
+            centroids, codebooks = saved["centroids"], saved["codebooks"]
+        ivf = self._ivf(generation, centroids, codebooks, self.count, min(int(meta["encoded"]), self.count))
+        self.ivf = self._encode(ivf, self.vectors, ivf["count"], self.count)
+
+    def _encode(self, ivf, vectors, start, end):
+        """`ivf` with rows [start, end) assigned to lists and
+        product-quantized, as a new dict; searches keep using the old one
+        until it is swapped in."""
+        ivf = dict(ivf)
+        centroids, codebooks = ivf["centroids"], ivf["codebooks"]
+        m = len(codebooks)
+        if len(ivf["codes"]) < end:
+            ivf["codes"] = self._open(f"codes-{ivf['generation']}.bin", np.uint8, (m,), end)
+            ivf["lists"] = self._open(f"lists-{ivf['generation']}.bin", np.int32, (), end)
+        step = max(1, BLOCK_BYTES // (4 * self.dim))
+        for block in range(start, end, step):
+            stop = min(block + step, end)
+            rows = np.asarray(vectors[block:stop], dtype=np.float32)
+            lists = nearest(rows, centroids)
+            residuals = (rows - centroids[lists]).reshape(len(rows), m, -1)
+            ivf["lists"][block:stop] = lists
+            ivf["codes"][block:stop] = np.stack(
+                [nearest(residuals[:, j], codebooks[j]) for j in range(m)], axis=1)
+        if end > start:
+            ivf["codes"].flush()
+            ivf["lists"].flush()
+        ivf["count"] = max(ivf["count"], end)
+        lists = np.asarray(ivf["lists"][:ivf["count"]])
+        counts = np.bincount(lists, minlength=len(centroids))
+        # Rows grouped by list, and where each list starts
+        ivf["members"] = np.argsort(lists, kind="stable")
+        ivf["offsets"] = np.concatenate(([0], np.cumsum(counts)))
+        return ivf
+
+    def stats(self):
+        documents = self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "documents": documents,
+            "chunks": self.count - len(self.deleted),
+            "rows": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "matrix_bytes": self.count * self.dim * self.dtype.itemsize,
+            "ivf": None if self.ivf is None else {
+                "lists": len(self.ivf["centroids"]), "subspaces": len(self.ivf["codebooks"]),
+                "encoded": self.ivf["count"]},
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or train the retrieval index")
+    parser.add_argument("command", choices=["stats", "train"])
+    parser.add_argument("directory", nargs="?", default=LIBRARY_DIR)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--subspaces", type=int)
+    args = parser.parse_args(argv)
+
+    index = VectorIndex(args.directory)
+    if args.command == "train":
+        index.train(args.nlist, args.subspaces)
+    print(json.dumps(index.stats(), indent=2))
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
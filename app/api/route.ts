@@ -4,7 +4,7 @@ export async function POST(request: Request) {
   try {
     const body = await request.json();
 
-    const response = await fetch('http://localhost:8080/process-prompt', {
+    const response = await fetch('http://localhost:8080/generate', {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -16,8 +16,10 @@ export async function POST(request: Request) {
       throw new Error('Backend server error');
     }
 
-    const data = await response.json();
-    return NextResponse.json(data);
+    // Pass the newline-delimited JSON parts through as they arrive
+    return new Response(response.body, {
+      headers: { 'Content-Type': 'application/x-ndjson' },
+    });
   } catch (error) {
     console.error('Error:', error);
     return NextResponse.json({ error: 'An error occurred while processing your request.' }, { status: 500 });
@@ -16,6 +16,7 @@ import { ExpandableTextareaWithButtons } from "@/components/ExpandableTextareaWi
 import QuantumVisualization from "@/components/QuantumVisualization";
 import { QuirkyChat } from "@/components/QuirkyChat";
 import micIcon from '@/public/mic.png';
+import { streamTranscription } from "@/lib/transcribe";
 
 export default function Home() {
   const [apiResponse, setApiResponse] = useState<JSON | null>(null);
@@ -24,7 +25,6 @@ export default function Home() {
   const [audioData, setAudioData] = useState<Blob | null>(null);
   const [recordingTime, setRecordingTime] = useState(0);
   const [transcription, setTranscription] = useState("");
-  const [audioChunks, setAudioChunks] = useState<Blob[]>([]);
   const [isTranscribing, setIsTranscribing] = useState(false);
 
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
@@ -50,40 +50,55 @@ export default function Home() {
   }, [isRecording]);
   const handleGenerate = async (input: string) => {
     try {
-      const response = await fetch('http://localhost:8080/process-prompt', {
+      // One request returns the circuit, code and plots as newline-delimited
+      // JSON parts, each sent as soon as the backend has it
+      const response = await fetch('http://localhost:8080/generate', {
         method: 'POST',
         headers: { 
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({ user_input: input }),
       });
-      console.log('getting code');
-      const codeResponse = await fetch('http://localhost:8080/get_qiskit_code', {
-        method: 'POST',
-        headers: { 
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ user_input: input }),
-      });
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Network response was not ok');
       }
-      const data = await response.json();
-      console.log(data);
-      console.log('setting api response');
-      setApiResponse(data);
-      const codeData = await codeResponse.json();
-      console.log(codeData);
-      setCodeApiResponse(codeData);
 
-      // Parse the HTML content from the response
-      if (codeData.html_files) {
-        const parsedHtmlContent: { [key: string]: string } = {};
-        for (const [filename, content] of Object.entries(codeData.html_files)) {
-          parsedHtmlContent[filename] = content as string;
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      let code = '';
+
+      const handlePart = (part: any) => {
+        console.log(part);
+        if (part.type === 'error') {
+          throw new Error(part.error);
+        }
+        if (part.type === 'circuit') {
+          setApiResponse(part.circuit_url);
+          code = part.code;
+          setCodeApiResponse({ code } as any);
+        }
+        if (part.type === 'plots') {
+          setCodeApiResponse({ code, html_files: part.html_files } as any);
+          const parsedHtmlContent: { [key: string]: string } = {};
+          for (const [filename, content] of Object.entries(part.html_files)) {
+            parsedHtmlContent[filename] = content as string;
+          }
+          setHtmlContent(parsedHtmlContent);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() ?? '';
+        for (const line of lines) {
+          if (line.trim()) handlePart(JSON.parse(line));
         }
-        setHtmlContent(parsedHtmlContent);
       }
+      if (buffered.trim()) handlePart(JSON.parse(buffered));
     } catch (error) {
       console.error('Error:', error);
       setApiResponse('An error occurred while processing your request.');
@@ -96,20 +111,29 @@ export default function Home() {
       const mediaRecorder = new MediaRecorder(stream);
       mediaRecorderRef.current = mediaRecorder;
 
-      let audioChunks: Blob[] = [];
+      // Audio goes to the backend while recording, so the transcript is
+      // nearly complete by the time recording stops
+      const transcriptionStream = streamTranscription(setTranscription);
 
       mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
-          audioChunks.push(event.data);
+          transcriptionStream.push(event.data);
         }
       };
 
       mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-        await transcribeAudio(audioBlob);
+        setIsTranscribing(true);
+        try {
+          setTranscription(await transcriptionStream.finish());
+        } catch (error: unknown) {
+          console.error('Error transcribing audio:', error);
+          setTranscription(`An error occurred while transcribing the audio: ${error instanceof Error ? error.message : 'Unknown error'}`);
+        } finally {
+          setIsTranscribing(false);
+        }
       };
 
-      mediaRecorder.start();
+      mediaRecorder.start(250);
       setIsRecording(true);
     } catch (error) {
       console.error('Error accessing microphone:', error);
@@ -124,48 +148,6 @@ export default function Home() {
     }
   };
 
-  const transcribeAudio = async (audioBlob: Blob) => {
-    setIsTranscribing(true);
-    const reader = new FileReader();
-    reader.readAsDataURL(audioBlob);
-    reader.onloadend = async () => {
-      const base64Audio = reader.result as string;
-      const base64Data = base64Audio.split(',')[1];
-
-      console.log('Base64 audio data length:', base64Data.length);
-
-      try {
-        const response = await fetch('http://localhost:8080/transcribe-audio', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ audio_data: base64Data }),
-        });
-
-        if (!response.ok) {
-          const errorText = await response.text();
-          throw new Error(`Network response was not ok: ${response.status} ${response.statusText}. ${errorText}`);
-        }
-
-        const data = await response.json();
-        console.log('Transcription response:', data);
-        setTranscription(data.transcription);
-      } catch (error: unknown) {
-        console.error('Error transcribing audio:', error);
-        setTranscription(`An error occurred while transcribing the audio: ${error instanceof Error ? error.message : 'Unknown error'}`);
-      }
-    };
-    setIsTranscribing(false);
-  };
-
-  // Call transcribeAudio after stopping the recording
-  useEffect(() => {
-    if (!isRecording && audioChunks.length > 0) {
-      transcribeAudio(new Blob(audioChunks, { type: 'audio/wav' }));
-    }
-  }, [isRecording, audioChunks]);
-
   return (
     <div className="min-h-screen bg-black text-white flex flex-col relative overflow-hidden">
       {/* Background gradient */}
@@ -73,20 +73,8 @@ export function ExpandableTextareaWithButtons({
         setApiResponse(data);
         await onGenerate(selectedImage);
       } else if (value.trim()) {
-        // Process text input
-        const response = await fetch('http://localhost:8080/process-prompt', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ user_input: value }),
-        });
-
-        if (!response.ok) {
-          throw new Error('Network response was not ok');
-        }
-
-        const data = await response.json();
-        setApiResponse(data);
-        await onGenerate(data);
+        // The parent runs the whole prompt through /generate once
+        await onGenerate(value);
       }
     } catch (error) {
       console.error('Error:', error);
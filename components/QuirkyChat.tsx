@@ -5,6 +5,7 @@ import Image from 'next/image';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import { cn } from '@/lib/utils';
+import { streamTranscription, type TranscriptionStream } from '@/lib/transcribe';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
@@ -23,9 +24,9 @@ export function QuirkyChat() {
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [isRecording, setIsRecording] = useState(false);
-  const [audioChunks, setAudioChunks] = useState<Blob[]>([]);
   const chatContainerRef = useRef<HTMLDivElement>(null);
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
+  const transcriptionRef = useRef<TranscriptionStream | null>(null);
   const recordingTimerRef = useRef<NodeJS.Timeout | null>(null);
   const [isTranscribing, setIsTranscribing] = useState(false);
 
@@ -40,42 +41,15 @@ export function QuirkyChat() {
   };
 
   const transcribeAudio = async () => {
-    if (audioChunks.length === 0) {
+    const transcriptionStream = transcriptionRef.current;
+    transcriptionRef.current = null;
+    if (!transcriptionStream) {
       console.error('No audio data available');
       return;
     }
 
-    const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-    console.log('Audio blob size:', audioBlob.size);
-
-    const base64Audio = await new Promise<string>((resolve) => {
-      const reader = new FileReader();
-      reader.onloadend = () => resolve(reader.result as string);
-      reader.readAsDataURL(audioBlob);
-    });
-
-    const base64Data = base64Audio.split(',')[1];
-
-    console.log('Base64 audio data length:', base64Data.length);
-
-    const response = await fetch('http://localhost:8080/transcribe-audio', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({ audio_data: base64Data }),
-    });
-
-    if (!response.ok) {
-      const errorText = await response.text();
-      throw new Error(`Network response was not ok: ${response.status} ${response.statusText}. ${errorText}`);
-    }
-
-    const data = await response.json();
-    console.log('Transcription response:', data);
-    const transcribedText = data.transcription;
+    const transcribedText = await transcriptionStream.finish();
     setInputMessage(transcribedText);
-    setAudioChunks([]);
 
     // Automatically send the transcribed message
     await handleSendMessage(transcribedText);
@@ -119,13 +93,18 @@ export function QuirkyChat() {
       const mediaRecorder = new MediaRecorder(stream);
       mediaRecorderRef.current = mediaRecorder;
 
+      // Chunks go to the backend as they are recorded and the partial
+      // transcript fills the input box
+      const transcriptionStream = streamTranscription(setInputMessage);
+      transcriptionRef.current = transcriptionStream;
+
       mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
-          setAudioChunks(chunks => [...chunks, event.data]);
+          transcriptionStream.push(event.data);
         }
       };
 
-      mediaRecorder.start(1000); // Collect data every second
+      mediaRecorder.start(250);
       setIsRecording(true);
     } catch (error) {
       console.error('Error accessing microphone:', error);
@@ -133,13 +112,17 @@ export function QuirkyChat() {
   };
 
   const stopRecording = async () => {
-    if (mediaRecorderRef.current) {
-      mediaRecorderRef.current.stop();
+    const mediaRecorder = mediaRecorderRef.current;
+    if (mediaRecorder) {
+      // The last chunk is handed over before "stop" fires
+      const stopped = new Promise((resolve) => mediaRecorder.addEventListener('stop', resolve, { once: true }));
+      mediaRecorder.stop();
+      mediaRecorder.stream.getTracks().forEach(track => track.stop());
       setIsRecording(false);
       setIsTranscribing(true);
-      setInputMessage('Transcribing audio... Please wait.');
-      
+
       try {
+        await stopped;
         await transcribeAudio();
       } catch (error) {
         console.error('Error during transcription:', error);
@@ -150,12 +133,6 @@ export function QuirkyChat() {
     }
   };
 
-  useEffect(() => {
-    if (!isRecording && audioChunks.length > 0) {
-      // We don't need to do anything here now, as transcription is handled in stopRecording
-    }
-  }, [isRecording, audioChunks]);
-
   return (
     <div className={cn(
       'fixed z-50 transition-all duration-300 ease-in-out',
@@ -0,0 +1,56 @@
+// Sends a recording to the backend while it is still being made. Every chunk
+// MediaRecorder hands over is posted as soon as it exists, and each response
+// carries the transcript so far, so only the last moments of audio are left
+// to transcribe when recording stops. Raw chunks go up as they are, with no
+// base64 or JSON around them.
+const TRANSCRIBE_URL = 'http://localhost:8080/transcribe-audio';
+
+export interface TranscriptionStream {
+  push: (chunk: Blob) => void;
+  finish: () => Promise<string>;
+}
+
+export function streamTranscription(onPartial: (text: string) => void): TranscriptionStream {
+  const url = `${TRANSCRIBE_URL}/${crypto.randomUUID()}`;
+  // Chunks of a compressed recording only decode in order, so each post
+  // waits for the one before it
+  let queue: Promise<void> = Promise.resolve();
+  let pushed = false;
+  let failed: Error | null = null;
+
+  const post = async (chunk: Blob, end: boolean) => {
+    const response = await fetch(end ? `${url}?end=1` : url, {
+      method: 'POST',
+      headers: { 'Content-Type': chunk.type || 'application/octet-stream' },
+      body: chunk,
+    });
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.error ?? `${response.status} ${response.statusText}`);
+    }
+    return data;
+  };
+
+  return {
+    push(chunk: Blob) {
+      pushed = true;
+      queue = queue.then(async () => {
+        if (failed) return;
+        try {
+          const data = await post(chunk, false);
+          if (data.text) onPartial(data.text);
+        } catch (error) {
+          failed = error instanceof Error ? error : new Error(String(error));
+        }
+      });
+    },
+
+    async finish() {
+      await queue;
+      if (failed) throw failed;
+      if (!pushed) return '';
+      const data = await post(new Blob([]), true);
+      return data.transcription as string;
+    },
+  };
+}
@@ -0,0 +1,288 @@
+# Pool of headless browser sessions shared by the spiders
+#
+# Starting Chrome takes seconds, so sessions are created lazily up to a fixed
+# size and handed out with lease()/release(). A session that fails its health
+# check on lease, or has been used max_uses times, is quit and replaced. Each
+# session runs in its own temporary profile directory, removed with it, so
+# cookies and cache never leak between sessions.
+#
+# The driver factory is a setting (BROWSER_DRIVER_FACTORY, a dotted path to a
+# callable taking the profile directory and a headless flag), so a fake
+# driver can stand in for Chrome when exercising the spiders offline.
+
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from scrapy import signals
+from scrapy.utils.misc import load_object
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+def chrome_driver(profile_dir, headless=True):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument("--window-size=1920,1080")
+    return webdriver.Chrome(options=options)
+
+
+EMPTY_PAGE = "<html><head></head><body></body></html>"
+
+
+class FakeDriver:
+    """Stand-in for a Selenium driver that needs no browser.
+
+    file:// URLs are read from disk and anything else is an empty page.
+    Scripts answer the readiness and scroll checks of skyvern.waits as if
+    the page were loaded; no element is ever found.
+    """
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self.current_url = "about:blank"
+        self.page_source = EMPTY_PAGE
+        self.closed = False
+
+    def get(self, url):
+        self._check()
+        self.current_url = url
+        self.page_source = EMPTY_PAGE
+        if url.startswith("file:"):
+            with open(url2pathname(urlparse(url).path), encoding="utf-8") as f:
+                self.page_source = f.read()
+
+    def execute_script(self, script, *args):
+        self._check()
+        if "readyState" in script:
+            return "complete"
+        # Resource counts, scroll offsets and page heights
+        return 0
+
+    def find_elements(self, by, value):
+        self._check()
+        return []
+
+    def find_element(self, by, value):
+        from selenium.common.exceptions import NoSuchElementException
+        self._check()
+        raise NoSuchElementException(f"No element matches {value} in the fake driver")
+
+    def save_screenshot(self, path):
+        self._check()
+        return False
+
+    def quit(self):
+        self.closed = True
+
+    def _check(self):
+        if self.closed:
+            raise RuntimeError("The fake driver has quit")
+
+
+def fake_driver(profile_dir, headless=True):
+    """Driver factory for BROWSER_DRIVER_FACTORY = "skyvern.browser.fake_driver"."""
+    return FakeDriver(profile_dir)
+
+
+def is_healthy(driver):
+    try:
+        driver.execute_script("return 1;")
+        return True
+    except Exception:
+        return False
+
+
+class BrowserSession:
+    def __init__(self, driver, profile_dir):
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.uses = 0
+
+    def close(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class BrowserPool:
+    def __init__(self, factory=chrome_driver, size=2, max_uses=50, health_check=is_healthy):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.health_check = health_check
+        self._idle = []
+        self._leased = {}  # id(driver) -> session
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "recycled": 0, "unhealthy": 0, "leases": 0}
+
+    def __deepcopy__(self, memo):
+        # Scrapy deep-copies settings for every crawler; the pool passed in
+        # BROWSER_POOL is meant to be shared
+        return self
+
+    def _new_session(self):
+        profile_dir = tempfile.mkdtemp(prefix="skyvern-profile-")
+        try:
+            return BrowserSession(self.factory(profile_dir), profile_dir)
+        except BaseException:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+
+    def acquire(self, timeout=None):
+        """A driver for exclusive use until it is released."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The browser pool is closed")
+                if self._idle:
+                    session = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    # Reserve the slot; the browser starts outside the lock
+                    self._created += 1
+                    session = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(f"No browser session free after {timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if session is not None and not self.health_check(session.driver):
+                self.stats["unhealthy"] += 1
+                session.close()
+                session = None
+            if session is None:
+                session = self._new_session()
+                self.stats["created"] += 1
+        except BaseException:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+        session.uses += 1
+        self.stats["leases"] += 1
+        with self._cond:
+            self._leased[id(session.driver)] = session
+        return session.driver
+
+    def release(self, driver, broken=False):
+        with self._cond:
+            session = self._leased.pop(id(driver))
+            retire = broken or self._closed or session.uses >= self.max_uses
+            if not retire:
+                self._idle.append(session)
+            else:
+                self._created -= 1
+                if not broken and not self._closed:
+                    self.stats["recycled"] += 1
+            self._cond.notify()
+        if retire:
+            session.close()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except BaseException:
+            # The page may be in any state; do not hand it to the next user
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    @asynccontextmanager
+    async def lease_async(self, timeout=None):
+        """lease() for coroutines: waiting for a free session happens in a
+        thread so the event loop keeps running."""
+        waiting = asyncio.ensure_future(asyncio.to_thread(self.acquire, timeout))
+        try:
+            driver = await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # The thread cannot be interrupted and may still get a driver;
+            # nobody will use it, so it goes straight back to the pool
+            waiting.add_done_callback(self._release_abandoned)
+            raise
+        broken = False
+        try:
+            yield driver
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def _release_abandoned(self, waiting):
+        if not waiting.cancelled() and waiting.exception() is None:
+            self.release(waiting.result())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.close()
+
+
+def pool_from_settings(settings):
+    factory = load_object(settings.get("BROWSER_DRIVER_FACTORY", "skyvern.browser.chrome_driver"))
+    return BrowserPool(
+        partial(factory, headless=settings.getbool("BROWSER_HEADLESS", True)),
+        size=settings.getint("BROWSER_POOL_SIZE", 2),
+        max_uses=settings.getint("BROWSER_POOL_MAX_USES", 50),
+    )
+
+
+class BrowserPoolExtension:
+    """Opens the pool with the crawl and exposes it as `spider.browser_pool`.
+
+    A pool passed in the BROWSER_POOL setting (for example one the launching
+    script already warmed up) is used instead of creating one.
+    """
+
+    def __init__(self, pool, owned):
+        self.pool = pool
+        self.owned = owned
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pool = settings.get("BROWSER_POOL")
+        owned = pool is None
+        if owned:
+            pool = pool_from_settings(settings)
+        ext = cls(pool, owned)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        spider.browser_pool = self.pool
+
+    def spider_closed(self, spider):
+        if self.owned:
+            self.pool.close()
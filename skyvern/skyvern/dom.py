@@ -0,0 +1,161 @@
+# Page source -> compact skeleton of the elements a spider can act on
+#
+# The page is parsed as a stream of lxml events. Scripts, styles, SVG and
+# the like are dropped together with everything inside them, and only
+# interactive elements (form fields, buttons, links, images, ...) are kept,
+# one line each: the element's absolute XPath followed by its tag with the
+# attributes useful for locating it and a little of its text.
+#
+#     /html/body/div[1]/form/div[1]/textarea <textarea class="gLFyf" name="q" title="Search">
+#
+# Chunks for the LLM are cut by an estimated token budget, and a subtree
+# that fits the budget is never split across chunks.
+
+from io import BytesIO
+
+from lxml import etree
+
+# Dropped with their whole subtree
+SKIPPED_TAGS = {"script", "style", "svg", "noscript", "template", "head", "link", "meta"}
+INTERACTIVE_TAGS = {"input", "textarea", "button", "select", "a", "img", "label", "form", "iframe"}
+INTERACTIVE_ROLES = {"button", "link", "textbox", "searchbox", "combobox", "checkbox", "menuitem", "tab"}
+CONTAINER_TAGS = {"form", "iframe"}
+KEPT_ATTRIBUTES = (
+    "id", "class", "name", "type", "role", "aria-label", "placeholder", "title",
+    "href", "src", "alt", "value", "action", "for",
+)
+
+MAX_ATTRIBUTE_LENGTH = 100
+MAX_TEXT_LENGTH = 80
+# Rough size of a token in characters, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_interactive(el):
+    if el.tag in INTERACTIVE_TAGS:
+        return True
+    attrib = el.attrib
+    return (attrib.get("role") in INTERACTIVE_ROLES or "contenteditable" in attrib
+            or "onclick" in attrib or "tabindex" in attrib)
+
+
+def clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def describe(el, text=""):
+    """The element's tag with its kept attributes and text."""
+    attributes = "".join(
+        f' {name}="{clip(el.attrib[name], MAX_ATTRIBUTE_LENGTH)}"'
+        for name in KEPT_ATTRIBUTES if name in el.attrib
+    )
+    text = clip(text, MAX_TEXT_LENGTH)
+    if text:
+        return f"<{el.tag}{attributes}>{text}</{el.tag}>"
+    return f"<{el.tag}{attributes}>"
+
+
+class _Node:
+    # Lines [start, end) belong to this element's subtree; its own line, if
+    # any, is the last one
+    __slots__ = ("start", "end", "children")
+
+    def __init__(self, start, end, children):
+        self.start = start
+        self.end = end
+        self.children = children
+
+
+class Skeleton:
+    def __init__(self, html_content):
+        self.lines = []
+        self._roots = self._parse(html_content)
+        self._offsets = [0]
+        for line in self.lines:
+            self._offsets.append(self._offsets[-1] + count_tokens(line) + 1)
+
+    def _parse(self, html_content):
+        if isinstance(html_content, str):
+            html_content = html_content.encode("utf-8")
+        events = etree.iterparse(BytesIO(html_content), events=("start", "end"),
+                                 html=True, remove_comments=True, remove_pis=True)
+        skipping = 0
+        stack = [[]]   # child nodes collected for each open element
+        starts = []
+        texts = {}     # element -> its clipped text, for the parent to use
+        for event, el in events:
+            if not isinstance(el.tag, str):
+                continue
+            if event == "start":
+                if skipping or el.tag in SKIPPED_TAGS:
+                    skipping += 1
+                    continue
+                stack.append([])
+                starts.append(len(self.lines))
+                continue
+
+            if skipping:
+                skipping -= 1
+                texts[el] = ""
+                el.clear(keep_tail=True)
+                continue
+
+            text = (el.text or "") + "".join(
+                texts.pop(child, "") + (child.tail or "") for child in el)
+            texts[el] = clip(text, 4 * MAX_TEXT_LENGTH)
+            if is_interactive(el):
+                # The text of a whole form or frame says little about it
+                own_text = "" if el.tag in CONTAINER_TAGS else text
+                self.lines.append(f"{el.getroottree().getpath(el)} {describe(el, own_text)}")
+            children = stack.pop()
+            start = starts.pop()
+            if len(self.lines) > start:
+                stack[-1].append(_Node(start, len(self.lines), children))
+            # Keep the element itself so sibling positions in later paths stay right
+            el.clear(keep_tail=True)
+        return stack[0]
+
+    def tokens(self, start, end):
+        return self._offsets[end] - self._offsets[start]
+
+    def _units(self, node, budget, out):
+        # Largest subtrees that fit the budget, in document order
+        if self.tokens(node.start, node.end) <= budget or not node.children:
+            out.append((node.start, node.end))
+            return
+        position = node.start
+        for child in node.children:
+            if child.start > position:
+                out.append((position, child.start))
+            self._units(child, budget, out)
+            position = child.end
+        if node.end > position:
+            out.append((position, node.end))
+
+    def chunks(self, max_tokens=2000):
+        units = []
+        for root in self._roots:
+            self._units(root, max_tokens, units)
+
+        chunks, current = [], None
+        for start, end in units:
+            if current is not None and self.tokens(current[0], end) <= max_tokens:
+                current = (current[0], end)
+                continue
+            if current is not None:
+                chunks.append(current)
+            current = (start, end)
+        if current is not None:
+            chunks.append(current)
+        return ["\n".join(self.lines[start:end]) for start, end in chunks]
+
+
+def split_html_into_chunks(html_content, max_tokens=2000):
+    """Skeleton of the page's interactive elements, cut into chunks of at most
+    `max_tokens` (estimated) without splitting subtrees that fit."""
+    return Skeleton(html_content).chunks(max_tokens)
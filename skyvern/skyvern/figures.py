@@ -0,0 +1,267 @@
+# Figures straight from the PDF instead of screenshots of the viewer
+#
+# A paper's PDF is downloaded once into PDF_DIR and read from there on later
+# runs. Its pages are processed in small batches in a process pool (the work
+# is CPU-bound, so many papers can be handled in parallel), and figures come
+# back in page order as each batch finishes:
+#
+#   raster  images embedded in the page, extracted as stored (PNG, JPEG, ...)
+#   vector  regions where drawing operators cluster (circuit diagrams are
+#           mostly lines and boxes), rendered to PNG at FIGURE_DPI with the
+#           labels inside them
+#
+# bbox is in PDF points, (x0, y0, x1, y1) from the top left of the page.
+# Needs PyMuPDF (pip install pymupdf).
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+WORKERS = int(os.environ.get("SKYVERN_FIGURE_WORKERS", os.cpu_count() or 1))
+# Smallest figure kept, in points on its shorter side (72 points = 1 inch,
+# a two-qubit circuit is about 40 high); filters out bullets and rules
+MIN_SIZE = 40
+# Drawing operations (lines, curves, rectangles) in a region before it
+# counts as a figure
+MIN_PATHS = 8
+# Paths closer than this (points) belong to the same figure
+GAP = 12
+# Margin rendered around vector figures, for labels just outside the lines
+PADDING = 6
+DPI = 200
+PAGES_PER_TASK = 4
+
+
+def pdf_name(url):
+    """File name for the local copy of the PDF at `url`; arXiv ids are kept
+    (".../pdf/2101.00001v2" -> "2101.00001v2.pdf")."""
+    path = urlparse(url).path.rstrip("/")
+    # Old-style ids keep their archive: /pdf/quant-ph/0406196 -> quant-ph_0406196
+    stem = path.split("/pdf/", 1)[1] if "/pdf/" in path else os.path.basename(path)
+    if stem.endswith(".pdf"):
+        stem = stem[:-len(".pdf")]
+    stem = re.sub(r"[^\w.-]", "_", stem)
+    if not stem:
+        stem = hashlib.blake2b(url.encode(), digest_size=10).hexdigest()
+    return f"{stem}.pdf"
+
+
+def is_pdf(head):
+    """Whether bytes from the start of a file look like a PDF; readers accept
+    the %PDF- header anywhere in the first kilobyte."""
+    return b"%PDF-" in head[:1024]
+
+
+def cached_pdf(path):
+    """Whether `path` holds a PDF (and not, say, an HTML error page saved by
+    an older run)."""
+    try:
+        with open(path, "rb") as f:
+            return is_pdf(f.read(1024))
+    except OSError:
+        return False
+
+
+def save_pdf(directory, name, body):
+    # Interstitials and "PDF unavailable" pages also come with a 200; kept
+    # in PDF_DIR they would break every later run
+    if not is_pdf(body):
+        raise ValueError(f"Not a PDF: {body[:60]!r}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(body)
+    os.replace(tmp, path)
+    return path
+
+
+def _inflate(rect, margin):
+    x0, y0, x1, y1 = rect
+    return (x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _intersection(a, b):
+    return (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+
+
+def _area(rect):
+    return max(0.0, rect[2] - rect[0]) * max(0.0, rect[3] - rect[1])
+
+
+def cluster_rects(rects, gap=GAP):
+    """Group (rect, count) pairs whose rectangles lie within `gap` of each
+    other.
+
+    Returns (bbox, count) per group, the counts of its members summed.
+    """
+    clusters = []
+    for rect, count in sorted(rects, key=lambda r: (r[0][1], r[0][0])):
+        near = _inflate(rect, gap)
+        bbox, keep = rect, []
+        for cluster in clusters:
+            if _intersects(near, cluster[0]):
+                bbox, count = _union(bbox, cluster[0]), count + cluster[1]
+            else:
+                keep.append(cluster)
+        clusters = keep + [(bbox, count)]
+
+    # A merged box can reach clusters none of its members touched
+    merged = True
+    while merged:
+        merged = False
+        for i, (a, na) in enumerate(clusters):
+            for j in range(i + 1, len(clusters)):
+                b, nb = clusters[j]
+                if _intersects(_inflate(a, gap), b):
+                    clusters[i] = (_union(a, b), na + nb)
+                    del clusters[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return clusters
+
+
+def vector_regions(drawings, page_rect, exclude=(), gap=GAP, min_size=MIN_SIZE, min_paths=MIN_PATHS):
+    """Figure-sized clusters of drawing paths on a page, skipping page-wide
+    backgrounds and regions mostly covered by raster images (`exclude`).
+
+    `drawings` holds (bbox, number of drawing operations) per path.
+    """
+    page_area = _area(page_rect)
+    rects = []
+    for rect, count in drawings:
+        if _area(rect) > 0.8 * page_area:
+            continue
+        rects.append((rect, count))
+
+    regions = []
+    for bbox, count in cluster_rects(rects, gap):
+        if count < min_paths or min(bbox[2] - bbox[0], bbox[3] - bbox[1]) < min_size:
+            continue
+        covered = max((_area(_intersection(bbox, image)) for image in exclude), default=0.0)
+        if covered > 0.5 * _area(bbox):
+            continue
+        regions.append(bbox)
+    return regions
+
+
+def page_count(path):
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def extract_pages(path, pages, dpi=DPI, min_size=MIN_SIZE):
+    """Figures on `pages` (0-based) of the PDF at `path`, as dicts with page
+    (1-based), bbox, kind, ext, width, height and image bytes."""
+    import pymupdf
+
+    figures = []
+    with pymupdf.open(path) as doc:
+        for number in pages:
+            page = doc[number]
+            images = []
+            seen = set()
+            for info in page.get_image_info(xrefs=True):
+                bbox = tuple(info["bbox"])
+                xref = info["xref"]
+                # Inline images (xref 0) have no stream of their own and are
+                # left to the vector pass, which renders whatever is there
+                if not xref or xref in seen:
+                    continue
+                if min(bbox[2] - bbox[0], bbox[3] - bbox[1]) < min_size:
+                    continue
+                seen.add(xref)
+                image = doc.extract_image(xref)
+                if not image:
+                    continue
+                images.append(bbox)
+                figures.append({
+                    "page": number + 1, "bbox": bbox, "kind": "raster", "ext": image["ext"],
+                    "width": image["width"], "height": image["height"], "image": image["image"],
+                })
+
+            page_rect = tuple(page.rect)
+            drawings = [(tuple(d["rect"]), len(d["items"])) for d in page.get_drawings()]
+            for bbox in vector_regions(drawings, page_rect, images, min_size=min_size):
+                clip = pymupdf.Rect(_inflate(bbox, PADDING)) & page.rect
+                pixmap = page.get_pixmap(clip=clip, dpi=dpi)
+                figures.append({
+                    "page": number + 1, "bbox": tuple(clip), "kind": "vector", "ext": "png",
+                    "width": pixmap.width, "height": pixmap.height, "image": pixmap.tobytes("png"),
+                })
+    figures.sort(key=lambda f: (f["page"], f["bbox"][1], f["bbox"][0]))
+    return figures
+
+
+def pdf_text(path):
+    """Plain text of the PDF at `path`, page after page."""
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        return _pool
+
+
+async def extract_figures(path, dpi=DPI, min_size=MIN_SIZE, pages_per_task=PAGES_PER_TASK, executor=None):
+    """Figures of the PDF at `path`, in page order.
+
+    Every batch of pages is submitted at once; figures are yielded as soon
+    as the batches before them are done.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or pool()
+    count = await loop.run_in_executor(executor, page_count, path)
+    batches = [
+        loop.run_in_executor(executor, extract_pages, path,
+                             range(start, min(start + pages_per_task, count)), dpi, min_size)
+        for start in range(0, count, pages_per_task)
+    ]
+    try:
+        for batch in batches:
+            for figure in await batch:
+                yield figure
+    finally:
+        for batch in batches:
+            batch.cancel()
+
+
+def first_figure(path, dpi=DPI, min_size=MIN_SIZE):
+    """The first figure of the PDF, preferring vector drawings (circuits are
+    rarely embedded as images), or None. Runs in the calling thread."""
+    fallback = None
+    count = page_count(path)
+    for start in range(0, count, PAGES_PER_TASK):
+        end = min(start + PAGES_PER_TASK, count)
+        for figure in extract_pages(path, range(start, end), dpi, min_size):
+            if figure["kind"] == "vector":
+                return figure
+            fallback = fallback or figure
+    return fallback
@@ -0,0 +1,332 @@
+# Figures straight to the backend's /upload-images, without the web UI
+#
+# Images are prepared locally first: decoded to grayscale, cropped to their
+# content (uniform page-coloured margins are dropped), contrast-stretched
+# and downscaled so the longer side is at most MAX_SIDE, then re-encoded as
+# PNG. Circuit diagrams lose nothing in grayscale and the uploads shrink
+# several-fold. Files go up in batches, one multipart request per batch,
+# and the backend streams a result per image as each is done.
+#
+# IngestPipeline sends FigureItems through this when INGEST_FIGURES is set.
+# Needs Pillow for decoding and encoding.
+#
+# PaperIndexPipeline does the same for the chatbot. When INDEX_PAPERS is
+# set, it posts every paper's abstract and PDF text to the backend's
+# /documents, which adds them to the retrieval index as they arrive.
+
+import asyncio
+import io
+import json
+import os
+
+import aiohttp
+import numpy as np
+import requests
+from scrapy.exceptions import NotConfigured
+
+from skyvern.items import PaperItem, PaperTextItem
+
+INGEST_URL = "http://localhost:8080/upload-images"
+DOCUMENTS_URL = "http://localhost:8080/documents"
+MAX_SIDE = 1024
+BATCH_SIZE = 16
+# Pixels this close to the background level count as margin
+MARGIN_TOLERANCE = 12
+
+
+def _area_resize(gray, height, width):
+    h, w = gray.shape
+    rows = (np.arange(height) * h) // height
+    cols = (np.arange(width) * w) // width
+    sums = np.add.reduceat(np.add.reduceat(gray, rows, axis=0), cols, axis=1)
+    return sums / np.outer(np.diff(np.append(rows, h)), np.diff(np.append(cols, w)))
+
+
+def crop_margins(gray, tolerance=MARGIN_TOLERANCE):
+    """`gray` without the rows and columns around the content that only hold
+    the background (taken to be the median of the border pixels)."""
+    border = np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]])
+    content = np.abs(gray - np.median(border)) > tolerance
+    rows = np.flatnonzero(content.any(axis=1))
+    cols = np.flatnonzero(content.any(axis=0))
+    if not len(rows):
+        return gray
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def normalize(gray):
+    """Stretch the 1st-99th percentile range to the full 0-255 scale."""
+    low, high = np.percentile(gray, (1, 99))
+    if high - low < 1:
+        return gray
+    return np.clip((gray - low) * (255.0 / (high - low)), 0, 255)
+
+
+def prepare_image(data, max_side=MAX_SIDE):
+    """Cropped, normalized and downscaled grayscale PNG of an encoded image;
+    raises ValueError if `data` is not an image."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            gray = np.asarray(image.convert("L"), dtype=np.float64)
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError("Not a readable image") from e
+    gray = normalize(crop_margins(gray))
+    h, w = gray.shape
+    scale = max_side / max(h, w)
+    if scale < 1:
+        gray = _area_resize(gray, max(1, round(h * scale)), max(1, round(w * scale)))
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.round(gray).astype(np.uint8), mode="L").save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _png_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0] + ".png"
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+class IngestClient:
+    def __init__(self, url=INGEST_URL, batch_size=BATCH_SIZE, concurrency=2, timeout=300,
+                 max_side=MAX_SIDE):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_side = max_side
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _post(self, offset, batch):
+        """Parts for one batch of (filename, data), indexed from `offset`."""
+        # Preparing is CPU work; keep it off the event loop
+        prepared = await asyncio.gather(*(
+            asyncio.to_thread(prepare_image, data, self.max_side) for _, data in batch),
+            return_exceptions=True)
+        parts, sent = [], []
+        form = aiohttp.FormData()
+        for i, ((filename, _), data) in enumerate(zip(batch, prepared)):
+            if isinstance(data, ValueError):
+                parts.append({"type": "error", "index": offset + i, "filename": filename,
+                              "error": str(data), "status": 400})
+                continue
+            if isinstance(data, BaseException):
+                raise data
+            sent.append(offset + i)
+            form.add_field("image", data, filename=_png_name(filename), content_type="image/png")
+        if not sent:
+            return parts
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        async with self._semaphore:
+            async with self._session.post(self.url, data=form) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Error {response.status}: {await response.text()}")
+                async for line in response.content:
+                    if line.strip():
+                        part = json.loads(line)
+                        if "index" in part:
+                            part["index"] = sent[part["index"]]
+                        parts.append(part)
+        return parts
+
+    async def upload(self, images):
+        """Results for `images`, a list of (filename, data), as "image" or
+        "error" parts in the order batches finish. Each part's index is the
+        image's position in `images`."""
+        tasks = [asyncio.ensure_future(self._post(offset, batch))
+                 for offset, batch in _batches(images, self.batch_size)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for part in await next_done:
+                    if part["type"] in ("image", "error"):
+                        yield part
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def upload_blocking(paths, url=INGEST_URL, max_side=MAX_SIDE, timeout=300):
+    """Upload image files in one request from a thread without an event
+    loop; yields the "image" and "error" parts as they stream back."""
+    files, sent = [], []
+    for index, path in enumerate(paths):
+        try:
+            with open(path, "rb") as f:
+                data = prepare_image(f.read(), max_side)
+        except ValueError as e:
+            yield {"type": "error", "index": index, "filename": path, "error": str(e), "status": 400}
+            continue
+        sent.append(index)
+        files.append(("image", (_png_name(path), data, "image/png")))
+    if not files:
+        return
+
+    with requests.post(url, files=files, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Error {response.status_code}: {response.text}")
+        for line in response.iter_lines():
+            if line.strip():
+                part = json.loads(line)
+                if part["type"] in ("image", "error"):
+                    part["index"] = sent[part["index"]]
+                    yield part
+
+
+class IngestPipeline:
+    """Sends FigureItems to the backend in batches and adds the circuit
+    read from each one (circuit_hash, circuit_url, code, or ingest_error).
+
+    Items wait until their batch is full or INGEST_LINGER seconds have
+    passed since its first item, so a slow trickle still goes out.
+    """
+
+    def __init__(self, url, batch_size, linger, concurrency):
+        self.client = IngestClient(url, batch_size=batch_size, concurrency=concurrency)
+        self.batch_size = batch_size
+        self.linger = linger
+        self.pending = []  # (item, future)
+        self._flush_later = None
+        self._sending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("INGEST_FIGURES"):
+            raise NotConfigured
+        return cls(settings.get("INGEST_URL", INGEST_URL),
+                   settings.getint("INGEST_BATCH_SIZE", BATCH_SIZE),
+                   settings.getfloat("INGEST_LINGER", 1.0),
+                   settings.getint("INGEST_CONCURRENCY", 2))
+
+    async def process_item(self, item, spider):
+        if item.get("image") is None or item.get("kind") is None:
+            return item
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_later is None:
+            self._flush_later = asyncio.get_running_loop().call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_later is not None:
+            self._flush_later.cancel()
+            self._flush_later = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch):
+        images = [(f"p{item['page']:03d}.{item['ext']}", item["image"]) for item, _ in batch]
+        try:
+            async for part in self.client.upload(images):
+                item, future = batch[part["index"]]
+                if part["type"] == "image":
+                    item["circuit_hash"] = part["circuit_hash"]
+                    item["circuit_url"] = part["circuit_url"]
+                    item["code"] = part["code"]
+                else:
+                    item["ingest_error"] = part["error"]
+                if not future.done():
+                    future.set_result(item)
+        except Exception as e:
+            for item, future in batch:
+                if not future.done():
+                    item["ingest_error"] = str(e)
+        for item, future in batch:
+            if not future.done():
+                future.set_result(item)
+
+    async def close_spider(self, spider):
+        self._flush()
+        await asyncio.gather(*self._sending)
+        await self.client.close()
+
+
+class PaperIndexPipeline:
+    """Posts papers to the backend's retrieval index in batches of
+    INDEX_BATCH_SIZE: the abstract from each PaperItem and the full text
+    from each PaperTextItem, as separate documents."""
+
+    def __init__(self, url, batch_size, stats=None, timeout=300):
+        self.url = url
+        self.batch_size = batch_size
+        self.stats = stats
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.titles = {}  # arxiv_id -> title, for the PDF text documents
+        self.pending = []
+        self._session = None
+        self._sending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("INDEX_PAPERS"):
+            raise NotConfigured
+        return cls(settings.get("DOCUMENTS_URL", DOCUMENTS_URL),
+                   settings.getint("INDEX_BATCH_SIZE", 32), crawler.stats)
+
+    def process_item(self, item, spider):
+        if isinstance(item, PaperItem) and item.get("abstract"):
+            self.titles[item["arxiv_id"]] = item.get("title")
+            self.pending.append({"id": f"arxiv:{item['arxiv_id']}", "title": item.get("title"),
+                                 "url": item.get("url"), "text": item["abstract"]})
+        elif isinstance(item, PaperTextItem) and item.get("text", "").strip():
+            self.pending.append({"id": f"arxiv:{item['arxiv_id']}:pdf",
+                                 "title": self.titles.get(item["arxiv_id"]),
+                                 "url": item.get("url"), "text": item["text"]})
+        if len(self.pending) >= self.batch_size:
+            self._flush(spider)
+        return item
+
+    def _flush(self, spider):
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(spider, batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, spider, documents):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        try:
+            async with self._session.post(self.url, json={"documents": documents}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Error {response.status}: {await response.text()}")
+                result = await response.json()
+        except Exception as e:
+            if self.stats is not None:
+                self.stats.inc_value("index/failed", len(documents))
+            spider.logger.warning(f"Could not index {len(documents)} documents: {e}")
+            return
+        if self.stats is not None:
+            self.stats.inc_value("index/added", len(result["added"]))
+            self.stats.inc_value("index/unchanged", len(result["unchanged"]))
+
+    async def close_spider(self, spider):
+        self._flush(spider)
+        await asyncio.gather(*self._sending)
+        if self._session is not None:
+            await self._session.close()
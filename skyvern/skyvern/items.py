@@ -10,3 +10,41 @@ class SkyvernItem(scrapy.Item):
     # define the fields for your item here like:
     # name = scrapy.Field()
     pass
+
+
+class FigureItem(scrapy.Item):
+    # One figure cut out of a paper's PDF (skyvern.figures)
+    paper = scrapy.Field()    # local PDF file name, e.g. "2101.00001v2.pdf"
+    arxiv_id = scrapy.Field()  # when crawled by the arxiv spider
+    url = scrapy.Field()      # where the PDF came from
+    page = scrapy.Field()     # 1-based page number
+    bbox = scrapy.Field()     # (x0, y0, x1, y1) in PDF points
+    kind = scrapy.Field()     # "raster" or "vector"
+    ext = scrapy.Field()
+    width = scrapy.Field()
+    height = scrapy.Field()
+    image = scrapy.Field()    # encoded image bytes
+    path = scrapy.Field()     # set by FiguresPipeline once written
+    # Set by IngestPipeline from the backend's reading of the figure
+    circuit_hash = scrapy.Field()
+    circuit_url = scrapy.Field()
+    code = scrapy.Field()
+    ingest_error = scrapy.Field()
+
+
+class PaperItem(scrapy.Item):
+    # Metadata of an arXiv paper (skyvern.spiders.arxiv)
+    arxiv_id = scrapy.Field()
+    title = scrapy.Field()
+    authors = scrapy.Field()
+    abstract = scrapy.Field()
+    url = scrapy.Field()      # abstract page
+    pdf_url = scrapy.Field()
+
+
+class PaperTextItem(scrapy.Item):
+    # Full text of an arXiv paper's PDF, for the chatbot's index (only
+    # crawled when INDEX_PAPERS is set)
+    arxiv_id = scrapy.Field()
+    url = scrapy.Field()      # where the PDF came from
+    text = scrapy.Field()
@@ -0,0 +1,130 @@
+# Async chat-completions client for the spiders
+#
+# Runs on the asyncio loop behind Scrapy's AsyncioSelectorReactor, so LLM
+# calls no longer block the reactor. One aiohttp session (and its keep-alive
+# connection pool) is shared by every call made through a client, and a
+# semaphore bounds how many requests are in flight at once. Answers go
+# through an optional ResponseCache (skyvern.llm_cache).
+
+import asyncio
+import os
+
+import aiohttp
+import requests
+
+from skyvern.llm_cache import cache_key
+
+GPT_API_URL = "https://api.openai.com/v1/chat/completions"
+MODEL = os.environ.get("SKYVERN_MODEL", "gpt-3.5-turbo")
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class ChatClient:
+    def __init__(self, concurrency=8, timeout=60, api_key=None, url=GPT_API_URL, cache=None):
+        self.cache = cache
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            if not self.api_key:
+                raise LLMError("OPENAI_API_KEY is not set")
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': f'Bearer {self.api_key}',
+                },
+            )
+        return self._session
+
+    async def complete(self, messages, max_tokens=100, model=MODEL):
+        """Content of the first choice for `messages`."""
+        key = cache_key(model, messages, max_tokens)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+        }
+        async with self._semaphore:
+            session = self._get_session()
+            async with session.post(self.url, json=data) as response:
+                if response.status != 200:
+                    raise LLMError(f"Error {response.status}: {await response.text()}")
+                try:
+                    gpt_response = await response.json()
+                except ValueError as e:
+                    raise LLMError(f"Response is not JSON: {e}") from e
+
+        content = _first_choice(gpt_response)
+        if self.cache is not None:
+            self.cache.put(key, content)
+        return content
+
+
+def _first_choice(gpt_response):
+    # A reply without a first message or with null content is as unusable as
+    # an error status; callers only have to handle LLMError
+    try:
+        return gpt_response["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise LLMError(f"Unexpected response format: {gpt_response}") from e
+
+
+def complete_blocking(messages, max_tokens=100, model=MODEL, cache=None, timeout=60):
+    """ChatClient.complete for code outside the reactor."""
+    key = cache_key(model, messages, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise LLMError("OPENAI_API_KEY is not set")
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}',
+    }
+    data = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+    response = requests.post(GPT_API_URL, headers=headers, json=data, timeout=timeout)
+    if response.status_code != 200:
+        raise LLMError(f"Error {response.status_code}: {response.text}")
+
+    try:
+        gpt_response = response.json()
+    except ValueError as e:
+        raise LLMError(f"Response is not JSON: {e}") from e
+    content = _first_choice(gpt_response)
+    if cache is not None:
+        cache.put(key, content)
+    return content
@@ -0,0 +1,137 @@
+# On-disk cache of chat-completions responses
+#
+# Responses are stored under a hash of (model, messages, max_tokens), one
+# file per entry, with an expiry time written into the entry. The directory
+# is bounded by total size and drops the least recently used entries first.
+#
+# Modes:
+#   "readwrite"  use cached answers and store new ones (default)
+#   "offline"    replay only: a miss raises LLMCacheMiss instead of calling
+#                the API, so crawls can be rerun deterministically
+#   "off"        bypass the cache
+#
+# SKYVERN_LLM_CACHE overrides the LLM_CACHE_MODE setting.
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+MODES = ("readwrite", "offline", "off")
+
+
+class LLMCacheMiss(RuntimeError):
+    pass
+
+
+def cache_key(model, messages, max_tokens):
+    payload = json.dumps({"model": model, "messages": messages, "max_tokens": max_tokens},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600, mode="readwrite"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {', '.join(MODES)}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+        self.nbytes = sum(size for _, size, _ in self._entries())
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.get("LLM_CACHE_DIR", ".cache/llm"),
+            max_bytes=settings.getint("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+            ttl=settings.getint("LLM_CACHE_TTL", 30 * 24 * 3600),
+            mode=os.environ.get("SKYVERN_LLM_CACHE") or settings.get("LLM_CACHE_MODE", "readwrite"),
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        """Cached content for `key`, or None; in offline mode a miss raises."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            entry = None
+        if entry is not None and entry["expires"] is not None and entry["expires"] < time.time():
+            self._remove(path)
+            entry = None
+        if entry is None:
+            if self.mode == "offline":
+                raise LLMCacheMiss(f"No cached LLM response for {key} in offline mode")
+            return None
+        # mtime doubles as the last access time for eviction
+        os.utime(path)
+        return entry["content"]
+
+    def put(self, key, content, ttl=None):
+        if self.mode != "readwrite":
+            return
+        ttl = self.ttl if ttl is None else ttl
+        data = json.dumps({
+            "expires": time.time() + ttl if ttl else None,
+            "content": content,
+        }).encode()
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        self.nbytes += len(data) - previous
+        if self.nbytes > self.max_bytes:
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self.nbytes -= size
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every put
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.nbytes = total
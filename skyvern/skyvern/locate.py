@@ -0,0 +1,168 @@
+# Local lookup of the element a task talks about, before asking the LLM
+#
+# One streaming pass over the page collects the usual targets (form fields,
+# buttons, PDF links and images) with an absolute XPath and, where the
+# attributes allow it, a shorter XPath that matches only that element. A
+# task description such as "search bar" is scored against each candidate's
+# attributes and text; only a clear winner is returned, anything ambiguous
+# is left to the LLM.
+
+import re
+from collections import Counter, namedtuple
+from io import BytesIO
+
+from lxml import etree
+
+from skyvern.dom import SKIPPED_TAGS, clip
+
+Candidate = namedtuple("Candidate", ["tag", "attributes", "text", "xpath", "absolute_xpath"])
+
+CANDIDATE_TAGS = {"input", "textarea", "button", "select", "a", "img"}
+# Tried in order when looking for an attribute that singles an element out
+IDENTIFYING_ATTRIBUTES = ("id", "name", "aria-label", "placeholder", "title", "alt", "class", "type", "href", "value")
+
+# How much a query word found in each attribute (or the text) counts
+FIELD_WEIGHTS = {
+    "id": 3, "name": 3, "aria-label": 3, "placeholder": 3, "title": 2, "alt": 2,
+    "value": 2, "text": 2, "tag": 2, "class": 1, "href": 1, "type": 1, "src": 1,
+}
+TEXT_INPUT_TYPES = {None, "text", "search", "email", "url", "tel", "password", "number"}
+STOPWORDS = {"the", "a", "an", "to", "of", "for", "in", "on", "find", "click", "open", "enter", "type", "into", "and", "with", "please"}
+
+MIN_SCORE = 4
+# The best candidate must beat the runner-up by this factor
+MIN_MARGIN = 1.5
+
+
+def _is_text_field(c):
+    return c.tag == "textarea" or (c.tag == "input" and c.attributes.get("type") in TEXT_INPUT_TYPES)
+
+
+def _is_clickable(c):
+    return c.tag in ("button", "a") or (c.tag == "input" and c.attributes.get("type") in ("submit", "button"))
+
+
+# Words in a task that say what kind of element it is after
+KIND_HINTS = {
+    "bar": _is_text_field,
+    "box": _is_text_field,
+    "field": _is_text_field,
+    "input": _is_text_field,
+    "textbox": _is_text_field,
+    "button": _is_clickable,
+    "link": lambda c: c.tag == "a",
+    "pdf": lambda c: c.tag == "a",
+    "image": lambda c: c.tag == "img",
+    "figure": lambda c: c.tag == "img",
+    "picture": lambda c: c.tag == "img",
+}
+KIND_WEIGHT = 3
+
+
+def words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def xpath_literal(value):
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    parts = value.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+
+
+def is_candidate(el):
+    if el.tag not in CANDIDATE_TAGS:
+        return False
+    if el.tag == "a":
+        return "pdf" in el.get("href", "").lower()
+    return el.get("type") != "hidden"
+
+
+class CandidateIndex:
+    def __init__(self, html_content):
+        self.candidates = []
+        self._parse(html_content)
+
+    def _parse(self, html_content):
+        if isinstance(html_content, str):
+            html_content = html_content.encode("utf-8")
+        events = etree.iterparse(BytesIO(html_content), events=("start", "end"),
+                                 html=True, remove_comments=True, remove_pis=True)
+        # How often each (tag, attribute, value) and pair of them occurs, to
+        # know which attribute XPaths are unique
+        seen = Counter()
+        found = []
+        skipping = 0
+        labelled = 0  # open links and buttons, whose text is still needed
+        for event, el in events:
+            if not isinstance(el.tag, str):
+                continue
+            if event == "start":
+                if skipping or el.tag in SKIPPED_TAGS:
+                    skipping += 1
+                elif el.tag in ("a", "button"):
+                    labelled += 1
+                continue
+            if skipping:
+                skipping -= 1
+                el.clear(keep_tail=True)
+                continue
+
+            if el.tag in CANDIDATE_TAGS:
+                keys = [(el.tag, name, el.get(name)) for name in IDENTIFYING_ATTRIBUTES if name in el.attrib]
+                seen.update(keys)
+                seen.update((a, b) for i, a in enumerate(keys) for b in keys[i + 1:])
+                if is_candidate(el):
+                    text = clip("".join(el.itertext()), 200)
+                    found.append((el.tag, dict(el.attrib), text, keys, el.getroottree().getpath(el)))
+            if el.tag in ("a", "button"):
+                labelled -= 1
+            if not labelled:
+                el.clear(keep_tail=True)
+
+        for tag, attributes, text, keys, absolute in found:
+            self.candidates.append(Candidate(tag, attributes, text, self._unique_xpath(seen, keys) or absolute, absolute))
+
+    @staticmethod
+    def _unique_xpath(seen, keys):
+        for key in keys:
+            if seen[key] == 1:
+                tag, name, value = key
+                return f"//{tag}[@{name}={xpath_literal(value)}]"
+        for i, a in enumerate(keys):
+            for b in keys[i + 1:]:
+                if seen[(a, b)] == 1:
+                    return f"//{a[0]}[@{a[1]}={xpath_literal(a[2])}][@{b[1]}={xpath_literal(b[2])}]"
+        return None
+
+    def score(self, candidate, query):
+        fields = {name: set(words(value)) for name, value in candidate.attributes.items() if name in FIELD_WEIGHTS}
+        fields["text"] = set(words(candidate.text))
+        fields["tag"] = {candidate.tag}
+        total = 0
+        for word in query:
+            for name, tokens in fields.items():
+                if word in tokens:
+                    total += FIELD_WEIGHTS[name]
+            hint = KIND_HINTS.get(word)
+            if hint is not None and hint(candidate):
+                total += KIND_WEIGHT
+        return total
+
+    def rank(self, task):
+        """(score, candidate) pairs for `task`, best first."""
+        query = [w for w in dict.fromkeys(words(task)) if w not in STOPWORDS]
+        scored = [(self.score(c, query), c) for c in self.candidates]
+        scored.sort(key=lambda pair: -pair[0])
+        return scored
+
+    def resolve(self, task):
+        """The candidate `task` clearly refers to, or None when unsure."""
+        ranked = self.rank(task)
+        if not ranked or ranked[0][0] < MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][0] < MIN_MARGIN * ranked[1][0]:
+            return None
+        return ranked[0][1]
@@ -0,0 +1,91 @@
+# Selectors that worked before, kept across runs in SQLite
+#
+# Entries are keyed by (domain, page fingerprint, intent). The fingerprint
+# only reflects the page's structure, so a stored XPath survives changing
+# text and attribute values but not a new layout. An entry is reused only
+# while it is fresh and still matches exactly one element of the live page;
+# otherwise, or when acting on it fails, it is dropped.
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+from lxml import etree, html as lxml_html
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS selectors (
+    domain TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    intent TEXT NOT NULL,
+    xpath TEXT NOT NULL,
+    confirmed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (domain, fingerprint, intent)
+)
+"""
+
+
+def page_fingerprint(index):
+    """Hash of the element paths in a CandidateIndex, ignoring positions."""
+    paths = sorted({
+        "/".join(step.split("[")[0] for step in c.absolute_xpath.split("/"))
+        for c in index.candidates
+    })
+    return hashlib.blake2b("\n".join(paths).encode(), digest_size=16).hexdigest()
+
+
+def matches_once(html_content, xpath):
+    try:
+        return len(lxml_html.fromstring(html_content).xpath(xpath)) == 1
+    except (etree.XPathError, etree.ParserError, ValueError):
+        return False
+
+
+class SelectorMemory:
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        # The spider's Selenium flow runs in worker threads
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(SCHEMA)
+        self.db.commit()
+        self._lock = threading.RLock()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def lookup(self, domain, fingerprint, intent, html_content=None):
+        """A fresh stored XPath for the key, checked against `html_content`
+        when given; stale or non-matching entries are removed."""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT xpath, confirmed_at FROM selectors WHERE domain = ? AND fingerprint = ? AND intent = ?",
+                (domain, fingerprint, intent)).fetchone()
+            if row is None:
+                return None
+            xpath, confirmed_at = row
+            if time.time() - confirmed_at > self.ttl or (
+                    html_content is not None and not matches_once(html_content, xpath)):
+                self.forget(domain, fingerprint, intent)
+                return None
+            with self.db:
+                self.db.execute(
+                    "UPDATE selectors SET hits = hits + 1 WHERE domain = ? AND fingerprint = ? AND intent = ?",
+                    (domain, fingerprint, intent))
+            return xpath
+
+    def remember(self, domain, fingerprint, intent, xpath):
+        """Record that `xpath` just worked for the key."""
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT INTO selectors (domain, fingerprint, intent, xpath, confirmed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (domain, fingerprint, intent) DO UPDATE SET xpath = excluded.xpath, "
+                "confirmed_at = excluded.confirmed_at",
+                (domain, fingerprint, intent, xpath, time.time()))
+
+    def forget(self, domain, fingerprint, intent):
+        with self._lock, self.db:
+            self.db.execute(
+                "DELETE FROM selectors WHERE domain = ? AND fingerprint = ? AND intent = ?",
+                (domain, fingerprint, intent))
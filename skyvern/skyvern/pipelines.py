@@ -4,10 +4,78 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import os
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from skyvern.store import PageStore
+
 
 class SkyvernPipeline:
+    """Streams items into the PageStore under STORE_DIR, by URL and fetch
+    time; content already stored is not written again. Bytes fields (figure
+    images, written to disk by FiguresPipeline) are left out."""
+
+    # Index rows are committed in batches rather than per item
+    COMMIT_EVERY = 100
+
+    def __init__(self, directory, stats=None):
+        self.directory = directory
+        self.stats = stats
+        self.store = None
+        self.pending = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get("STORE_DIR", "store"), crawler.stats)
+
+    def open_spider(self, spider):
+        self.store = PageStore(self.directory)
+
+    def close_spider(self, spider):
+        self.store.close()
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        record = {k: v for k, v in adapter.items() if not isinstance(v, (bytes, bytearray))}
+        # The URL goes in the index, so the same content under another URL
+        # is still stored once
+        url = record.pop("url", None) or record.get("pdf_url") or ""
+        _, new = self.store.put(url, record, record.pop("fetched_at", None))
+        if self.stats is not None:
+            self.stats.inc_value("store/new" if new else "store/duplicate")
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.store.commit()
+            self.pending = 0
+        return item
+
+
+class FiguresPipeline:
+    """Writes the image of every FigureItem under FIGURES_DIR, one directory
+    per paper, and records where in item["path"]. Other items pass through."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get("FIGURES_DIR", "figures"))
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("image") is None or adapter.get("kind") is None:
+            return item
+
+        paper = os.path.splitext(adapter["paper"])[0]
+        x0, y0 = adapter["bbox"][:2]
+        # Named by position, so a rerun overwrites instead of duplicating
+        name = f"p{adapter['page']:03d}-{int(x0)}-{int(y0)}-{adapter['kind']}.{adapter['ext']}"
+        directory = os.path.join(self.directory, paper)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(adapter["image"])
+        adapter["path"] = path
         return item
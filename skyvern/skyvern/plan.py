@@ -0,0 +1,333 @@
+# Plans as executable action graphs
+#
+# The planner LLM is asked for JSON instead of prose: a list of typed actions
+# with the ids of the actions each one has to wait for.
+#
+#     {"actions": [
+#         {"id": "open", "kind": "navigate", "args": {"url": "https://arxiv.org"}},
+#         {"id": "bar", "kind": "locate", "args": {"target": "search bar"}, "after": ["open"]},
+#         {"id": "query", "kind": "type", "args": {"element": "bar", "text": "{title}", "submit": true},
+#          "after": ["bar"]}]}
+#
+# Task templates keep their placeholders ("{title}") through planning, so the
+# compiled graph is cached per template and reused for every value bound into
+# it. Graphs for several papers are merged into one with independent branches,
+# which the scheduler runs concurrently, each in its own browser session.
+#
+# Run a plan for one or more papers with
+#
+#     python -m skyvern.plan "Paper title" "Another paper title"
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from skyvern.llm import MODEL, complete_blocking
+from skyvern.locate import CandidateIndex
+from skyvern.waits import Waiter, all_of, document_ready, network_idle
+
+KINDS = ("navigate", "locate", "type", "click", "extract", "upload")
+# Arguments holding the id of an earlier locate action
+REFERENCE_ARGS = ("element",)
+DEFAULT_SESSION = "default"
+
+Action = namedtuple("Action", ["id", "kind", "args", "after"])
+
+PAPER_TASK = (
+    "find the quantum research paper '{title}' on arXiv, open its PDF and "
+    "upload a screenshot of the circuit figure to http://localhost:3000"
+)
+
+PLANNER_PROMPT = (
+    "You are Planner GPT. Turn the task into a browser plan and reply with a "
+    "single JSON object and nothing else, of the form "
+    '{"actions": [{"id": <string>, "kind": <kind>, "args": {...}, "after": [<id>, ...]}]}. '
+    "Kinds and their args: navigate {url}; locate {target, xpath?} where target "
+    "describes the element; type {element, text, submit?}; click {element}; "
+    "extract {element, attribute?}; upload {element, path}. element is the id of "
+    "a locate action. after lists the actions that must finish first. Keep "
+    "placeholders in braces such as {title} verbatim."
+)
+
+
+class PlanError(ValueError):
+    pass
+
+
+class PlanGraph:
+    def __init__(self, actions):
+        self.actions = {}
+        for action in actions:
+            if action.kind not in KINDS:
+                raise PlanError(f"Unknown action kind '{action.kind}'")
+            if action.id in self.actions:
+                raise PlanError(f"Duplicate action id '{action.id}'")
+            self.actions[action.id] = action
+        for action in self.actions.values():
+            for dep in action.after:
+                if dep not in self.actions:
+                    raise PlanError(f"Action '{action.id}' waits for unknown action '{dep}'")
+            for name in REFERENCE_ARGS:
+                ref = action.args.get(name)
+                if ref is not None and ref not in action.after:
+                    raise PlanError(f"Action '{action.id}' uses '{ref}' without waiting for it")
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(action_id):
+            if state.get(action_id) == "done":
+                return
+            if state.get(action_id) == "visiting":
+                raise PlanError(f"Plan has a cycle through '{action_id}'")
+            state[action_id] = "visiting"
+            for dep in self.actions[action_id].after:
+                visit(dep)
+            state[action_id] = "done"
+            order.append(action_id)
+
+        for action_id in self.actions:
+            visit(action_id)
+        return order
+
+    def __len__(self):
+        return len(self.actions)
+
+    @classmethod
+    def from_json(cls, payload):
+        try:
+            return cls(
+                Action(str(a["id"]), a["kind"], dict(a.get("args", {})), tuple(str(d) for d in a.get("after", ())))
+                for a in payload["actions"]
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            raise PlanError(f"Malformed plan: {e}") from e
+
+    def to_json(self):
+        return {"actions": [
+            {"id": a.id, "kind": a.kind, "args": a.args, "after": list(a.after)}
+            for a in (self.actions[i] for i in self.order)
+        ]}
+
+    def bind(self, **values):
+        """Copy with every "{name}" placeholder in the args replaced."""
+        def fill(value):
+            if isinstance(value, str):
+                for name, replacement in values.items():
+                    value = value.replace("{" + name + "}", str(replacement))
+                return value
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            if isinstance(value, dict):
+                return {k: fill(v) for k, v in value.items()}
+            return value
+
+        return PlanGraph(a._replace(args=fill(a.args)) for a in self.actions.values())
+
+    def prefixed(self, prefix):
+        """Copy with ids and browser sessions namespaced by `prefix`."""
+        def rename(action):
+            args = dict(action.args)
+            for name in REFERENCE_ARGS:
+                if name in args:
+                    args[name] = f"{prefix}/{args[name]}"
+            args["session"] = f"{prefix}/{args.get('session', DEFAULT_SESSION)}"
+            return Action(f"{prefix}/{action.id}", action.kind, args,
+                          tuple(f"{prefix}/{d}" for d in action.after))
+
+        return PlanGraph(rename(a) for a in self.actions.values())
+
+    @classmethod
+    def merge(cls, graphs):
+        return cls(a for g in graphs for a in g.actions.values())
+
+
+def _extract_json(content):
+    # Models sometimes wrap the answer in a markdown code fence
+    content = content.strip()
+    if "```" in content:
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[len("json"):]
+    return json.loads(content)
+
+
+def parse_plan(content):
+    try:
+        return PlanGraph.from_json(_extract_json(content))
+    except ValueError as e:
+        raise PlanError(f"Planner reply is not a valid plan: {e}") from e
+
+
+def plan_key(template, model=MODEL):
+    return hashlib.blake2b(f"plan:{model}:{template}".encode(), digest_size=20).hexdigest()
+
+
+def compile_plan(template, cache=None):
+    """Action graph for a task template, planned once per template."""
+    key = plan_key(template)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return PlanGraph.from_json(json.loads(cached))
+
+    messages = [
+        {"role": "system", "content": PLANNER_PROMPT},
+        {"role": "user", "content": template},
+    ]
+    # The raw reply is not cached; only a graph that parsed is worth keeping
+    graph = parse_plan(complete_blocking(messages, max_tokens=1000))
+    if cache is not None:
+        cache.put(key, json.dumps(graph.to_json()))
+    return graph
+
+
+class BrowserExecutor:
+    """Runs actions against Selenium drivers, one per plan session.
+
+    Drivers are leased from a BrowserPool when a session starts and returned
+    when its last action is done. Selenium calls block, so they run in worker
+    threads; actions of one session are serialized. Actions that load a page
+    wait on `waiter` until it is ready, so the next locate reads the new
+    page's source.
+    """
+
+    def __init__(self, pool, waiter=None):
+        self.pool = pool
+        self.waiter = waiter or Waiter()
+        self.drivers = {}
+        self._locks = {}
+
+    def _driver(self, session):
+        if session not in self.drivers:
+            self.drivers[session] = self.pool.acquire()
+        return self.drivers[session]
+
+    def end_session(self, session):
+        driver = self.drivers.pop(session, None)
+        if driver is not None:
+            self.pool.release(driver)
+
+    async def run(self, action, results):
+        session = action.args.get("session", DEFAULT_SESSION)
+        lock = self._locks.setdefault(session, asyncio.Lock())
+        async with lock:
+            return await asyncio.to_thread(self._run, action, results, session)
+
+    def _run(self, action, results, session):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+
+        driver = self._driver(session)
+        args = action.args
+        if action.kind == "navigate":
+            driver.get(args["url"])
+            self.waiter.wait(driver, document_ready, "plan navigate", site=urlparse(args["url"]).netloc)
+            return driver.current_url
+        if action.kind == "locate":
+            if args.get("xpath"):
+                return args["xpath"]
+            candidate = CandidateIndex(driver.page_source).resolve(args["target"])
+            if candidate is None:
+                raise PlanError(f"Could not locate '{args['target']}' on {driver.current_url}")
+            return candidate.xpath
+
+        element = driver.find_element(By.XPATH, results[args["element"]])
+        # Waits after a click or submit are filed under the page they started on
+        site = urlparse(driver.current_url).netloc
+        if action.kind == "type":
+            element.send_keys(args["text"])
+            if args.get("submit"):
+                element.send_keys(Keys.ENTER)
+                self._settle(driver, "plan submit", site)
+        elif action.kind == "click":
+            driver.execute_script("arguments[0].click();", element)
+            self._settle(driver, "plan click", site)
+        elif action.kind == "extract":
+            attribute = args.get("attribute")
+            return element.get_attribute(attribute) if attribute else element.text
+        elif action.kind == "upload":
+            element.send_keys(os.path.abspath(args["path"]))
+        return None
+
+    def _settle(self, driver, step, site):
+        # A click may load a new document or only fetch into the current
+        # one; either way the page is ready once it is loaded and quiet
+        self.waiter.wait(driver, all_of(document_ready, network_idle()), step, site=site)
+
+    def close(self):
+        for driver in self.drivers.values():
+            self.pool.release(driver, broken=True)
+        self.drivers = {}
+
+
+async def execute(graph, executor, concurrency=4):
+    """Run every action once its dependencies are done; independent actions
+    run concurrently, at most `concurrency` at a time. Returns the results
+    by action id."""
+    results = {}
+    tasks = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    # Actions left per browser session, so executors can free a session early
+    remaining = {}
+    for action in graph.actions.values():
+        session = action.args.get("session", DEFAULT_SESSION)
+        remaining[session] = remaining.get(session, 0) + 1
+
+    async def run(action):
+        await asyncio.gather(*(tasks[dep] for dep in action.after))
+        async with semaphore:
+            results[action.id] = await executor.run(action, results)
+        session = action.args.get("session", DEFAULT_SESSION)
+        remaining[session] -= 1
+        if not remaining[session] and hasattr(executor, "end_session"):
+            executor.end_session(session)
+
+    for action_id in graph.order:
+        tasks[action_id] = asyncio.ensure_future(run(graph.actions[action_id]))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return results
+
+
+def main(argv=None):
+    from scrapy.utils.project import get_project_settings
+
+    from skyvern.browser import pool_from_settings
+    from skyvern.llm_cache import ResponseCache
+
+    parser = argparse.ArgumentParser(description="Plan and run the paper task for each title")
+    parser.add_argument("titles", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    settings = get_project_settings()
+    settings.set("BROWSER_POOL_SIZE", args.concurrency)
+    cache = ResponseCache.from_settings(settings)
+    template = compile_plan(PAPER_TASK, cache)
+    graph = PlanGraph.merge(
+        template.bind(title=title).prefixed(f"paper{i}") for i, title in enumerate(args.titles))
+
+    pool = pool_from_settings(settings)
+    waiter = Waiter.from_settings(settings)
+    executor = BrowserExecutor(pool, waiter)
+    try:
+        results = asyncio.run(execute(graph, executor, args.concurrency))
+    finally:
+        executor.close()
+        pool.close()
+        waiter.save()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
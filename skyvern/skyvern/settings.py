@@ -20,14 +20,17 @@ NEWSPIDER_MODULE = "skyvern.spiders"
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# Bulk arXiv crawls keep many papers in flight, spread over arxiv.org and
+# export.arxiv.org; per-domain concurrency stays low and AutoThrottle below
+# adapts the delay to how fast each server answers
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 4
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -68,26 +71,97 @@ ROBOTSTXT_OBEY = True
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 1
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 30
 # The average number of requests Scrapy should be sending in parallel to
 # each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# The RFC 2616 policy revalidates stale pages with conditional requests
+# (If-None-Match / If-Modified-Since), so unchanged abstracts cost a 304.
+# PDFs skip this cache; they are kept in PDF_DIR instead.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = [429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+HTTPCACHE_GZIP = True
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
+
+# Chat-completions requests a spider keeps in flight at once (skyvern.llm)
+LLM_CONCURRENCY = 8
+
+# Selectors confirmed to work are remembered here across runs (skyvern.memory)
+SELECTOR_MEMORY_PATH = "selectors.sqlite3"
+SELECTOR_MEMORY_TTL = 7 * 24 * 3600
+
+# Chat-completions responses are cached on disk (skyvern.llm_cache). Set
+# LLM_CACHE_MODE (or SKYVERN_LLM_CACHE) to "offline" to replay a previous
+# crawl without API calls, or "off" to bypass the cache.
+LLM_CACHE_DIR = ".cache/llm"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LLM_CACHE_TTL = 30 * 24 * 3600
+LLM_CACHE_MODE = "readwrite"
+
+# Headless browser sessions shared by the spiders (skyvern.browser)
+EXTENSIONS = {
+    "skyvern.browser.BrowserPoolExtension": 500,
+}
+# "skyvern.browser.fake_driver" runs the spiders without Chrome
+BROWSER_DRIVER_FACTORY = "skyvern.browser.chrome_driver"
+BROWSER_HEADLESS = True
+BROWSER_POOL_SIZE = 2
+BROWSER_POOL_MAX_USES = 50
+
+# Condition-driven waits in the browser flow (skyvern.waits): per site and
+# step, a wait times out after WAIT_TIMEOUT_FACTOR times the slowest recent
+# wait (at least WAIT_TIMEOUT_FLOOR seconds, at most the step's budget).
+# Observed waits persist in WAIT_STATS_PATH between runs.
+WAIT_STATS_PATH = ".cache/waits.json"
+WAIT_TIMEOUT_FACTOR = 3.0
+WAIT_TIMEOUT_FLOOR = 1.0
+
+# Figures cut straight out of paper PDFs (skyvern.figures); PDFs are
+# downloaded once into PDF_DIR, figure images are written under FIGURES_DIR
+# and every item then goes to the store (STORE_DIR below)
+ITEM_PIPELINES = {
+    "skyvern.pipelines.FiguresPipeline": 300,
+    "skyvern.ingest.IngestPipeline": 350,
+    "skyvern.ingest.PaperIndexPipeline": 360,
+    "skyvern.pipelines.SkyvernPipeline": 400,
+}
+PDF_DIR = ".cache/pdfs"
+FIGURES_DIR = "figures"
+FIGURE_DPI = 200
+FIGURE_MIN_SIZE = 40
+
+# Items are appended to a compressed, content-deduplicated store indexed by
+# URL and fetch time (skyvern.store); read it with python -m skyvern.store
+STORE_DIR = "store"
+
+# Figures and screenshots go straight to the backend's batched image
+# endpoint (skyvern.ingest); set INGEST_FIGURES to read the circuit of every
+# crawled figure
+INGEST_URL = "http://localhost:8080/upload-images"
+INGEST_FIGURES = False
+INGEST_BATCH_SIZE = 16
+INGEST_LINGER = 1.0
+INGEST_CONCURRENCY = 2
+
+# Papers go to the backend's retrieval index for the chatbot
+# (skyvern.ingest); set INDEX_PAPERS to send every abstract and PDF text
+DOCUMENTS_URL = "http://localhost:8080/documents"
+INDEX_PAPERS = False
+INDEX_BATCH_SIZE = 32
@@ -0,0 +1,156 @@
+# Bulk arXiv crawl: papers straight over HTTP, no Google and no browser
+#
+#     scrapy crawl arxiv -a ids=quant-ph/0406196,2101.00001
+#     scrapy crawl arxiv -a "titles=Improved simulation of stabilizer circuits|..."
+#     scrapy crawl arxiv -a "query=cat:quant-ph AND ti:circuit" -a max_results=2000
+#     scrapy crawl arxiv -a input=papers.txt     (one id or title per line)
+#
+# Ids go to their abstract page; titles and listing queries go through the
+# arXiv API, whose Atom entries already carry the metadata. Each paper is
+# emitted as a PaperItem and its PDF is then handed to the figure extraction
+# of the arxiv_figures spider, so figures come out as FigureItems.
+#
+# ARXIV_BASE_URL and ARXIV_API_URL point the crawl elsewhere, e.g. at a
+# static stand-in served with `python -m http.server`:
+#
+#     abs/<id>/index.html   abstract pages (with citation_* meta tags)
+#     pdf/<id>              PDFs
+#     api/query             an Atom feed, returned for every query
+#
+#     scrapy crawl arxiv -a ids=... -s ARXIV_BASE_URL=http://localhost:8000 \
+#         -s ARXIV_API_URL=http://localhost:8000/api/query
+
+import re
+from urllib.parse import urlencode
+
+from scrapy import Request
+
+from skyvern.items import PaperItem
+from skyvern.spiders.arxiv_figures import ArxivFiguresSpider
+
+ARXIV_BASE_URL = "https://arxiv.org"
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+# Entries per API page (the API allows up to 2000; smaller pages start
+# yielding papers sooner)
+API_PAGE_SIZE = 100
+
+ATOM = "http://www.w3.org/2005/Atom"
+OPENSEARCH = "http://a9.com/-/spec/opensearch/1.1/"
+
+# 2101.00001, 2101.00001v2, quant-ph/0406196, with or without "arXiv:" or
+# an arxiv.org URL in front
+ARXIV_ID = re.compile(r"^(?:arxiv:|https?://(?:export\.)?arxiv\.org/(?:abs|pdf)/)?"
+                      r"(\d{4}\.\d{4,5}(?:v\d+)?|[a-z-]+(?:\.[A-Z]{2})?/\d{7}(?:v\d+)?)(?:\.pdf)?$",
+                      re.IGNORECASE)
+
+
+def parse_arxiv_id(text):
+    """The arXiv id in `text`, or None if it is not one."""
+    match = ARXIV_ID.match(text.strip())
+    return match.group(1) if match else None
+
+
+def _clean(text):
+    return " ".join(text.split()) if text else text
+
+
+class ArxivSpider(ArxivFiguresSpider):
+    name = "arxiv"
+    # The API's terms allow one request every three seconds over a single
+    # connection, whatever the project-wide concurrency and throttling say
+    custom_settings = {
+        "DOWNLOAD_SLOTS": {
+            "export.arxiv.org": {"concurrency": 1, "delay": 3, "randomize_delay": False},
+        },
+    }
+
+    def __init__(self, ids="", titles="", query=None, input=None, max_results=100, *args, **kwargs):
+        super(ArxivSpider, self).__init__(*args, **kwargs)
+        self.ids = [i.strip() for i in ids.split(",") if i.strip()]
+        self.titles = [t.strip() for t in titles.split("|") if t.strip()]
+        self.query = query
+        self.max_results = int(max_results)
+        if input:
+            with open(input, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    if parse_arxiv_id(line):
+                        self.ids.append(line)
+                    else:
+                        self.titles.append(line)
+
+    async def start(self):
+        base_url = self.settings.get("ARXIV_BASE_URL", ARXIV_BASE_URL).rstrip("/")
+        for text in self.ids:
+            arxiv_id = parse_arxiv_id(text)
+            if arxiv_id is None:
+                self.logger.warning(f"Not an arXiv id: {text}")
+                continue
+            yield Request(f"{base_url}/abs/{arxiv_id}", callback=self.parse_abstract,
+                          cb_kwargs={"arxiv_id": arxiv_id})
+
+        for title in self.titles:
+            # The API ranks by relevance; the best match for the phrase is
+            # taken to be the paper
+            yield self.api_request(f'ti:"{title}"', start=0, limit=1)
+
+        if self.query:
+            yield self.api_request(self.query, start=0, limit=self.max_results)
+
+    def api_request(self, query, start, limit):
+        api_url = self.settings.get("ARXIV_API_URL", ARXIV_API_URL)
+        params = {
+            "search_query": query,
+            "start": start,
+            "max_results": min(API_PAGE_SIZE, limit - start),
+        }
+        # AutoThrottle would otherwise shrink the slot's delay below 3 s
+        return Request(f"{api_url}?{urlencode(params)}", callback=self.parse_feed,
+                       cb_kwargs={"query": query, "start": start, "limit": limit},
+                       meta={"autothrottle_dont_adjust_delay": True})
+
+    def parse_abstract(self, response, arxiv_id):
+        def meta(name):
+            return response.xpath(f"//meta[@name='{name}']/@content").get()
+
+        pdf_url = meta("citation_pdf_url") or response.urljoin(f"/pdf/{arxiv_id}")
+        yield PaperItem(
+            arxiv_id=meta("citation_arxiv_id") or arxiv_id,
+            # The heading starts with a "Title:" descriptor span
+            title=_clean(meta("citation_title") or "".join(response.css("h1.title::text").getall())),
+            authors=response.xpath("//meta[@name='citation_author']/@content").getall(),
+            abstract=_clean(meta("citation_abstract")),
+            url=response.url,
+            pdf_url=pdf_url,
+        )
+        yield self.pdf_request(pdf_url, arxiv_id=arxiv_id)
+
+    def parse_feed(self, response, query, start, limit):
+        selector = response.selector
+        selector.register_namespace("atom", ATOM)
+        selector.register_namespace("opensearch", OPENSEARCH)
+
+        entries = selector.xpath("//atom:entry")
+        for entry in entries:
+            url = entry.xpath("atom:id/text()").get("").strip()
+            arxiv_id = parse_arxiv_id(url)
+            if arxiv_id is None:
+                continue
+            pdf_url = (entry.xpath("atom:link[@title='pdf']/@href").get()
+                       or f"{self.settings.get('ARXIV_BASE_URL', ARXIV_BASE_URL).rstrip('/')}/pdf/{arxiv_id}")
+            yield PaperItem(
+                arxiv_id=arxiv_id,
+                title=_clean(entry.xpath("atom:title/text()").get()),
+                authors=[_clean(a) for a in entry.xpath("atom:author/atom:name/text()").getall()],
+                abstract=_clean(entry.xpath("atom:summary/text()").get()),
+                url=url,
+                pdf_url=pdf_url,
+            )
+            yield self.pdf_request(pdf_url, arxiv_id=arxiv_id)
+
+        total = int(selector.xpath("//opensearch:totalResults/text()").get("0"))
+        following = start + len(entries)
+        if entries and following < min(total, limit):
+            yield self.api_request(query, following, limit)
@@ -0,0 +1,63 @@
+# Figures of arXiv papers, taken from the PDFs without a browser
+#
+#     scrapy crawl arxiv_figures -a pdfs=https://arxiv.org/pdf/quant-ph/0406196,paper.pdf
+#
+# Each source is a PDF URL or a local file. Downloaded PDFs are kept in
+# PDF_DIR and read from there on later runs; figures go through the item
+# pipeline as FigureItems (see skyvern.figures), and with INDEX_PAPERS set
+# the text of arXiv papers follows as a PaperTextItem.
+
+import asyncio
+import os
+from pathlib import Path
+
+from scrapy import Spider, Request
+
+from skyvern.figures import DPI, MIN_SIZE, cached_pdf, extract_figures, pdf_name, pdf_text, pool, save_pdf
+from skyvern.items import FigureItem, PaperTextItem
+
+
+class ArxivFiguresSpider(Spider):
+    name = "arxiv_figures"
+
+    def __init__(self, pdfs="", *args, **kwargs):
+        super(ArxivFiguresSpider, self).__init__(*args, **kwargs)
+        self.sources = [source.strip() for source in pdfs.split(",") if source.strip()]
+
+    async def start(self):
+        for source in self.sources:
+            yield self.pdf_request(source)
+
+    def pdf_request(self, source, **cb_kwargs):
+        """Request for the PDF at `source` (a URL or a local file), read from
+        PDF_DIR when it was downloaded before."""
+        if os.path.exists(source):
+            path = os.path.abspath(source)
+        else:
+            pdf_dir = self.settings.get("PDF_DIR", ".cache/pdfs")
+            path = os.path.abspath(os.path.join(pdf_dir, pdf_name(source)))
+        cb_kwargs.update(path=path, url=source)
+        if cached_pdf(path):
+            # Already on disk: no download, the request just reads the file
+            return Request(Path(path).as_uri(), callback=self.parse_pdf, cb_kwargs=cb_kwargs)
+        # PDF_DIR is the PDFs' cache; the HTTP cache would store them twice
+        return Request(source, callback=self.parse_pdf, cb_kwargs=cb_kwargs,
+                       meta={"dont_cache": True})
+
+    async def parse_pdf(self, response, path, url, **fields):
+        if not response.url.startswith("file:"):
+            try:
+                save_pdf(os.path.dirname(path), os.path.basename(path), response.body)
+            except ValueError as e:
+                content_type = response.headers.get("Content-Type", b"").decode(errors="replace")
+                self.logger.warning(f"Skipping {url} ({content_type or 'no content type'}): {e}")
+                return
+
+        dpi = self.settings.getint("FIGURE_DPI", DPI)
+        min_size = self.settings.getfloat("FIGURE_MIN_SIZE", MIN_SIZE)
+        async for figure in extract_figures(path, dpi=dpi, min_size=min_size):
+            yield FigureItem(paper=os.path.basename(path), url=url, **fields, **figure)
+
+        if fields.get("arxiv_id") and self.settings.getbool("INDEX_PAPERS"):
+            text = await asyncio.get_running_loop().run_in_executor(pool(), pdf_text, path)
+            yield PaperTextItem(arxiv_id=fields["arxiv_id"], url=url, text=text)
@@ -1,44 +1,44 @@
-import time
-import csv
+import asyncio
 import os  # For file operations
+import time
+from urllib.parse import urlparse
+
+import aiohttp
 from scrapy import Spider, Request
 from scrapy.crawler import CrawlerProcess
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 import requests
-from twisted.internet import reactor, defer
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer
 
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-# Function to split HTML into chunks
-
-
-def split_html_into_chunks(html_content, max_chunk_size=10000):
-    chunks = []
-    current_chunk = ""
-
-    for line in html_content.splitlines():
-        if len(current_chunk) + len(line) > max_chunk_size:
-            chunks.append(current_chunk)
-            current_chunk = line
-        else:
-            current_chunk += line + "\n"
 
-    if current_chunk:
-        chunks.append(current_chunk)
-
-    return chunks
+from skyvern.browser import pool_from_settings
+from skyvern.dom import split_html_into_chunks
+from skyvern.figures import cached_pdf, first_figure, pdf_name, save_pdf
+from skyvern.ingest import INGEST_URL, upload_blocking
+from skyvern.llm import ChatClient, LLMError
+from skyvern.llm_cache import LLMCacheMiss, ResponseCache
+from skyvern.locate import CandidateIndex
+from skyvern.memory import SelectorMemory, page_fingerprint
+from skyvern.waits import (Waiter, all_of, document_ready, element_clickable,
+                           element_present, network_idle, scrolled_to)
+
+# What the spider looks for on the Google homepage, for the local index
+SEARCH_BAR_TASK = "search bar textarea gLFyf"
+# Hosts the waits of the search flow are learned for
+GOOGLE_SITE = "www.google.com"
+ARXIV_SITE = "arxiv.org"
+PAPER_TITLE = "Classical simulation of quantum computation, the Gottesman-Knill theorem, and slightly beyond"
 
 # Function to scroll the PDF viewer inside shadow-root and take a screenshot
 
 
-def scroll_and_screenshot(driver, scroll_height, screenshot_path):
+def scroll_and_screenshot(driver, scroll_height, screenshot_path, waiter=None):
+    waiter = waiter or Waiter()
     try:
         # Use JavaScript to scroll the window
         driver.execute_script(f"window.scrollTo(0, {scroll_height});")
-        time.sleep(2)  # Wait for the scroll to take effect
+        waiter.wait(driver, scrolled_to(scroll_height), "scroll", budget=2)
 
         # Take a screenshot of the currently visible area
         driver.save_screenshot(screenshot_path)
@@ -47,194 +47,198 @@ def scroll_and_screenshot(driver, scroll_height, screenshot_path):
         print(f"Error while scrolling and taking screenshot: {e}")
 
 
-def upload_screenshot_and_generate(driver, screenshot_path):
+def extract_circuit_figure(pdf_url, pdf_dir, figures_dir):
+    """Save the paper's first figure (vector drawings first) in the paper's
+    directory under `figures_dir` and return its path, or None if there is
+    none."""
     try:
-        # Navigate to localhost:3000
-        driver.get('http://localhost:3000')
-        time.sleep(3)  # Wait for the page to load
-
-        # Locate the "Select Image" button using XPath for the span with the text 'Select Image'
-        try:
-            # Wait until the button with the <span>Select Image</span> is visible
-            file_input = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//button[span[text()='Select Image']]"))
-            )
-
-            # Click the "Select Image" button
-            file_input.click()
-            print("Successfully clicked 'Select Image' button.")
-
-        except Exception as e:
-            print(
-                f"Error while interacting with the 'Select Image' button: {e}")
-
-        # Upload the screenshot
-        file_input.send_keys(os.path.abspath(screenshot_path))
-        print(f"Uploaded screenshot: {screenshot_path}")
-
-        try:
-            # Wait for the button to be present
-            generate_button = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//button[span[text()='Generate']]"))
-            )
-
-            # Scroll into view if necessary
-            driver.execute_script(
-                "arguments[0].scrollIntoView();", generate_button)
-
-            # Ensure the button is clickable
-            generate_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//button[span[text()='Generate']]"))
-            )
-
-            # Use JavaScript to force-click the button
-            driver.execute_script("arguments[0].click();", generate_button)
-
-            print("Successfully clicked 'Generate' button.")
-
-        except Exception as e:
-            print(f"Error while interacting with the 'Generate' button: {e}")
-
-        # Wait for some result (you can modify this depending on the page behavior)
-        time.sleep(5)
-
+        name = pdf_name(pdf_url)
+        path = os.path.join(pdf_dir, name)
+        if not cached_pdf(path):
+            response = requests.get(pdf_url, timeout=60)
+            response.raise_for_status()
+            save_pdf(pdf_dir, name, response.content)
+        figure = first_figure(path)
+    except Exception as e:
+        print(f"Error while extracting figures from {pdf_url}: {e}")
+        return None
+    if figure is None:
+        print(f"No figures found in {pdf_url}")
+        return None
+
+    # Same layout and names as FiguresPipeline
+    x0, y0 = figure["bbox"][:2]
+    directory = os.path.join(figures_dir, os.path.splitext(name)[0])
+    os.makedirs(directory, exist_ok=True)
+    figure_path = os.path.join(
+        directory, f"p{figure['page']:03d}-{int(x0)}-{int(y0)}-{figure['kind']}.{figure['ext']}")
+    with open(figure_path, "wb") as f:
+        f.write(figure["image"])
+    print(f"Figure from page {figure['page']} at {figure['bbox']} saved to {figure_path}")
+    return figure_path
+
+
+def upload_and_generate(image_paths, url):
+    """Send images to the backend's batched image endpoint and print the
+    circuit read from each one."""
+    try:
+        for part in upload_blocking(image_paths, url):
+            name = image_paths[part["index"]]
+            if part["type"] == "error":
+                print(f"Backend could not read {name}: {part['error']}")
+                continue
+            reused = f" (reused, {part['distance']} bits off)" if part["reused"] else ""
+            print(f"Circuit from {name}{reused}: {part['circuit_url']}")
+            print(part["code"])
     except Exception as e:
-        print(f"Error while interacting with localhost:3000: {e}")
+        print(f"Error while uploading to {url}: {e}")
 
 
 class GoogleSearchSpider(Spider):
     name = "google_search"
 
-    def __init__(self, html_content=None, *args, **kwargs):
+    def __init__(self, html_content=None, url="https://www.google.com", *args, **kwargs):
         super(GoogleSearchSpider, self).__init__(*args, **kwargs)
         self.html_content = html_content
+        self.domain = urlparse(url).netloc
         self.html_chunks = split_html_into_chunks(self.html_content)
-        self.chunk_index = 0
+        self.index = CandidateIndex(self.html_content)
+        self.fingerprint = page_fingerprint(self.index)
+        self.memory = None
+        self.waiter = None
         self.search_bar_xpath = None  # Keep track of the search bar's XPath
 
-    def start_requests(self):
-        # Start by sending the first chunk of HTML
-        if self.chunk_index < len(self.html_chunks):
-            yield from self.send_chunk_to_gpt(self.html_chunks[self.chunk_index])
+    async def start(self):
+        self.memory = SelectorMemory(self.settings.get("SELECTOR_MEMORY_PATH", "selectors.sqlite3"),
+                                     ttl=self.settings.getint("SELECTOR_MEMORY_TTL", 7 * 24 * 3600))
+        self.waiter = Waiter.from_settings(self.settings)
+        xpath_search_bar = await self.find_search_bar()
+        if xpath_search_bar is None:
+            print("Search bar was not found in any of the HTML chunks.")
+            self.handle_search_bar_not_found()
+            return
 
-    def send_chunk_to_gpt(self, html_chunk):
-        # GPT API call to find search bar XPath
-        gpt_api_url = "https://api.openai.com/v1/chat/completions"
-        API_KEY = "sk-BNdvCRikKICPEExsB2CPmalokbd3KsamRsr2IsUTNqT3BlbkFJr6M1SBUtQjokSAgG8RGjaqjbHdkX0twdsRxEuxNxEA"
+        print(f"Search bar found: {xpath_search_bar}")
+        self.search_bar_xpath = xpath_search_bar  # Save the valid XPath
+        google_search_url = "https://www.google.com"
+        yield Request(url=google_search_url, callback=self.input_search_term, meta={'xpath': xpath_search_bar})
 
+    async def find_search_bar(self):
+        """XPath of the search bar: one that worked on this page before, else
+        the local index's answer when it is sure, else the first valid XPath
+        any chunk gets from GPT (the other calls are then cancelled)."""
+        remembered = self.memory.lookup(self.domain, self.fingerprint, SEARCH_BAR_TASK, self.html_content)
+        if remembered is not None:
+            print(f"Search bar remembered from an earlier run: {remembered}")
+            return remembered
+
+        candidate = self.index.resolve(SEARCH_BAR_TASK)
+        if candidate is not None:
+            print(f"Search bar resolved locally: {candidate.xpath}")
+            return candidate.xpath
+
+        # Ask about every chunk at once instead of one round trip per chunk
+        concurrency = self.settings.getint("LLM_CONCURRENCY", 8)
+        cache = ResponseCache.from_settings(self.settings)
+        async with ChatClient(concurrency=concurrency, cache=cache) as client:
+            tasks = [
+                asyncio.ensure_future(self.send_chunk_to_gpt(client, index, chunk))
+                for index, chunk in enumerate(self.html_chunks)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    xpath_search_bar = await next_done
+                    if xpath_search_bar is not None:
+                        return xpath_search_bar
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        return None
+
+    async def send_chunk_to_gpt(self, client, chunk_index, html_chunk):
         # Prompt with guidance that the search bar is inside a <textarea> with class 'gLFyf'
-        prompt = f"Here is part {self.chunk_index + 1} of the HTML content:\n\n{html_chunk}\n\n" \
+        prompt = f"Here is part {chunk_index + 1} of the page's interactive elements, one per line " \
+                 f"as the element's absolute XPath followed by its HTML tag:\n\n{html_chunk}\n\n" \
                  f"The search bar input field is bound by <textarea class='gLFyf'> in this HTML structure. " \
                  f"Please provide the raw XPath to the search bar (without explanations) in this part of the HTML structure."
 
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {API_KEY}',
-        }
-
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 100,
-        }
-
-        response = requests.post(gpt_api_url, headers=headers, json=data)
-
-        # Check for errors in the response
-        if response.status_code != 200:
-            print(f"Error {response.status_code}: {response.text}")
-            return
-
-        gpt_response = response.json()
-
-        # Check if 'choices' exists in the GPT response
-        if 'choices' not in gpt_response:
-            print(f"Unexpected response format: {gpt_response}")
-            return
-
-        # Extract the raw XPath from the GPT response, removing extra text
-        xpath_search_bar = gpt_response["choices"][0]["message"]["content"].strip(
-        )
+        try:
+            xpath_search_bar = await client.complete(
+                [{"role": "user", "content": prompt}], max_tokens=100)
+        except (LLMError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Chunk {chunk_index + 1}: {e}")
+            return None
+        except LLMCacheMiss:
+            # Replaying offline: calls cancelled once another chunk answered
+            # were never cached, so this chunk simply has no answer
+            print(f"Chunk {chunk_index + 1}: no cached answer")
+            return None
 
         # Ensure we only get the actual XPath by checking for any markdown or explanation
         if "```" in xpath_search_bar:
             xpath_search_bar = xpath_search_bar.split("```")[1].strip()
 
         print(
-            f"XPath for chunk {self.chunk_index + 1} provided by GPT: {xpath_search_bar}")
-
-        # Check if we found the search bar by validating the XPath format
-        if xpath_search_bar.startswith("//"):
-            print(f"Search bar found: {xpath_search_bar}")
-            self.search_bar_xpath = xpath_search_bar  # Save the valid XPath
-            google_search_url = "https://www.google.com"
-            yield Request(url=google_search_url, callback=self.input_search_term, meta={'xpath': xpath_search_bar})
-        else:
-            # Move to the next chunk if the search bar isn't found
-            self.chunk_index += 1
-            if self.chunk_index < len(self.html_chunks):
-                # Recursively call the next chunk
-                yield from self.send_chunk_to_gpt(self.html_chunks[self.chunk_index])
-            else:
-                # Handle case when search bar is not found
-                print("Search bar was not found in any of the HTML chunks.")
-                self.handle_search_bar_not_found()
+            f"XPath for chunk {chunk_index + 1} provided by GPT: {xpath_search_bar}")
+
+        # Check if we found the search bar by validating the XPath format;
+        # besides "//" searches the answer may be one of the absolute paths
+        # listed in the chunk
+        if xpath_search_bar.startswith("/"):
+            return xpath_search_bar
+        return None
 
     def handle_search_bar_not_found(self):
         # Logic to handle when the search bar is not found after all chunks
         print("Handling case where search bar was not found. You can notify the user or take other actions.")
         # You can raise an exception, notify a user, or log additional details here.
 
-    def input_search_term(self, response):
+    async def input_search_term(self, response):
         # Get the search bar XPath from the GPT response
         xpath_search_bar = response.meta['xpath']
 
-        # Set up Selenium WebDriver to open Google and input 'arxiv.com'
-        chrome_options = Options()
-        # Maximize window for visibility
-        chrome_options.add_argument("--start-maximized")
-        driver = webdriver.Chrome(options=chrome_options)
+        # Lease a pooled browser instead of starting Chrome for every
+        # callback; Selenium blocks, so the flow runs off the reactor thread
+        async with self.browser_pool.lease_async() as driver:
+            await asyncio.to_thread(self.search_arxiv, driver, xpath_search_bar)
 
+    def search_arxiv(self, driver, xpath_search_bar):
         # Open Google
         driver.get('https://www.google.com')
-        time.sleep(2)  # Give the page some time to load
+        waiter = self.waiter
+        waiter.wait(driver, document_ready, "google loaded", site=GOOGLE_SITE)
 
-        # Find the search bar using the XPath provided by GPT
-        search_bar = driver.find_element_by_xpath(xpath_search_bar)
+        # Find the search bar using the XPath provided by GPT; the selector
+        # memory learns whether it worked
+        try:
+            search_bar = driver.find_element(By.XPATH, xpath_search_bar)
+        except Exception as e:
+            print(f"Search bar XPath {xpath_search_bar} did not match: {e}")
+            self.memory.forget(self.domain, self.fingerprint, SEARCH_BAR_TASK)
+            return
+        self.memory.remember(self.domain, self.fingerprint, SEARCH_BAR_TASK, xpath_search_bar)
 
         # Input the search term 'arxiv.com'
         search_bar.send_keys("arxiv.com")
-        time.sleep(1)  # Small delay to see the input being typed
 
         # Submit the form (simulate hitting 'Enter')
         search_bar.submit()
 
-        # Wait for the search results page to load
-        time.sleep(3)
-
-        # Find the first search result and click it
-        # XPath to the first result's link
-        first_result_xpath = "(//h3)[1]/ancestor::a"
-        first_result = driver.find_element_by_xpath(first_result_xpath)
-        first_result.click()
-
-        # Wait for the arXiv page to load
-        time.sleep(3)
-
-        # Now on the arXiv website, locate the search bar for papers using the correct <input> element
-        arxiv_search_bar_xpath = "//input[@class='input is-small'][@type='text'][@name='query']"
-
         try:
-            # Use WebDriverWait to wait for the search bar to be present
-            arxiv_search_bar = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, arxiv_search_bar_xpath))
-            )
-            # Input the full paper title "Classical simulation of quantum computation, the Gottesman-Knill theorem, and slightly beyond"
-            paper_title = "Classical simulation of quantum computation, the Gottesman-Knill theorem, and slightly beyond"
+            # Find the first search result and click it as soon as the
+            # results page shows it
+            # XPath to the first result's link
+            first_result_xpath = "(//h3)[1]/ancestor::a"
+            first_result = waiter.wait(driver, element_clickable(first_result_xpath), "google results",
+                                       site=GOOGLE_SITE)
+            first_result.click()
+
+            # Now on the arXiv website, locate the search bar for papers using the correct <input> element
+            arxiv_search_bar_xpath = "//input[@class='input is-small'][@type='text'][@name='query']"
+            arxiv_search_bar = waiter.wait(driver, element_present(arxiv_search_bar_xpath), "arxiv search bar",
+                                           site=ARXIV_SITE)
+            paper_title = PAPER_TITLE
             arxiv_search_bar.send_keys(paper_title)
 
             # Submit the search form (simulate hitting 'Enter')
@@ -242,39 +246,44 @@ class GoogleSearchSpider(Spider):
             arxiv_search_bar.send_keys(u'\ue007')
             print(f"Successfully searched for '{paper_title}' on arXiv.")
 
-            # Wait for the search results page to load
-            time.sleep(3)
-
             # Find the first link with the text 'pdf' that links to the PDF version of the paper
             pdf_link_xpath = "(//a[contains(@href, '/pdf/') and text()='pdf'])[1]"
-            pdf_link = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, pdf_link_xpath))
-            )
-            pdf_link.click()  # Click the link to open the PDF
+            pdf_link = waiter.wait(driver, element_present(pdf_link_xpath), "arxiv results", site=ARXIV_SITE)
 
-            print("Successfully clicked the PDF link for the paper on arXiv.")
+            # Cut the figure out of the PDF itself; the browser only opens
+            # the PDF to screenshot it when that fails
+            screenshot_path = extract_circuit_figure(
+                pdf_link.get_attribute("href"), self.settings.get("PDF_DIR", ".cache/pdfs"),
+                self.settings.get("FIGURES_DIR", "figures"))
+            if screenshot_path is None:
+                pdf_link.click()  # Click the link to open the PDF
+                print("Successfully clicked the PDF link for the paper on arXiv.")
 
-            # Wait a bit for the page to load fully
-            time.sleep(5)
+                # The viewer is ready once the document has loaded and stopped
+                # fetching
+                waiter.wait(driver, all_of(document_ready, network_idle()), "pdf loaded", budget=20,
+                            site=ARXIV_SITE)
 
-            # Scroll to a specific image and take a screenshot
-            # Replace with the correct XPath of the image
-            # image_xpath = "//img[@alt='example_image']"
-            # Scroll by 1000 pixels and take a screenshot
-            # Scroll down by 1000px and save screenshot
-            screenshot_path = "screenshot1.png"
-            scroll_and_screenshot(driver, 1000, screenshot_path)
+                # Scroll down by 1000px and save screenshot
+                screenshot_path = "screenshot1.png"
+                scroll_and_screenshot(driver, 1000, screenshot_path, waiter)
 
-            # Interact with localhost to upload screenshot and click generate
-            upload_screenshot_and_generate(driver, screenshot_path)
+            # Straight to the backend instead of through the web UI
+            upload_and_generate([screenshot_path], self.settings.get("INGEST_URL", INGEST_URL))
 
         except Exception as e:
             print(f"Error: {e}")
 
-        # Wait to observe the result before closing
-        time.sleep(10)  # Wait for 10 seconds so you can see the result
-
-        # Close the browser manually later or after verification
+    def closed(self, reason):
+        if self.memory is not None:
+            self.memory.close()
+        if self.waiter is not None:
+            # Time spent waiting per step, against what the fixed sleeps and
+            # timeouts allowed
+            for step, totals in self.waiter.report().items():
+                print(f"Waited {totals['waited']:.1f}s of {totals['budget']:.1f}s budgeted "
+                      f"over {totals['waits']} '{step}' waits ({totals['timeouts']} timed out)")
+            self.waiter.save()
 
 
 class CurrentPageSpider(Spider):
@@ -284,13 +293,8 @@ class CurrentPageSpider(Spider):
         super(CurrentPageSpider, self).__init__(*args, **kwargs)
         self.html_content = html_content
         self.url = url
-
-        # Open CSV file and write the headers
-        self.csv_file = open('output.csv', mode='w',
-                             newline='', encoding='utf-8')
-        self.csv_writer = csv.DictWriter(
-            self.csv_file, fieldnames=['url', 'html'])
-        self.csv_writer.writeheader()
+        # When the browser captured the page, for the store's fetch index
+        self.fetched_at = time.time()
 
     def start_requests(self):
         # Manually call parse, as we already have the HTML
@@ -302,176 +306,65 @@ class CurrentPageSpider(Spider):
         html_content = response.meta.get('html')
         url = response.url
 
-        # Write to CSV
-        self.csv_writer.writerow({'url': url, 'html': html_content})
-
+        # SkyvernPipeline appends it to the page store
         yield {
             "url": url,
             "html": html_content,
+            "fetched_at": self.fetched_at,
         }
 
-    def close(self, reason):
-        # Close the CSV file when the spider is done
-        self.csv_file.close()
-
 
 @defer.inlineCallbacks
-def run_spiders(html_content, current_url):
-    # Set up and run Scrapy to process the extracted data with custom settings
-    process = CrawlerProcess({
-        'LOG_ENABLED': True,  # Enable logs for better debugging
-        # Set user agent to mimic browser
-        'USER_AGENT': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
-    })
-
+def run_spiders(process, html_content, current_url):
     # Run CurrentPageSpider first
     print("Running CurrentPageSpider...")
     yield process.crawl(CurrentPageSpider, html_content=html_content, url=current_url)
 
     # Then run GoogleSearchSpider
     print("Running GoogleSearchSpider...")
-    yield process.crawl(GoogleSearchSpider, html_content=html_content)
+    yield process.crawl(GoogleSearchSpider, html_content=html_content, url=current_url)
 
+    from twisted.internet import reactor
     reactor.stop()
 
 
-def generate_plan():
-    gpt_api_url = "https://api.openai.com/v1/chat/completions"
-    API_KEY = "sk-BNdvCRikKICPEExsB2CPmalokbd3KsamRsr2IsUTNqT3BlbkFJr6M1SBUtQjokSAgG8RGjaqjbHdkX0twdsRxEuxNxEA"
-
-    prompt = f"You are Planner GPT. generate me a plan find the quantum research paper: 'Classical simulation of quantum computation, the Gottesman-Knill theorem, and slightly beyond' and take a photo of the circuit image to upload to a custom site"
-
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {API_KEY}',
-    }
-
-    data = {
-        "model": "gpt-3.5-turbo",
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 100,
-    }
-
-    response = requests.post(gpt_api_url, headers=headers, json=data)
-
-    # Check for errors in the response
-    if response.status_code != 200:
-        print(f"Error {response.status_code}: {response.text}")
-        return
-
-    gpt_response = response.json()
-
-    # Check if 'choices' exists in the GPT response
-    if 'choices' not in gpt_response:
-        print(f"Unexpected response format: {gpt_response}")
-        return
-
-    # Extract the raw XPath from the GPT response, removing extra text
-    plan = gpt_response["choices"][0]["message"]["content"].strip()
-
-    print(f"Plan provided by GPT: {plan}")
-
-
-def send_chunk_to_gpt(self, html_chunk):
-    # GPT API call to find search bar XPath
-    gpt_api_url = "https://api.openai.com/v1/chat/completions"
-    API_KEY = "sk-BNdvCRikKICPEExsB2CPmalokbd3KsamRsr2IsUTNqT3BlbkFJr6M1SBUtQjokSAgG8RGjaqjbHdkX0twdsRxEuxNxEA"
-
-    # Prompt with guidance that the search bar is inside a <textarea> with class 'gLFyf'
-    prompt = f"Here is part {self.chunk_index + 1} of the HTML content:\n\n{html_chunk}\n\n" \
-             f"The search bar input field is bound by <textarea class='gLFyf'> in this HTML structure. " \
-             f"Please provide the raw XPath to the search bar (without explanations) in this part of the HTML structure."
-
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {API_KEY}',
-    }
-
-    data = {
-        "model": "gpt-3.5-turbo",
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 100,
-    }
-
-    response = requests.post(gpt_api_url, headers=headers, json=data)
-
-    # Check for errors in the response
-    if response.status_code != 200:
-        print(f"Error {response.status_code}: {response.text}")
-        return
-
-    gpt_response = response.json()
-
-    # Check if 'choices' exists in the GPT response
-    if 'choices' not in gpt_response:
-        print(f"Unexpected response format: {gpt_response}")
-        return
-
-    # Extract the raw XPath from the GPT response, removing extra text
-    xpath_search_bar = gpt_response["choices"][0]["message"]["content"].strip()
-
-    # Ensure we only get the actual XPath by checking for any markdown or explanation
-    if "```" in xpath_search_bar:
-        xpath_search_bar = xpath_search_bar.split("```")[1].strip()
-
-    print(
-        f"XPath for chunk {self.chunk_index + 1} provided by GPT: {xpath_search_bar}")
-
-    # Check if we found the search bar by validating the XPath format
-    if xpath_search_bar.startswith("//"):
-        print(f"Search bar found: {xpath_search_bar}")
-        self.search_bar_xpath = xpath_search_bar  # Save the valid XPath
-        google_search_url = "https://www.google.com"
-        yield Request(url=google_search_url, callback=self.input_search_term, meta={'xpath': xpath_search_bar})
-    else:
-        # Move to the next chunk if the search bar isn't found
-        self.chunk_index += 1
-        if self.chunk_index < len(self.html_chunks):
-            # Recursively call the next chunk
-            yield from self.send_chunk_to_gpt(self.html_chunks[self.chunk_index])
-        else:
-            # Handle case when search bar is not found
-            print("Search bar was not found in any of the HTML chunks.")
-            self.handle_search_bar_not_found()
-
-
 def main():
-    # Delete the previous output.csv file if it exists
-    csv_file_path = 'output.csv'
-    if os.path.exists(csv_file_path):
-        print(f"Deleting previous {csv_file_path} file...")
-        os.remove(csv_file_path)
-
-    # Specify the path to your downloaded chromedriver
-    chromedriver_path = "/opt/homebrew/bin/chromedriver"
-
-    # Set Chrome options
-    chrome_options = Options()
-    # Remove the headless option to see the Chrome window
-    # chrome_options.add_argument("--headless")  # Commenting this line out to see the browser
-
-    # Initialize Chrome WebDriver
-    driver = webdriver.Chrome(
-        executable_path=chromedriver_path, options=chrome_options)
-
-    # Open the desired webpage
-    driver.get('https://google.com')
-    time.sleep(3)  # Wait for the page to load
-
-    # Get the current URL and HTML content of the page
-    current_url = driver.current_url
-    print(f"Current URL: {current_url}")
-    html_content = driver.page_source
-
-    # Close the browser
-    driver.quit()
-
-    generate_plan()
-
-    # Set up and run Scrapy to process the extracted data
-    run_spiders(html_content, current_url)
+    # The browser used here stays warm in the pool and is handed to the
+    # spiders afterwards (set BROWSER_HEADLESS = False to watch it)
+    settings = get_project_settings()
+    pool = pool_from_settings(settings)
+    settings.set("BROWSER_POOL", pool)
+
+    with pool.lease() as driver:
+        # Open the desired webpage
+        driver.get('https://google.com')
+        Waiter().wait(driver, document_ready, "google loaded", site=GOOGLE_SITE)
+
+        # Get the current URL and HTML content of the page
+        current_url = driver.current_url
+        print(f"Current URL: {current_url}")
+        html_content = driver.page_source
+
+    # This runs the fixed Google -> arXiv flow; planned runs of the paper
+    # task go through `python -m skyvern.plan`
+
+    # Set up and run Scrapy to process the extracted data with custom
+    # settings on top of the project's (which pick the asyncio reactor the
+    # LLM client runs on)
+    settings.setdict({
+        'LOG_ENABLED': True,  # Enable logs for better debugging
+        # Set user agent to mimic browser
+        'USER_AGENT': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    }, priority='cmdline')
+    process = CrawlerProcess(settings)
+    run_spiders(process, html_content, current_url)
 
-    reactor.run()
+    # Imported only now: CrawlerProcess has installed the configured reactor
+    from twisted.internet import reactor
+    try:
+        reactor.run()
+    finally:
+        pool.close()
 
 
 if __name__ == "__main__":
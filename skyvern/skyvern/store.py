@@ -0,0 +1,179 @@
+# Append-only store of crawled items
+#
+# Every item is serialized to one JSON line, compressed as its own zstd
+# frame and appended to the current segment file (segments/000001.zst, ...,
+# rolled over at SEGMENT_BYTES). Records are keyed by a hash of their
+# content, so a page crawled again unchanged costs an index row, not another
+# copy. index.sqlite3 maps content hashes to (segment, offset, length) and
+# keeps every (url, fetched_at, hash) seen, so each fetch of a URL stays
+# available. Reading one record maps its segment and decompresses just that
+# frame.
+#
+#     python -m skyvern.store store                 # URLs and fetch times
+#     python -m skyvern.store store https://...     # latest record for a URL
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import time
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    from backports import zstd
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+COMPRESSION_LEVEL = 9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetches (
+    url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    hash TEXT NOT NULL REFERENCES blobs (hash)
+);
+CREATE INDEX IF NOT EXISTS fetches_by_url ON fetches (url, fetched_at);
+"""
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class PageStore:
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, level=COMPRESSION_LEVEL):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.level = level
+        os.makedirs(os.path.join(directory, "segments"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite3"))
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+        segments = sorted(int(name.split(".")[0]) for name in os.listdir(self._segment_dir())
+                          if name.endswith(".zst"))
+        self.segment = segments[-1] if segments else 1
+        self._file = open(self._segment_path(self.segment), "ab")
+        self._maps = {}  # segment -> mmap, remapped when the segment has grown
+
+    def _segment_dir(self):
+        return os.path.join(self.directory, "segments")
+
+    def _segment_path(self, segment):
+        return os.path.join(self._segment_dir(), f"{segment:06d}.zst")
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+        self._file.close()
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, url, record, fetched_at=None):
+        """Store `record` (a JSON-serializable dict) as fetched from `url`.
+
+        Returns (hash, new); new is False when the same content was already
+        stored and only the fetch was recorded.
+        """
+        data = json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+        digest = content_hash(data)
+        fetched_at = time.time() if fetched_at is None else fetched_at
+
+        new = self.db.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None
+        if new:
+            frame = zstd.compress(data + b"\n", level=self.level)
+            if self._file.tell() and self._file.tell() + len(frame) > self.segment_bytes:
+                self._file.close()
+                self.segment += 1
+                self._file = open(self._segment_path(self.segment), "ab")
+            offset = self._file.tell()
+            self._file.write(frame)
+            # The frame is on disk before the index points at it; a crash in
+            # between leaves unreferenced bytes, never a dangling entry
+            self._file.flush()
+            self.db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?, ?)",
+                            (digest, self.segment, offset, len(frame), len(data)))
+        self.db.execute("INSERT INTO fetches VALUES (?, ?, ?)", (url, fetched_at, digest))
+        return digest, new
+
+    def commit(self):
+        self.db.commit()
+
+    def _map(self, segment, end):
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def read(self, digest):
+        """The record stored under `digest`, or None."""
+        row = self.db.execute("SELECT segment, offset, length FROM blobs WHERE hash = ?",
+                              (digest,)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        mapped = self._map(segment, offset + length)
+        return json.loads(zstd.decompress(mapped[offset:offset + length]))
+
+    def get(self, url, at=None):
+        """The record of the latest fetch of `url` (at or before `at`), or
+        None."""
+        row = self.db.execute(
+            "SELECT hash FROM fetches WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1",
+            (url, float("inf") if at is None else at)).fetchone()
+        return None if row is None else self.read(row[0])
+
+    def history(self, url):
+        """(fetched_at, hash) of every fetch of `url`, oldest first."""
+        return self.db.execute("SELECT fetched_at, hash FROM fetches WHERE url = ? ORDER BY fetched_at",
+                               (url,)).fetchall()
+
+    def urls(self):
+        """(url, fetches, last fetched_at) per URL."""
+        return self.db.execute(
+            "SELECT url, COUNT(*), MAX(fetched_at) FROM fetches GROUP BY url ORDER BY url").fetchall()
+
+    def stats(self):
+        records, stored, raw = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        fetches = self.db.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+        return {"fetches": fetches, "records": records, "stored_bytes": stored, "raw_bytes": raw}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or read what the crawls stored")
+    parser.add_argument("directory")
+    parser.add_argument("url", nargs="?")
+    args = parser.parse_args(argv)
+
+    with PageStore(args.directory) as store:
+        if args.url:
+            print(json.dumps(store.get(args.url), indent=2, ensure_ascii=False))
+            return
+        for url, fetches, last in store.urls():
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))}  {fetches:4d}  {url}")
+        print(json.dumps(store.stats()))
+
+
+if __name__ == "__main__":
+    main()
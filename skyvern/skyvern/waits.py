@@ -0,0 +1,179 @@
+# Waiting on page readiness instead of sleeping
+#
+# A condition is a callable taking the driver and returning something truthy
+# once it holds (an element, True, ...). Conditions compose with all_of and
+# any_of. Waiter.wait polls a condition for a named step and returns as soon
+# as it holds; the timeout for a step on a site is learned from how long it
+# took before (a multiple of the slowest recent wait or timeout, within the
+# caller's budget), and every wait is recorded as time waited against time
+# budgeted.
+
+import json
+import os
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+
+class WaitTimeout(TimeoutError):
+    pass
+
+
+def all_of(*conditions):
+    def check(driver):
+        result = True
+        for condition in conditions:
+            result = condition(driver)
+            if not result:
+                return False
+        return result
+    return check
+
+
+def any_of(*conditions):
+    def check(driver):
+        for condition in conditions:
+            result = condition(driver)
+            if result:
+                return result
+        return False
+    return check
+
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def element_present(xpath):
+    def check(driver):
+        from selenium.webdriver.common.by import By
+        elements = driver.find_elements(By.XPATH, xpath)
+        return elements[0] if elements else False
+    return check
+
+
+def element_clickable(xpath):
+    def check(driver):
+        from selenium.webdriver.common.by import By
+        for element in driver.find_elements(By.XPATH, xpath):
+            if element.is_displayed() and element.is_enabled():
+                return element
+        return False
+    return check
+
+
+def result_rendered(xpath):
+    """The element exists, is visible and has a non-zero size."""
+    def check(driver):
+        from selenium.webdriver.common.by import By
+        for element in driver.find_elements(By.XPATH, xpath):
+            size = element.size
+            if element.is_displayed() and size["width"] and size["height"]:
+                return element
+        return False
+    return check
+
+
+def network_idle(quiet=0.5):
+    """No new resource entries in the page's performance timeline for
+    `quiet` seconds."""
+    state = {"count": None, "since": None}
+
+    def check(driver):
+        count = driver.execute_script("return performance.getEntriesByType('resource').length")
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+            return False
+        return now - state["since"] >= quiet
+    return check
+
+
+def scrolled_to(y, tolerance=2):
+    def check(driver):
+        offset = driver.execute_script("return window.pageYOffset")
+        # Short pages cannot scroll all the way; the bottom counts as arrived
+        bottom = driver.execute_script(
+            "return document.documentElement.scrollHeight - window.innerHeight")
+        return abs(offset - min(y, bottom)) <= tolerance
+    return check
+
+
+class Waiter:
+    def __init__(self, path=None, history=20, factor=3.0, floor=1.0, poll=0.1):
+        self.path = path
+        self.factor = factor
+        self.floor = floor
+        self.poll = poll
+        # (site, step) -> recent waits in seconds
+        self.history = defaultdict(lambda: deque(maxlen=history))
+        self.records = []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for key, waits in json.load(f).items():
+                    site, step = key.split(" ", 1)
+                    self.history[(site, step)].extend(waits)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.get("WAIT_STATS_PATH"),
+            factor=settings.getfloat("WAIT_TIMEOUT_FACTOR", 3.0),
+            floor=settings.getfloat("WAIT_TIMEOUT_FLOOR", 1.0),
+        )
+
+    def timeout(self, site, step, budget):
+        waits = self.history.get((site, step))
+        if not waits:
+            return budget
+        return min(budget, max(self.floor, self.factor * max(waits)))
+
+    def wait(self, driver, condition, step, budget=10.0, site=None):
+        """Poll `condition` until it holds and return its value.
+
+        `site` is the host the step is learned for. It defaults to the
+        current page's, which right after a click or submit is still the
+        page being left, so waits that follow navigation name their site.
+        Raises WaitTimeout once the learned timeout (at most `budget`
+        seconds) has passed.
+        """
+        site = site or urlparse(driver.current_url).netloc or "-"
+        timeout = self.timeout(site, step, budget)
+        start = time.monotonic()
+        while True:
+            result = condition(driver)
+            waited = time.monotonic() - start
+            if result:
+                break
+            if waited >= timeout:
+                # A timeout counts as a wait of its full length, so the next
+                # timeout is `factor` times longer (up to the budget) instead
+                # of staying at what only fast waits taught
+                self.history[(site, step)].append(waited)
+                self.records.append({"site": site, "step": step, "waited": waited,
+                                     "timeout": timeout, "budget": budget, "ok": False})
+                raise WaitTimeout(f"{step} on {site} not ready after {waited:.1f}s")
+            time.sleep(self.poll)
+
+        self.history[(site, step)].append(waited)
+        self.records.append({"site": site, "step": step, "waited": waited,
+                             "timeout": timeout, "budget": budget, "ok": True})
+        return result
+
+    def report(self):
+        """Total time waited and budgeted per step."""
+        totals = {}
+        for record in self.records:
+            step = totals.setdefault(record["step"], {"waits": 0, "waited": 0.0, "budget": 0.0, "timeouts": 0})
+            step["waits"] += 1
+            step["waited"] += record["waited"]
+            step["budget"] += record["budget"]
+            step["timeouts"] += not record["ok"]
+        return totals
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({f"{site} {step}": list(waits) for (site, step), waits in self.history.items()}, f)